@@ -0,0 +1,113 @@
+from django.core.cache import cache
+from django.db.models import Max
+from django.utils.timezone import utc
+from dmt.main.models import Project, Item
+from datetime import datetime
+import re
+import time
+
+VERSION_KEY = 'api.projects.version'
+# how long the activity ranking can go without being refreshed. a
+# project getting busier doesn't change the index otherwise
+ACTIVITY_TTL = 10 * 60
+
+
+def projects_changed():
+    """ record that a project was added/changed/removed. the version
+    lives in the cache so that every process sees it and rebuilds """
+    version = time.time()
+    cache.set(VERSION_KEY, version, None)
+    return version
+
+
+def projects_version():
+    """ when the projects last changed, as a unix timestamp """
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        version = projects_changed()
+    return version
+
+
+def projects_etag(request, *args, **kwargs):
+    return "%.6f" % projects_version()
+
+
+def projects_last_modified(request, *args, **kwargs):
+    return datetime.fromtimestamp(projects_version(), utc)
+
+
+def trigrams(s):
+    return set(s[i:i + 3] for i in range(len(s) - 2))
+
+
+class ProjectNameIndex(object):
+    """ all the project names, in memory, for autocomplete.
+
+    names are matched the way name__icontains would match them, but
+    without scanning the table: a query of three or more characters
+    only looks at the projects whose names contain all of its
+    trigrams. names where a word starts with the query come first,
+    then the most recently active projects. """
+
+    def __init__(self, projects, activity, version=None):
+        self.version = version
+        self.built = time.time()
+        self.names = dict()
+        self.lower = dict()
+        self.trigrams = dict()
+        for pid, name in projects:
+            self.names[pid] = name
+            self.lower[pid] = name.lower()
+            for t in trigrams(name.lower()):
+                self.trigrams.setdefault(t, set()).add(pid)
+        # pids, most recently active first
+        active = sorted(activity, key=lambda pid: activity[pid],
+                        reverse=True)
+        self.activity_rank = dict((pid, i) for i, pid in enumerate(active))
+
+    def candidates(self, q):
+        if len(q) < 3:
+            return self.names.keys()
+        postings = [self.trigrams.get(t, set()) for t in trigrams(q)]
+        return set.intersection(*postings)
+
+    def rank(self, pid, q):
+        word_prefix = re.search(
+            r'(^|\W)' + re.escape(q), self.lower[pid], re.UNICODE)
+        return (word_prefix is None,
+                self.activity_rank.get(pid, len(self.activity_rank)),
+                self.lower[pid])
+
+    def search(self, q, limit=10):
+        """ [(pid, name)] of the best matches for q """
+        q = q.strip().lower()
+        if not q:
+            return []
+        matches = [pid for pid in self.candidates(q)
+                   if q in self.lower[pid]]
+        matches.sort(key=lambda pid: self.rank(pid, q))
+        return [(pid, self.names[pid]) for pid in matches[:limit]]
+
+
+def build_index(version=None):
+    activity = dict(
+        (r['milestone__project'], r['last_activity'])
+        for r in Item.objects.order_by().values(
+            'milestone__project').annotate(last_activity=Max('last_mod'))
+        if r['last_activity'] is not None)
+    return ProjectNameIndex(
+        Project.objects.values_list('pid', 'name'), activity, version)
+
+
+_index = None
+
+
+def project_index():
+    """ the index for this process, rebuilt if any project has
+    changed (in any process) since it was built """
+    global _index
+    version = projects_version()
+    if (_index is None or _index.version != version or
+            _index.built < time.time() - ACTIVITY_TTL):
+        _index = build_index(version)
+    return _index
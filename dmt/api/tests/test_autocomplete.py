@@ -0,0 +1,61 @@
+from django.test import TestCase
+from dmt.main.tests.factories import ProjectFactory, ItemFactory
+from dmt.api.autocomplete import (
+    ProjectNameIndex, project_index, projects_version, trigrams)
+from datetime import datetime
+
+
+class ProjectNameIndexTest(TestCase):
+    def setUp(self):
+        self.index = ProjectNameIndex(
+            [(1, u"Mediathread"), (2, u"The Media Project"),
+             (3, u"Ambient Medicine"), (4, u"Unrelated")],
+            {3: datetime(2014, 6, 1), 2: datetime(2014, 1, 1)})
+
+    def test_trigrams(self):
+        self.assertEqual(trigrams(u"abcd"), set([u"abc", u"bcd"]))
+        self.assertEqual(trigrams(u"ab"), set())
+
+    def test_substring(self):
+        self.assertEqual(self.index.search(u"relat"), [(4, u"Unrelated")])
+        self.assertEqual(self.index.search(u"nothing"), [])
+        self.assertEqual(self.index.search(u"  "), [])
+
+    def test_short_query(self):
+        self.assertEqual(
+            [pid for pid, name in self.index.search(u"un")], [4])
+
+    def test_ranking(self):
+        # word prefixes first, then the most recently active
+        self.assertEqual(
+            [pid for pid, name in self.index.search(u"MEDI")], [3, 2, 1])
+        self.assertEqual(
+            [pid for pid, name in self.index.search(u"media")], [2, 1])
+        self.assertEqual(
+            [pid for pid, name in self.index.search(u"dic")], [3])
+
+    def test_limit(self):
+        self.assertEqual(len(self.index.search(u"e", limit=2)), 2)
+
+
+class ProjectIndexTest(TestCase):
+    def test_rebuilt_on_save(self):
+        p = ProjectFactory(name="Old Name")
+        self.assertEqual(project_index().search("old"), [(p.pid, p.name)])
+        version = projects_version()
+        p.name = "New Name"
+        p.save()
+        self.assertNotEqual(projects_version(), version)
+        self.assertEqual(project_index().search("old"), [])
+        self.assertEqual(project_index().search("new"), [(p.pid, p.name)])
+        p.delete()
+        self.assertEqual(project_index().search("new"), [])
+
+    def test_activity(self):
+        i = ItemFactory(milestone__project__name="Busy Project")
+        i.last_mod = datetime(2014, 6, 1)
+        i.save()
+        other = ProjectFactory(name="Quiet Project")
+        self.assertEqual(
+            [pid for pid, name in project_index().search("project")],
+            [i.milestone.project.pid, other.pid])
@@ -3,7 +3,8 @@ from django.test.client import Client
 from django.contrib.auth.models import User
 from dmt.claim.models import Claim, PMTUser
 from dmt.main.tests.factories import MilestoneFactory, ClientFactory
-from dmt.main.tests.factories import ItemFactory
+from dmt.main.tests.factories import ItemFactory, ProjectFactory
+from json import loads
 
 
 class AllProjectsViewTest(TestCase):
@@ -12,6 +13,21 @@ class AllProjectsViewTest(TestCase):
         r = self.c.get("/api/1.0/projects/all/")
         self.assertEqual(r.status_code, 200)
 
+    def test_conditional_get(self):
+        self.c = Client()
+        p = ProjectFactory()
+        r = self.c.get("/api/1.0/projects/all/")
+        self.assertEqual(loads(r.content), [dict(pid=p.pid, value=p.name)])
+        etag = r['ETag']
+        self.assertTrue(r.has_header('Last-Modified'))
+        r = self.c.get("/api/1.0/projects/all/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(r.status_code, 304)
+        p.name = "renamed"
+        p.save()
+        r = self.c.get("/api/1.0/projects/all/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(r.status_code, 200)
+        self.assertNotEqual(r['ETag'], etag)
+
 
 class AutoCompleteProjectViewTest(TestCase):
     def test_get(self):
@@ -19,6 +35,15 @@ class AutoCompleteProjectViewTest(TestCase):
         r = self.c.get("/api/1.0/projects/autocomplete/?q=test")
         self.assertEqual(r.status_code, 200)
 
+    def test_matches(self):
+        self.c = Client()
+        p = ProjectFactory(name="Testing Project")
+        ProjectFactory(name="Something Else")
+        r = self.c.get("/api/1.0/projects/autocomplete/?q=test")
+        self.assertEqual(loads(r.content), [dict(pid=p.pid, value=p.name)])
+        r = self.c.get("/api/1.0/projects/autocomplete/")
+        self.assertEqual(loads(r.content), [])
+
 
 class AddTrackerViewTest(TestCase):
     def setUp(self):
@@ -2,25 +2,34 @@ from django.contrib.auth.decorators import login_required
 from django.http import HttpResponse
 from django.shortcuts import get_object_or_404
 from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
 from django.views.generic import View
 
-from dmt.claim.models import Claim
+from dmt.claim.middleware import pmt_user_or_404
 from dmt.main.models import Project, Item, Client, User
+from .autocomplete import (
+    project_index, projects_etag, projects_last_modified)
 
 from simpleduration import Duration, InvalidDuration
 from json import dumps
 
 
 class AllProjectsView(View):
+    @method_decorator(condition(etag_func=projects_etag,
+                                last_modified_func=projects_last_modified))
     def get(self, request):
-        d = [dict(pid=p.pid, value=p.name) for p in Project.objects.all()]
+        d = [dict(pid=pid, value=name)
+             for pid, name in Project.objects.values_list('pid', 'name')]
         return HttpResponse(dumps(d))
 
 
 class AutocompleteProjectView(View):
+    limit = 10
+
     def get(self, request):
-        d = [dict(pid=p.pid, value=p.name)
-             for p in Project.objects.filter(name__icontains=request.GET['q'])]
+        d = [dict(pid=pid, value=name)
+             for pid, name in project_index().search(
+                 request.GET.get('q', ''), self.limit)]
         return HttpResponse(dumps(d))
 
 
@@ -28,7 +37,7 @@ class ItemHoursView(View):
     @method_decorator(login_required)
     def post(self, request, pk):
         item = get_object_or_404(Item, iid=pk)
-        user = get_object_or_404(Claim, django_user=request.user).pmt_user
+        user = pmt_user_or_404(request)
         try:
             d = Duration(request.POST.get('time', "1 hour"))
         except InvalidDuration:
@@ -107,7 +116,7 @@ class AddTrackerView(View):
             return HttpResponse("bad request")
 
         project = get_object_or_404(Project, pid=pid)
-        user = get_object_or_404(Claim, django_user=request.user).pmt_user
+        user = pmt_user_or_404(request)
         milestone = project.upcoming_milestone()
         item = Item.objects.create(
             milestone=milestone,
@@ -0,0 +1,46 @@
+from django.http import Http404
+from .models import Claim, PMTUser
+
+SESSION_KEY = 'claim.pmt_user'
+
+
+def claimed_pmt_user(request):
+    """ the PMT user that request.user has claimed, or None.
+
+    once it's been found, the session remembers it (along with the
+    django user it belongs to, since impersonating someone changes
+    request.user but not the session), so after that it's one lookup
+    by primary key. not having a claim isn't remembered; the claim
+    page needs to see a new one straight away """
+    user = request.user
+    cached = request.session.get(SESSION_KEY)
+    if cached is not None and cached[0] == user.pk:
+        try:
+            return PMTUser.objects.get(pk=cached[1])
+        except PMTUser.DoesNotExist:
+            pass
+    try:
+        pmt_user = Claim.objects.select_related('pmt_user').get(
+            django_user=user).pmt_user
+    except Claim.DoesNotExist:
+        request.session.pop(SESSION_KEY, None)
+        return None
+    request.session[SESSION_KEY] = [user.pk, pmt_user.pk]
+    return pmt_user
+
+
+class ClaimMiddleware(object):
+    """ sets request.pmt_user to the PMT user the logged in user has
+    claimed (None if they're not logged in or haven't claimed one).
+    needs to come after the auth and impersonate middleware """
+
+    def process_request(self, request):
+        request.pmt_user = None
+        if request.user.is_authenticated():
+            request.pmt_user = claimed_pmt_user(request)
+
+
+def pmt_user_or_404(request):
+    if getattr(request, 'pmt_user', None) is None:
+        raise Http404
+    return request.pmt_user
@@ -1,5 +1,4 @@
 from django import template
-from dmt.claim.models import Claim
 
 register = template.Library()
 
@@ -18,12 +17,8 @@ class PMTUserNode(template.Node):
     def render(self, context):
         if 'request' not in context:
             return ''
-        u = context['request'].user
-        r = Claim.objects.filter(django_user=u)
-        if r.count() > 0:
-            context[self.var_name] = r[0].pmt_user
-        else:
-            context[self.var_name] = DummyPMTUser()
+        pmt_user = getattr(context['request'], 'pmt_user', None)
+        context[self.var_name] = pmt_user or DummyPMTUser()
         return ''
 
 
@@ -0,0 +1,52 @@
+from django.test import TestCase
+from django.test.client import Client
+from django.contrib.auth.models import User
+from dmt.claim.middleware import SESSION_KEY
+from dmt.claim.models import Claim, PMTUser
+
+
+class ClaimMiddlewareTest(TestCase):
+    def setUp(self):
+        self.c = Client()
+        self.u = User.objects.create(username="testuser")
+        self.u.set_password("test")
+        self.u.save()
+        self.c.login(username="testuser", password="test")
+        self.pu = PMTUser.objects.create(username="testpmtuser",
+                                         email="testemail@columbia.edu",
+                                         status="active")
+
+    def test_unclaimed(self):
+        r = self.c.get("/claim/")
+        self.assertEqual(r.context['request'].pmt_user, None)
+        self.assertFalse(SESSION_KEY in self.c.session)
+
+    def test_claimed(self):
+        Claim.objects.create(django_user=self.u, pmt_user=self.pu)
+        r = self.c.get("/claim/")
+        self.assertEqual(r.context['request'].pmt_user, self.pu)
+        self.assertEqual(self.c.session[SESSION_KEY],
+                         [self.u.pk, self.pu.pk])
+
+    def test_remembered_in_session(self):
+        Claim.objects.create(django_user=self.u, pmt_user=self.pu)
+        self.c.get("/claim/")
+        Claim.objects.all().delete()
+        r = self.c.get("/claim/")
+        # still found, from the session, without looking for the claim
+        self.assertEqual(r.context['request'].pmt_user, self.pu)
+
+    def test_other_user_in_session(self):
+        Claim.objects.create(django_user=self.u, pmt_user=self.pu)
+        self.c.get("/claim/")
+        session = self.c.session
+        session[SESSION_KEY] = [self.u.pk + 1, "someoneelse"]
+        session.save()
+        self.c.cookies['sessionid'] = session.session_key
+        r = self.c.get("/claim/")
+        self.assertEqual(r.context['request'].pmt_user, self.pu)
+
+    def test_not_logged_in(self):
+        self.c.logout()
+        r = self.c.get("/claim/")
+        self.assertEqual(r.status_code, 302)
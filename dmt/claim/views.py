@@ -19,11 +19,10 @@ def index(request):
         statsd.incr('claim.user_claimed')
         return HttpResponseRedirect("/claim/")
     else:
-        r = Claim.objects.filter(django_user=request.user)
         data = dict()
-        data['found'] = r.count() > 0
-        if r.count() > 0:
-            data['pmt_user'] = r[0].pmt_user
+        data['found'] = request.pmt_user is not None
+        if data['found']:
+            data['pmt_user'] = request.pmt_user
         else:
             data['available_users'] = all_unclaimed_pmt_users()
             likely = (
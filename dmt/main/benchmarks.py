@@ -0,0 +1,178 @@
+""" timings for the slow parts of the PMT, against whatever is in the
+database (see the generate_synthetic_pmt and benchmark commands).
+
+each benchmark is a page request or a celery task. it's run once with
+an empty cache, then repeated, and the report has both, along with
+how many queries the cold run made. reports are plain json, so that
+two runs can be compared with compare() """
+from django.conf import settings
+from django.contrib.auth.models import User as DjangoUser
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Count
+from django.test.client import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
+from datetime import datetime, timedelta
+import time
+from .models import (
+    User, Project, Milestone, Item, Events, Comment, ActualTime, Node)
+from .sync import Watermark
+from . import tasks
+from dmt.claim.models import Claim
+
+BENCHMARK_USER = 'benchmark'
+
+
+class Benchmark(object):
+    """ run() does one of whatever's being timed """
+
+    def __init__(self, name):
+        self.name = name
+
+    def time(self, repeat):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            start = time.time()
+            self.run()
+            cold = time.time() - start
+        # before the next request resets connection.queries
+        n = len(queries)
+        timings = []
+        for i in range(repeat):
+            start = time.time()
+            self.run()
+            timings.append(time.time() - start)
+        timings = sorted(timings) or [cold]
+        return dict(
+            name=self.name,
+            queries=n,
+            cold_ms=cold * 1000,
+            min_ms=timings[0] * 1000,
+            median_ms=timings[len(timings) // 2] * 1000,
+            max_ms=timings[-1] * 1000,
+            runs=repeat,
+        )
+
+
+class Page(Benchmark):
+    def __init__(self, name, client, url):
+        super(Page, self).__init__(name)
+        self.client = client
+        self.url = url
+
+    def run(self):
+        r = self.client.get(self.url)
+        if r.status_code != 200:
+            raise Exception("%s: %d" % (self.url, r.status_code))
+
+
+class Task(Benchmark):
+    def __init__(self, name, task, *args):
+        super(Task, self).__init__(name)
+        self.task = task
+        self.args = args
+
+    def run(self):
+        self.task(*self.args)
+
+
+def busiest():
+    """ the project, item and user with the most going on, so that
+    the detail pages get timed at their worst """
+    project = Project.objects.annotate(
+        n=Count('milestone__item')).order_by('-n')[0]
+    item = Item.objects.annotate(n=Count('comment')).order_by('-n')[0]
+    user = User.objects.annotate(
+        n=Count('actualtime')).order_by('-n')[0]
+    return project, item, user
+
+
+def login(user):
+    """ a test client that's logged in and has claimed user. run()
+    deletes the login again at the end """
+    django_user, created = DjangoUser.objects.get_or_create(
+        username=BENCHMARK_USER)
+    django_user.set_password(BENCHMARK_USER)
+    django_user.save()
+    Claim.objects.filter(django_user=django_user).delete()
+    Claim.objects.create(django_user=django_user, pmt_user=user)
+    # not 127.0.0.1, which is in INTERNAL_IPS, or the debug toolbar
+    # would be timed along with the page
+    client = Client(REMOTE_ADDR='192.0.2.1')
+    client.login(username=BENCHMARK_USER, password=BENCHMARK_USER)
+    return client
+
+
+def middleware():
+    """ sqlite won't start an atomic() block inside the transaction
+    that TransactionMiddleware leaves open, so the pages have to go
+    without it there """
+    if connection.vendor != 'sqlite':
+        return settings.MIDDLEWARE_CLASSES
+    return [m for m in settings.MIDDLEWARE_CLASSES
+            if m != 'django.middleware.transaction.TransactionMiddleware']
+
+
+def benchmarks():
+    project, item, user = busiest()
+    c = login(user)
+    pages = [
+        ('dashboard', '/dashboard/'),
+        ('project_detail', project.get_absolute_url()),
+        ('item_detail', item.get_absolute_url()),
+        ('search', '/search/?q=%s' % item.title.split()[0]),
+        ('report_staff', '/report/staff/'),
+        ('report_user_weekly', '/report/user/%s/weekly/' % user.username),
+        ('report_user_yearly', '/report/user/%s/yearly/' % user.username),
+        ('drf_users', '/drf/users/'),
+        ('drf_projects', '/drf/projects/'),
+        ('drf_milestones', '/drf/milestones/'),
+        ('drf_items', '/drf/items/'),
+        ('drf_clients', '/drf/clients/'),
+        ('drf_changes_items', '/drf/changes/items/?since=%s' % Watermark(
+            timezone.now() - timedelta(days=30)).encode()),
+    ]
+    return [Page(name, c, url) for (name, url) in pages] + [
+        Task('task_collect_metrics', tasks.collect_metrics),
+        Task('task_rebuild_dashboard_snapshot',
+             tasks.rebuild_dashboard_snapshot),
+        Task('task_close_passed_milestones',
+             tasks.close_passed_milestones, True),
+    ]
+
+
+def table_sizes():
+    return dict(
+        (model._meta.db_table, model.objects.count())
+        for model in [User, Project, Milestone, Item, Events, Comment,
+                      ActualTime, Node])
+
+
+def run(repeat=5, only=None, log=None):
+    """ the report, as a dict that's ready for json """
+    results = []
+    try:
+        with override_settings(MIDDLEWARE_CLASSES=middleware()):
+            for benchmark in benchmarks():
+                if only and benchmark.name not in only:
+                    continue
+                results.append(benchmark.time(repeat))
+                if log is not None:
+                    log(results[-1])
+    finally:
+        DjangoUser.objects.filter(username=BENCHMARK_USER).delete()
+    return dict(
+        when=datetime.now().isoformat(),
+        database=connection.vendor,
+        tables=table_sizes(),
+        results=results,
+    )
+
+
+def compare(old, new):
+    """ [(name, old median, new median)] for the benchmarks that are
+    in both reports """
+    before = dict((r['name'], r['median_ms']) for r in old['results'])
+    return [(r['name'], before[r['name']], r['median_ms'])
+            for r in new['results'] if r['name'] in before]
@@ -9,7 +9,8 @@ class ForumFeed(Feed):
         "recent posts, personal log entries and comments in the forum")
 
     def items(self):
-        return Node.objects.order_by('-modified')[:10]
+        return Node.objects.select_related('author').order_by(
+            '-modified')[:10]
 
     def item_title(self, item):
         return item.subject
@@ -31,7 +32,8 @@ class StatusUpdateFeed(Feed):
     description = "recent status updates"
 
     def items(self):
-        return StatusUpdate.objects.order_by("-added")[:30]
+        return StatusUpdate.objects.select_related(
+            'project', 'user').order_by("-added")[:30]
 
     def item_description(self, item):
         return """<a href="%s">%s</a>:  %s  -- <a href="%s">%s</a>  (%s)""" % (
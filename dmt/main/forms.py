@@ -19,19 +19,19 @@ class UserUpdateForm(ModelForm):
         model = User
         fields = ["fullname", "email", "type", "title", "phone",
                   "bio", "photo_url", "photo_width", "photo_height",
-                  "campus", "building", "room"]
+                  "campus", "building", "room", "notification_frequency"]
 
 
 class ProjectUpdateForm(ModelForm):
     class Meta:
         model = Project
-        exclude = ['pid', ]
+        exclude = ['pid', 'last_mod']
 
 
 class MilestoneUpdateForm(ModelForm):
     class Meta:
         model = Milestone
-        exclude = ['mid', 'project', 'status']
+        exclude = ['mid', 'project', 'status', 'last_mod']
 
 
 class ItemUpdateForm(ModelForm):
@@ -0,0 +1,53 @@
+""" notification email goes out from a celery task, so the request that
+triggers it doesn't have to wait on the mail server """
+from celery.decorators import task
+from django.core.mail import EmailMessage, get_connection
+from django_statsd.clients import statsd
+import logging
+import smtplib
+import socket
+
+logger = logging.getLogger(__name__)
+
+# seconds before the first retry. it doubles with each one after that
+RETRY_DELAY = 60
+
+
+@task(max_retries=6, ignore_result=True)
+def send_emails(messages):
+    """ messages is a list of (subject, body, from_email, recipients).
+    they all go out over one connection. if the mail server falls
+    over part way through, only the ones that didn't make it get
+    retried. a message the server turns down (bad recipients, or
+    its content) would only be turned down again, so that one is
+    logged and skipped instead """
+    connection = get_connection()
+    sent = 0
+    try:
+        connection.open()
+        for message in messages:
+            send_message(connection, *message)
+            sent += 1
+    except (smtplib.SMTPException, socket.error) as exc:
+        statsd.incr('main.email_retry')
+        raise send_emails.retry(
+            args=[messages[sent:]], exc=exc,
+            countdown=RETRY_DELAY * 2 ** send_emails.request.retries)
+    finally:
+        connection.close()
+
+
+def send_message(connection, subject, body, from_email, recipients):
+    try:
+        connection.send_messages(
+            [EmailMessage(subject, body, from_email, recipients)])
+    except (smtplib.SMTPRecipientsRefused, smtplib.SMTPDataError) as exc:
+        statsd.incr('main.email_rejected')
+        logger.warning("email %r to %s rejected: %r",
+                       subject, ", ".join(recipients), exc)
+
+
+def queue_email(subject, body, from_email, recipients):
+    if not recipients:
+        return
+    send_emails.delay([(subject, body, from_email, list(recipients))])
@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand, CommandError
+from optparse import make_option
+import json
+from dmt.main.benchmarks import run, compare
+from dmt.main.models import Item
+
+
+class Command(BaseCommand):
+    help = ("time the dashboard, detail pages, search, reports, drf "
+            "lists and celery tasks against the current database, and "
+            "write a json report")
+    option_list = BaseCommand.option_list + (
+        make_option('--repeat', type='int', default=5,
+                    help='runs of each, after the cold one'),
+        make_option('--only', action='append',
+                    help='just this benchmark (can be given again)'),
+        make_option('--output', help='where to write the report'),
+        make_option('--compare',
+                    help='an earlier report to compare this one with'),
+    )
+
+    def handle(self, *args, **options):
+        if not Item.objects.exists():
+            raise CommandError(
+                "nothing to benchmark. try generate_synthetic_pmt first")
+        previous = None
+        if options['compare']:
+            with open(options['compare']) as f:
+                previous = json.load(f)
+        report = run(options['repeat'], options['only'], self.log)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2, sort_keys=True)
+        if previous is not None:
+            self.show_comparison(compare(previous, report))
+
+    def log(self, result):
+        self.stdout.write(
+            "%(name)s: %(queries)d queries, cold %(cold_ms).1fms, "
+            "min %(min_ms).1fms median %(median_ms).1fms "
+            "max %(max_ms).1fms" % result)
+
+    def show_comparison(self, rows):
+        for name, before, after in rows:
+            self.stdout.write("%s: %.1fms -> %.1fms (%+.0f%%)" % (
+                name, before, after,
+                (after - before) / before * 100 if before else 0))
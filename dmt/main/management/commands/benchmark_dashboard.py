@@ -0,0 +1,92 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test.client import RequestFactory
+from datetime import datetime, timedelta
+from optparse import make_option
+import time
+from dmt.main.models import (
+    User, Project, Milestone, Item, ActualTime, DashboardSnapshot)
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = ("time the dashboard against a synthetic actual_times table. "
+            "everything it creates is rolled back afterwards.")
+    option_list = BaseCommand.option_list + (
+        make_option('--rows', type='int', default=500000,
+                    help='number of actual_times rows to generate'),
+        make_option('--users', type='int', default=50),
+        make_option('--projects', type='int', default=200),
+        make_option('--repeat', type='int', default=5,
+                    help='number of times to render the dashboard'),
+    )
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.populate(options)
+                self.benchmark(options['repeat'])
+                raise Rollback()
+        except Rollback:
+            pass
+
+    def populate(self, options):
+        start = time.time()
+        now = datetime.now()
+        users = [
+            User.objects.create(
+                username='bench%d' % i, fullname='Bench User %d' % i,
+                email='bench%d@example.com' % i, status='active')
+            for i in range(options['users'])]
+        items = []
+        for i in range(options['projects']):
+            p = Project.objects.create(
+                name='Bench Project %d' % i, caretaker=users[0])
+            m = Milestone.objects.create(
+                name='Bench Milestone %d' % i, project=p,
+                target_date=now.date())
+            items.append(Item.objects.create(
+                type='action item', owner=users[0], assigned_to=users[0],
+                title='Bench Item %d' % i, milestone=m, status='OPEN',
+                estimated_time=timedelta(hours=1)))
+        # completed is the primary key, so every row needs its own
+        # timestamp. spread them evenly over the last five weeks.
+        step = timedelta(weeks=5) / max(options['rows'], 1)
+        batch = []
+        for i in range(options['rows']):
+            batch.append(ActualTime(
+                item=items[i % len(items)],
+                resolver=users[i % len(users)],
+                actual_time=timedelta(minutes=30),
+                completed=now - step * (i + 1)))
+            if len(batch) == 1000:
+                ActualTime.objects.bulk_create(batch)
+                batch = []
+        ActualTime.objects.bulk_create(batch)
+        self.stdout.write("populated %d rows in %.2fs" % (
+            options['rows'], time.time() - start))
+
+    def benchmark(self, repeat):
+        # imported here rather than at the top; pulling in the views
+        # while management commands are still being loaded triggers
+        # debug_toolbar's urlconf patching before the app cache is ready
+        from dmt.main.views import DashboardView
+        request = RequestFactory().get('/dashboard/')
+        for label, cold in [('cold', True), ('snapshot', False)]:
+            timings = []
+            for i in range(repeat):
+                if cold:
+                    DashboardSnapshot.objects.all().delete()
+                start = time.time()
+                view = DashboardView(request=request)
+                view.get_context_data()
+                timings.append(time.time() - start)
+            self.stdout.write(
+                "dashboard (%s): min %.1fms avg %.1fms max %.1fms "
+                "over %d runs" % (
+                    label, min(timings) * 1000,
+                    sum(timings) / len(timings) * 1000,
+                    max(timings) * 1000, len(timings)))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from optparse import make_option
+from dmt.main.models import Milestone
+from dmt.main.tasks import close_passed_milestones
+
+
+class Command(BaseCommand):
+    help = ("close the milestones whose target date has passed and "
+            "that have no unclosed items left")
+    option_list = BaseCommand.option_list + (
+        make_option('--dry-run', action='store_true', default=False,
+                    help="list the milestones that would be closed"),
+    )
+
+    def handle(self, *args, **options):
+        if options['dry_run']:
+            for mid, name, project in Milestone.objects.passed_and_done(
+                    ).values_list('mid', 'name', 'project__name'):
+                self.stdout.write("%d %s (%s)" % (mid, name, project))
+        closed = close_passed_milestones(dry_run=options['dry_run'])
+        self.stdout.write("%d milestones %s" % (
+            closed, "would be closed" if options['dry_run'] else "closed"))
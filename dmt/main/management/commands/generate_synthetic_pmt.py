@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from optparse import make_option
+import time
+from dmt.main.models import User
+from dmt.main.synthetic import SyntheticPMT, SIZES, scaled
+from dmt.search.models import SearchEntry
+
+
+class Command(BaseCommand):
+    help = ("fill the database with a synthetic PMT, for benchmarking. "
+            "by default it's about the size of production; --scale 0.01 "
+            "is a quick one")
+    option_list = BaseCommand.option_list + (
+        make_option('--scale', type='float', default=1.0,
+                    help='multiply all the default sizes by this'),
+        make_option('--seed', type='int', default=0),
+        make_option('--prefix', default='synth',
+                    help='start of every synthetic username'),
+        make_option('--no-index', action='store_true', default=False,
+                    help="don't rebuild the search index afterwards"),
+    ) + tuple(
+        make_option('--%s' % name.replace('_', '-'), dest=name,
+                    type='int', help='number of %s' % name.replace('_', ' '))
+        for name in sorted(SIZES.keys()))
+
+    def handle(self, *args, **options):
+        if User.objects.filter(
+                username__startswith=options['prefix']).exists():
+            raise CommandError(
+                "there are already users starting with %r. use another "
+                "--prefix" % options['prefix'])
+        sizes = self.get_sizes(options)
+        start = time.time()
+
+        def log(step):
+            self.stdout.write("%s: %.1fs" % (step, time.time() - start))
+
+        with transaction.atomic():
+            SyntheticPMT(sizes, options['seed'], options['prefix']).generate(
+                log)
+        if not options['no_index']:
+            with transaction.atomic():
+                SearchEntry.objects.rebuild()
+            log('search index')
+
+    def get_sizes(self, options):
+        sizes = scaled(SIZES, options['scale'])
+        for name in SIZES.keys():
+            if options.get(name) is not None:
+                sizes[name] = options[name]
+        return sizes
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from optparse import make_option
+from dmt.main.models import Milestone
+
+
+class Command(BaseCommand):
+    help = ("recount the open/unclosed item counters and open estimate "
+            "on every milestone, fixing any that have drifted")
+    option_list = BaseCommand.option_list + (
+        make_option('--verify', action='store_true', default=False,
+                    help="only report the milestones that are wrong"),
+    )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            wrong = Milestone.objects.recount(fix=not options['verify'])
+        for milestone, counters in wrong:
+            self.stdout.write("%d %s: %r should be %r" % (
+                milestone.mid, milestone.name, milestone.counters(),
+                counters))
+        if options['verify'] and wrong:
+            raise CommandError(
+                "%d milestones have the wrong counters" % len(wrong))
+        self.stdout.write("%d milestones %s" % (
+            len(wrong), "wrong" if options['verify'] else "fixed"))
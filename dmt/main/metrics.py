@@ -0,0 +1,173 @@
+""" the numbers that go to statsd on a timer. they all get collected
+by one periodic task (tasks.collect_metrics), which runs every minute,
+works out which of these are due, runs their queries in a single
+transaction and sends the results in as few packets as it can """
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django_statsd.clients import statsd
+from datetime import datetime, timedelta
+import time
+from .models import Item, ActualTime, User, timedelta_to_hours
+from .models import dashboard_item_counts
+from .rollups import (
+    hours_logged_by_project, hours_estimated_by_project,
+    hours_logged_by_milestone, hours_estimated_by_milestone)
+from dmt.claim.models import Claim
+
+# gauges that are only sent when they change still all get sent at
+# least this often (seconds), in case statsd has been restarted and
+# forgotten them
+RESEND_INTERVAL = 60 * 60
+
+# these always get a gauge, even when there aren't any items in them
+# (so the graph drops to zero). any other status gets one as soon as
+# an item has it
+ITEM_STATUSES = ['OPEN', 'INPROGRESS', 'RESOLVED', 'CLOSED', 'VERIFIED']
+
+
+def get_item_counts_by_status():
+    """ {lowercased status: number of items}, plus the total """
+    data = dict((status.lower(), 0) for status in ITEM_STATUSES)
+    for status, (n, estimate) in Item.objects.status_histogram().items():
+        data[status.lower()] = n
+    data['total'] = sum(data.values())
+    return data
+
+
+def item_counts():
+    d = dashboard_item_counts()
+    return dict(
+        total_open_items=d['total_open_items'],
+        open_sm_count=d['open_sm_items'],
+        estimates_sm=int(d['sm_hours_estimated']),
+        estimates_non_sm=int(d['non_sm_hours_estimated']))
+
+
+def hours_logged(weeks=1):
+    now = datetime.now()
+    one_week_ago = now - timedelta(weeks=weeks)
+    return int(
+        timedelta_to_hours(
+            ActualTime.objects.filter(
+                completed__gt=one_week_ago).total_time()))
+
+
+def item_gauges():
+    return dict(
+        ("items.%s" % status, n)
+        for status, n in get_item_counts_by_status().items())
+
+
+def estimate_gauges():
+    d = item_counts()
+    return {
+        'items.open.sm': d['open_sm_count'],
+        'estimates.sm': d['estimates_sm'],
+        'estimates.non_sm': d['estimates_non_sm'],
+    }
+
+
+def hours_gauges():
+    return {'hours.one_week': hours_logged()}
+
+
+def user_gauges():
+    return {
+        'users.active': User.objects.filter(
+            status='active', grp=False).count(),
+        'users.claimed': Claim.objects.count(),
+    }
+
+
+def estimated_vs_logged_gauges():
+    gauges = dict()
+    for name, totals in [
+            ("projects.%d.hours_estimated", hours_estimated_by_project()),
+            ("projects.%d.hours_logged", hours_logged_by_project()),
+            ("milestones.%d.hours_estimated",
+             hours_estimated_by_milestone()),
+            ("milestones.%d.hours_logged", hours_logged_by_milestone())]:
+        for pk, hours in totals.items():
+            gauges[name % pk] = int(hours)
+    return gauges
+
+
+class Metric(object):
+    """ a group of gauges that get collected together.
+
+    collect() returns {gauge name: value}. interval is how often (in
+    minutes) it's due, and can be overridden for each metric with
+    settings.METRICS_INTERVALS, eg {'estimated_vs_logged': 15}. with
+    changes_only set, a gauge is only sent when its value differs
+    from the last one sent """
+
+    def __init__(self, name, collect, interval=1, changes_only=False):
+        self.name = name
+        self.collect = collect
+        self.interval = interval
+        self.changes_only = changes_only
+
+    def get_interval(self):
+        return getattr(settings, 'METRICS_INTERVALS', dict()).get(
+            self.name, self.interval)
+
+    def is_due(self, minute):
+        return minute % self.get_interval() == 0
+
+    def changed(self, gauges, now=None):
+        """ the gauges that need sending, out of the ones just
+        collected """
+        if not self.changes_only:
+            return gauges
+        now = now or time.time()
+        key = "metrics.%s" % self.name
+        last = cache.get(key)
+        if last is None or last[0] < now - RESEND_INTERVAL:
+            # send the lot
+            cache.set(key, (now, gauges), None)
+            return gauges
+        resent, previous = last
+        cache.set(key, (resent, gauges), None)
+        return dict((k, v) for k, v in gauges.items()
+                    if previous.get(k) != v)
+
+
+METRICS = [
+    Metric('items', item_gauges),
+    Metric('estimates', estimate_gauges),
+    Metric('hours', hours_gauges),
+    Metric('users', user_gauges),
+    # thousands of these, and most don't move from one run to the next
+    Metric('estimated_vs_logged', estimated_vs_logged_gauges,
+           interval=5, changes_only=True),
+]
+
+
+def collect(minute, metrics=None):
+    """ {gauge name: value} for everything that's due this minute
+    (counting from the epoch) and has changed, if it needs to """
+    if metrics is None:
+        metrics = METRICS
+    due = [m for m in metrics if m.is_due(minute)]
+    collected = []
+    with transaction.atomic():
+        if connection.vendor == 'postgresql':
+            # one snapshot for all the queries, so the numbers agree
+            # with each other
+            connection.cursor().execute(
+                "SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, "
+                "READ ONLY")
+        for metric in due:
+            collected.append((metric, metric.collect()))
+    gauges = dict()
+    for metric, values in collected:
+        gauges.update(metric.changed(values))
+    return gauges
+
+
+def send(gauges, client=statsd):
+    """ the pipeline packs as many gauges into each packet as fit """
+    with client.pipeline() as pipe:
+        for name, value in sorted(gauges.items()):
+            pipe.gauge(name, value)
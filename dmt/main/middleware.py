@@ -0,0 +1,70 @@
+from django.conf import settings
+from django.db import connections
+from django_statsd.clients import statsd
+import inspect
+import logging
+import random
+
+logger = logging.getLogger(__name__)
+
+
+class QueryCountMiddleware(object):
+    """ how many SQL queries each view makes, and how long it spends
+    waiting on them, sent to statsd as timers next to
+    django_statsd's view timings:
+
+        view.queries.<module>.<view>.<method>
+        view.db_time.<module>.<view>.<method>
+
+    anything over settings.QUERY_BUDGET queries gets logged as well.
+    the queries have to be recorded (with the debug cursor) to be
+    counted, so only settings.QUERY_COUNT_SAMPLE_RATE (0 to 1) of
+    requests are looked at """
+
+    def process_request(self, request):
+        rate = getattr(settings, 'QUERY_COUNT_SAMPLE_RATE', 0)
+        if not rate or random.random() >= rate:
+            return
+        request._query_count_rate = rate
+        request._query_count_start = dict()
+        for connection in connections.all():
+            request._query_count_start[connection.alias] = (
+                connection.use_debug_cursor, len(connection.queries))
+            connection.use_debug_cursor = True
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view = view_func
+        if not inspect.isfunction(view_func):
+            view = view.__class__
+        request._query_count_view = "%s.%s" % (
+            view.__module__, view.__name__)
+
+    def process_response(self, request, response):
+        if not hasattr(request, '_query_count_start'):
+            return response
+        queries = []
+        for connection in connections.all():
+            debug, start = request._query_count_start.get(
+                connection.alias, (connection.use_debug_cursor, 0))
+            # (they get cleared out at the start of the next request)
+            queries.extend(connection.queries[start:])
+            connection.use_debug_cursor = debug
+        del request._query_count_start
+        view = getattr(request, '_query_count_view', None)
+        if view is not None:
+            # (no view if it was a 404, or some middleware redirected)
+            self.record(request, view, len(queries),
+                        sum(float(q['time']) for q in queries))
+        return response
+
+    def record(self, request, view, count, db_time):
+        key = "%s.%s" % (view, request.method)
+        rate = request._query_count_rate
+        statsd.timing("view.queries.%s" % key, count, rate)
+        statsd.timing("view.db_time.%s" % key, int(db_time * 1000), rate)
+        budget = getattr(settings, 'QUERY_BUDGET', None)
+        if budget is not None and count > budget:
+            logger.warning(
+                "%s %s made %d queries (%.0fms), over the budget of %d",
+                request.method, request.path, count, db_time * 1000,
+                budget)
@@ -1,12 +1,143 @@
-from django.db import models
+from django.db import models, connections, transaction, IntegrityError
+from django.db.models import Count, Sum, Q
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
 from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils import timezone
 from datetime import timedelta, datetime
 from interval.fields import IntervalField
 from taggit.managers import TaggableManager
-from django.core.mail import send_mail
 from django_statsd.clients import statsd
 from simpleduration import Duration, InvalidDuration
+from collections import OrderedDict
+import heapq
+from json import dumps, loads
 import textwrap
+from .mail import queue_email, send_emails
+from .personnel import cached_personnel, personnel_changed
+
+
+def interval_from_db(value):
+    """ SUM() over an IntervalField comes back from PostgreSQL
+    as a timedelta (it's a native INTERVAL column), but everywhere
+    else (ie, SQLite in the tests) the column is a BIGINT of
+    microseconds and we just get the raw number back. This
+    hides the difference. """
+    if value is None:
+        return timedelta()
+    if isinstance(value, timedelta):
+        return value
+    return timedelta(microseconds=int(value))
+
+
+def timedelta_to_hours(td):
+    return td.total_seconds() / 3600.
+
+
+class IntervalQuerySet(models.query.QuerySet):
+    """ queryset that can total up interval columns in the database
+    instead of pulling every row back into python """
+
+    def interval_sum(self, field):
+        total = self.aggregate(total=Sum(field))['total']
+        return interval_from_db(total)
+
+    def interval_sum_by(self, key, field):
+        """ {key: timedelta} for a GROUP BY on key """
+        return dict(
+            (row[key], interval_from_db(row['total']))
+            for row in self.order_by().values(key).annotate(
+                total=Sum(field)))
+
+
+class ActualTimeQuerySet(IntervalQuerySet):
+    def total_time(self):
+        return self.interval_sum('actual_time')
+
+    def total_time_by(self, key):
+        return self.interval_sum_by(key, 'actual_time')
+
+    def total_time_by_interval(self, intervals):
+        """ one timedelta per (start, end) pair (inclusive at both
+        ends), computed with a single GROUP BY over a CASE that
+        buckets each row into its interval. intervals must not
+        overlap. """
+        if not intervals:
+            return []
+        connection = connections[self.db]
+        completed = self.model._meta.get_field('completed')
+        column = "%s.%s" % (
+            connection.ops.quote_name(self.model._meta.db_table),
+            connection.ops.quote_name(completed.column))
+        cases = []
+        params = []
+        for (i, (start, end)) in enumerate(intervals):
+            cases.append("WHEN %s >= %%s AND %s <= %%s THEN %d" % (
+                column, column, i))
+            params.extend([completed.get_db_prep_value(start, connection),
+                           completed.get_db_prep_value(end, connection)])
+        totals = self.filter(
+            completed__gte=min(start for (start, end) in intervals),
+            completed__lte=max(end for (start, end) in intervals),
+        ).extra(
+            select={'bucket': "CASE %s END" % " ".join(cases)},
+            select_params=params,
+        ).interval_sum_by('bucket', 'actual_time')
+        return [totals.get(i, timedelta()) for i in range(len(intervals))]
+
+
+class ItemQuerySet(IntervalQuerySet):
+    def total_estimated_time(self):
+        return self.interval_sum('estimated_time')
+
+    def total_estimated_time_by(self, key):
+        return self.interval_sum_by(key, 'estimated_time')
+
+    def status_histogram(self):
+        """ {status: (number of items, total estimated time)}, from
+        one GROUP BY query. only the statuses that are in use show up """
+        return dict(
+            (r['status'], (r['n'], interval_from_db(r['estimate'])))
+            for r in self.order_by().values('status').annotate(
+                n=Count('iid'), estimate=Sum('estimated_time')))
+
+
+class ActualTimeManager(models.Manager):
+    def get_queryset(self):
+        return ActualTimeQuerySet(self.model, using=self._db)
+
+
+class ItemManager(models.Manager):
+    def get_queryset(self):
+        return ItemQuerySet(self.model, using=self._db)
+
+    def status_histogram(self):
+        return self.get_queryset().status_histogram()
+
+
+class UserQuerySet(models.query.QuerySet):
+    def with_group_members(self):
+        """ the active individual users in this queryset, along with
+        the active members of any active groups in it. one query, no
+        matter how many groups there are """
+        groups = self.filter(grp=True, status='active')
+        return User.objects.filter(status='active', grp=False).filter(
+            Q(pk__in=self.values('pk')) |
+            Q(ingroup__grp__in=groups.values('pk'))).distinct()
+
+
+class UserManager(models.Manager):
+    def get_queryset(self):
+        return UserQuerySet(self.model, using=self._db)
+
+
+NOTIFICATION_FREQUENCIES = (
+    ('immediate', 'Email me right away'),
+    ('hourly', 'Send me an hourly digest'),
+    ('daily', 'Send me a daily digest'),
+)
 
 
 class User(models.Model):
@@ -26,6 +157,11 @@ class User(models.Model):
     campus = models.TextField(blank=True)
     building = models.TextField(blank=True)
     room = models.TextField(blank=True)
+    notification_frequency = models.CharField(
+        max_length=16, choices=NOTIFICATION_FREQUENCIES,
+        default='immediate')
+
+    objects = UserManager()
 
     class Meta:
         db_table = u'users'
@@ -71,44 +207,46 @@ class User(models.Model):
         ).select_related('item', 'item__milestone', 'item__milestone__project')
 
     def total_resolve_times(self):
-        return interval_sum(
-            a.actual_time for a in ActualTime.objects.filter(
-                resolver=self)).total_seconds() / 3600.
+        return timedelta_to_hours(
+            ActualTime.objects.filter(resolver=self).total_time())
 
     def total_assigned_time(self):
-        return interval_sum(
-            [
-                i.estimated_time
-                for i in Item.objects.filter(
-                    assigned_to=self,
-                    status='OPEN')]).total_seconds() / 3600.
+        return timedelta_to_hours(
+            Item.objects.filter(
+                assigned_to=self,
+                status='OPEN').total_estimated_time())
 
     def interval_time(self, start, end):
-        return interval_sum(
-            [
-                a.actual_time
-                for a in self.resolve_times_for_interval(start, end)])
+        return self.resolve_times_for_interval(start, end).total_time()
 
     def weekly_report(self, week_start, week_end):
         # TODO: rename to something more generic now that this is
         # used for more than just weekly reports
-        active_projects = self.active_projects(week_start, week_end)
-        # google pie chart needs max
-        max_time = timedelta()
-        total_time = timedelta()
-        for project in active_projects:
-            pu = ProjectUser(project, self)
-            ptime = pu.completed_time_for_interval(week_start, week_end)
-            max_time = max(ptime, max_time)
-            total_time += ptime
-            project.time = ptime
-        return dict(
-            active_projects=active_projects,
-            max_time=max_time,
-            total_time=total_time,
-            individual_times=self.resolve_times_for_interval(
-                week_start, week_end),
-        )
+
+        # one query for all the times in the interval; the per-project
+        # totals all come out of the same rows
+        return times_report(list(
+            self.resolve_times_for_interval(week_start, week_end)))
+
+    def weekly_reports(self, intervals):
+        """ weekly_report() for each of the (start, end) intervals,
+        which mustn't overlap, from one query over all of them """
+        if not intervals:
+            return []
+        times = self.resolve_times_for_interval(
+            min(start for (start, end) in intervals),
+            max(end for (start, end) in intervals))
+        # the same bounds the query uses: after midnight at the start
+        # of the first day, up to midnight at the start of the last
+        bounds = [(midnight(start), midnight(end))
+                  for (start, end) in intervals]
+        pieces = [[] for i in intervals]
+        for a in times:
+            for (i, (start, end)) in enumerate(bounds):
+                if start < a.completed <= end:
+                    pieces[i].append(a)
+                    break
+        return [times_report(p) for p in pieces]
 
     def open_assigned_items(self):
         return Item.objects.filter(
@@ -184,19 +322,46 @@ class User(models.Model):
         return f.replace(" (group)", "")
 
 
+def midnight(d):
+    """ the start of the day d falls on, the way a filter on a
+    DateTimeField sees a date """
+    return timezone.make_aware(
+        datetime(d.year, d.month, d.day), timezone.get_default_timezone())
+
+
+def times_report(individual_times):
+    """ the totals for User.weekly_report(), from its ActualTimes """
+    projects = dict()
+    total_time = timedelta()
+    for a in individual_times:
+        pid = a.item.milestone.project_id
+        if pid not in projects:
+            projects[pid] = a.item.milestone.project
+            projects[pid].time = timedelta()
+        projects[pid].time += a.actual_time or timedelta()
+        total_time += a.actual_time or timedelta()
+    active_projects = set(projects.values())
+    # google pie chart needs max
+    max_time = max([p.time for p in active_projects] or [timedelta()])
+    return dict(
+        active_projects=active_projects,
+        max_time=max_time,
+        total_time=total_time,
+        individual_times=individual_times,
+    )
+
+
 class ProjectUser(object):
     def __init__(self, project, user):
         self.project = project
         self.user = user
 
     def completed_time_for_interval(self, start, end):
-        return interval_sum(
-            [
-                a.actual_time for a in ActualTime.objects.filter(
-                    resolver=self.user,
-                    item__milestone__project=self.project,
-                    completed__gt=start.date,
-                    completed__lte=end.date)])
+        return ActualTime.objects.filter(
+            resolver=self.user,
+            item__milestone__project=self.project,
+            completed__gt=start.date,
+            completed__lte=end.date).total_time()
 
 
 # before putting in the IntervalField, there were some
@@ -233,11 +398,17 @@ class Project(models.Model):
     distrib = models.CharField(max_length=20, blank=True)
     poster = models.BooleanField(default=False)
     wiki_category = models.CharField(max_length=256, blank=True)
+    # set on every save, for the sync feed
+    last_mod = models.DateTimeField(null=True, blank=True, db_index=True)
 
     class Meta:
         db_table = u'projects'
         ordering = ['name', ]
 
+    def save(self, *args, **kwargs):
+        self.last_mod = timezone.now()
+        super(Project, self).save(*args, **kwargs)
+
     def __unicode__(self):
         return self.name
 
@@ -290,11 +461,10 @@ class Project(models.Model):
         WorksOn.objects.filter(project=self, username=user).delete()
 
     def all_users_not_in_project(self):
-        already_in = set([w.username
-                          for w in WorksOn.objects.filter(project=self)])
-        all_users = set(User.objects.filter(status='active'))
-        return sorted(list(all_users - already_in),
-                      key=lambda x: x.fullname.lower())
+        return cached_personnel('others', self.pid, lambda: sorted(
+            User.objects.filter(status='active').exclude(
+                workson__project=self),
+            key=lambda x: x.fullname.lower()))
 
     def upcoming_milestone(self):
         # ideally, we want a milestone that is open, in the future,
@@ -392,27 +562,22 @@ author: %s
 -- \nthis message sent automatically by the PMT forum.
 to reply, please visit <https://dmt.ccnmtl.columbia.edu%s>\n"
         """ % (self.name, user.fullname, body, node.get_absolute_url())
-        addresses = [
-            u.email for u in self.all_personnel_in_project()
+        recipients = [
+            u for u in self.all_personnel_in_project()
             if u != user]
         subject = "[PMT Forum %s]: %s" % (self.name, node.subject)
         statsd.incr('main.email_sent')
-        send_mail(subject, body, user.email,
-                  addresses, fail_silently=settings.DEBUG)
+        notify(subject, body, user, recipients)
 
     def personnel_in_project(self):
-        return [
-            w.username for w in WorksOn.objects.filter(project=self)
-            if w.username.status == 'active']
+        return cached_personnel('direct', self.pid, lambda: list(
+            User.objects.filter(workson__project=self, status='active')))
 
     def all_personnel_in_project(self):
-        users = set([u for u in self.personnel_in_project()
-                     if not u.grp])
-        groups = [u for u in self.personnel_in_project()
-                  if u.grp]
-        for g in groups:
-            users.update(u.users_in_group())
-        return list(users)
+        """ everyone active on the project, with groups expanded """
+        return cached_personnel('all', self.pid, lambda: list(
+            User.objects.filter(
+                workson__project=self).with_group_members()))
 
     def current_date(self):
         """ very simple helper that makes it easier to set the
@@ -436,6 +601,53 @@ class Document(models.Model):
         db_table = u'documents'
 
 
+UNCLOSED_STATUSES = ['OPEN', 'INPROGRESS', 'RESOLVED']
+
+
+def milestone_counters(histogram):
+    """ the counter columns for one milestone, from the
+    status_histogram() of its items """
+    open_items, open_estimate = histogram.get('OPEN', (0, timedelta()))
+    return dict(
+        open_items=open_items,
+        unclosed_items=sum(histogram.get(s, (0,))[0]
+                           for s in UNCLOSED_STATUSES),
+        open_estimate=open_estimate)
+
+
+class MilestoneManager(models.Manager):
+    def recount(self, fix=True):
+        """ check every milestone's counters against its items, in
+        one pass over the items table. returns a list of
+        (milestone, what the counters should be) for the ones that
+        were wrong, after correcting them if fix is set """
+        histograms = dict()
+        for r in Item.objects.order_by().values(
+                'milestone', 'status').annotate(
+                n=Count('iid'), estimate=Sum('estimated_time')):
+            histograms.setdefault(r['milestone'], dict())[r['status']] = (
+                r['n'], interval_from_db(r['estimate']))
+        wrong = []
+        for m in self.all():
+            counters = milestone_counters(histograms.get(m.mid, dict()))
+            if m.counters() != counters:
+                wrong.append((m, counters))
+                if fix:
+                    self.filter(mid=m.mid).update(**counters)
+        return wrong
+
+    def passed_and_done(self):
+        """ open milestones whose target date has gone by, with
+        nothing left unclosed on them. the counter narrows it down,
+        but since this closes things, the items themselves get the
+        last word: a stale counter shouldn't close a milestone that
+        still has work on it """
+        return self.filter(
+            status='OPEN', unclosed_items=0,
+            target_date__lt=datetime.now().date()).exclude(
+            item__status__in=UNCLOSED_STATUSES)
+
+
 class Milestone(models.Model):
     mid = models.AutoField(primary_key=True)
     name = models.CharField(max_length=255)
@@ -443,11 +655,31 @@ class Milestone(models.Model):
     project = models.ForeignKey(Project, db_column='pid')
     status = models.CharField(max_length=8, default='OPEN')
     description = models.TextField(blank=True)
+    # denormalised from the items, by update_counters(). they can
+    # be checked with ./manage.py milestone_counters --verify
+    open_items = models.IntegerField(default=0)
+    unclosed_items = models.IntegerField(default=0)
+    open_estimate = IntervalField(default=timedelta())
+    # set on every save, for the sync feed
+    last_mod = models.DateTimeField(null=True, blank=True, db_index=True)
+
+    objects = MilestoneManager()
 
     class Meta:
         db_table = u'milestones'
         ordering = ['target_date', 'name', ]
 
+    def save(self, *args, **kwargs):
+        self.last_mod = timezone.now()
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            # the counters on this instance may be out of date by now.
+            # only update_counters() gets to write them
+            kwargs['update_fields'] = [
+                f.name for f in self._meta.fields
+                if not f.primary_key and f.name not in COUNTER_FIELDS]
+        super(Milestone, self).save(*args, **kwargs)
+        DashboardSnapshot.invalidate('milestones')
+
     def get_absolute_url(self):
         return "/milestone/%d/" % self.mid
 
@@ -457,13 +689,29 @@ class Milestone(models.Model):
     def is_open(self):
         return self.status == 'OPEN'
 
+    def counters(self):
+        return dict(
+            open_items=self.open_items,
+            unclosed_items=self.unclosed_items,
+            open_estimate=interval_from_db(self.open_estimate))
+
+    def update_counters(self):
+        """ recount this milestone's items. call it in the same
+        transaction as whatever changed them """
+        # lock the row first, so that two items changing at once
+        # can't both count before either has committed
+        list(Milestone.objects.select_for_update().filter(
+            mid=self.mid).values_list('mid'))
+        counters = milestone_counters(self.item_set.status_histogram())
+        Milestone.objects.filter(mid=self.mid).update(**counters)
+        for k, v in counters.items():
+            setattr(self, k, v)
+
     def num_open_items(self):
-        return self.item_set.filter(status='OPEN').count()
+        return self.open_items
 
     def estimated_time_remaining(self):
-        return interval_sum(
-            [i.estimated_time for i in self.item_set.filter(status='OPEN')]
-        ).total_seconds() / 3600.
+        return timedelta_to_hours(interval_from_db(self.open_estimate))
 
     def update_milestone(self):
         if self.should_be_closed():
@@ -492,8 +740,10 @@ class Milestone(models.Model):
         return self.target_date < datetime.now().date()
 
     def num_unclosed_items(self):
-        return self.item_set.filter(
-            status__in=['OPEN', 'INPROGRESS', 'RESOLVED']).count()
+        return self.unclosed_items
+
+
+COUNTER_FIELDS = ['open_items', 'unclosed_items', 'open_estimate']
 
 
 def priority_label_f(priority):
@@ -526,16 +776,53 @@ class Item(models.Model):
             (0, 'ICING'), (1, 'LOW'), (2, 'MEDIUM'),
             (3, 'HIGH'), (4, 'CRITICAL')])
     r_status = models.CharField(max_length=16, blank=True)
-    last_mod = models.DateTimeField(null=True, blank=True)
+    last_mod = models.DateTimeField(null=True, blank=True, db_index=True)
     target_date = models.DateField(null=True, blank=True)
     estimated_time = IntervalField(blank=True, null=True)
     url = models.TextField(blank=True)
 
     tags = TaggableManager()
 
+    objects = ItemManager()
+
     class Meta:
         db_table = u'items'
 
+    def __init__(self, *args, **kwargs):
+        super(Item, self).__init__(*args, **kwargs)
+        self._counted = self.counted_values()
+
+    def counted_values(self):
+        """ the fields that go into the milestone's counters """
+        return (self.milestone_id, self.status,
+                interval_from_db(self.estimated_time))
+
+    def save(self, *args, **kwargs):
+        adding = self._state.adding
+        if self.last_mod is None:
+            # so that it shows up in the sync feed
+            self.last_mod = datetime.now()
+        with transaction.atomic():
+            super(Item, self).save(*args, **kwargs)
+            if adding or self.counted_values() != self._counted:
+                self.update_milestone_counters()
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            super(Item, self).delete(*args, **kwargs)
+            self.update_milestone_counters()
+
+    def update_milestone_counters(self):
+        previous = self._counted[0]
+        self.milestone.update_counters()
+        if previous not in (None, self.milestone_id):
+            # moved from another milestone
+            Milestone.objects.get(mid=previous).update_counters()
+        self._counted = self.counted_values()
+        # the dashboard's open item counts and milestone estimates
+        # come out of the same fields as the counters
+        DashboardSnapshot.invalidate('items', 'milestones')
+
     def get_absolute_url(self):
         return "/item/%d/" % self.iid
 
@@ -558,12 +845,43 @@ class Item(models.Model):
         return self.type == "bug"
 
     def history(self):
-        """ interleave comments and events into one stream """
-        comments = [HistoryComment(c) for c in self.comment_set.all()]
-        events = [HistoryEvent(e) for e in self.events_set.all()]
-        merged = comments + events
-        merged.sort()
-        return merged
+        """ interleave comments and events into one stream.
+
+        three queries however long the history is: the events, all
+        the comments (on the item or on its events) and the users who
+        wrote them """
+        events = list(self.events_set.all())
+        event_comments = dict()
+        comments = []
+        for c in Comment.objects.filter(Q(item=self) | Q(event__item=self)):
+            if c.event_id is not None:
+                event_comments.setdefault(c.event_id, c)
+            if c.item_id == self.iid:
+                comments.append(c)
+        users = User.objects.in_bulk(
+            set(c.username for c in comments) |
+            set(c.username for c in event_comments.values()))
+
+        def commenter(c):
+            return c and users.get(c.username)
+
+        comments = sorted(HistoryComment(c, commenter(c)) for c in comments)
+        events = sorted(
+            HistoryEvent(e, event_comments.get(e.eid),
+                         commenter(event_comments.get(e.eid)))
+            for e in events)
+        return list(heapq.merge(comments, events))
+
+    def rendered_history(self):
+        """ the history table, cached until the item gets another
+        comment or event """
+        key = item_history_key(self.iid)
+        html = cache.get(key)
+        if html is None:
+            html = render_to_string(
+                'main/item_history.html', dict(history=self.history()))
+            cache.set(key, html, HISTORY_TIMEOUT)
+        return html
 
     def add_resolve_time(self, user, time):
         completed = datetime.now()
@@ -572,6 +890,7 @@ class Item(models.Model):
             resolver=user,
             actual_time=time,
             completed=completed)
+        DashboardSnapshot.invalidate('activity')
 
     def add_clients(self, clients):
         for c in clients:
@@ -748,19 +1067,15 @@ Please do not reply to this message.
             self.type, self.iid, self.title,
             body, self.type, self.get_absolute_url()
         )
-        addresses = [u.email for u in self.users_to_email(user)]
-        send_mail(email_subj, email_body, user.email,
-                  addresses, fail_silently=settings.DEBUG)
+        notify(email_subj, email_body, user, self.users_to_email(user))
         statsd.incr('main.email_sent')
 
     def users_to_email(self, skip=None):
+        """ everyone watching the item (or in a group that is) """
         return [
-            n.username
-            for n in Notify.objects.filter(
-                item=self)
-            if (n.username.status == 'active'
-                and not n.username.grp
-                and n.username != skip)]
+            u for u in User.objects.filter(
+                notify__item=self).with_group_members()
+            if u != skip]
 
     def copy_clients_to_new_item(self, new_item):
         for ic in self.itemclient_set.all():
@@ -827,8 +1142,10 @@ class HistoryItem(object):
 
 
 class HistoryEvent(HistoryItem):
-    def __init__(self, event):
+    def __init__(self, event, comment=None, user=None):
         self.event = event
+        self._comment = comment
+        self._user = user
 
     def timestamp(self):
         return self.event.event_date_time
@@ -840,21 +1157,26 @@ class HistoryEvent(HistoryItem):
         return self.event.status_class()
 
     def _get_comment(self):
-        r = self.event.comment_set.all()
-        if r.exists():
-            return r[0]
-        return None
+        if self._comment is None:
+            r = self.event.comment_set.all()
+            if r.exists():
+                self._comment = r[0]
+        return self._comment
 
     def comment(self):
         return self._get_comment().comment
 
     def user(self):
-        return User.objects.get(username=self._get_comment().username)
+        if self._user is None:
+            self._user = User.objects.get(
+                username=self._get_comment().username)
+        return self._user
 
 
 class HistoryComment(HistoryItem):
-    def __init__(self, comment):
+    def __init__(self, comment, user=None):
         self.c = comment
+        self._user = user
 
     def timestamp(self):
         return self.c.add_date_time
@@ -863,7 +1185,9 @@ class HistoryComment(HistoryItem):
         return self.c.comment
 
     def user(self):
-        return User.objects.get(username=self.c.username)
+        if self._user is None:
+            self._user = User.objects.get(username=self.c.username)
+        return self._user
 
 
 class Notify(models.Model):
@@ -920,7 +1244,7 @@ class Node(models.Model):
     type = models.CharField(max_length=8)
     overflow = models.BooleanField(default=False)
     added = models.DateTimeField()
-    modified = models.DateTimeField()
+    modified = models.DateTimeField(db_index=True)
     project = models.ForeignKey(Project, null=True, db_column='project')
 
     tags = TaggableManager()
@@ -964,8 +1288,7 @@ class Node(models.Model):
             "\n\n-- \nthis message sent automatically by the PMT forum.\n"
             "to reply, please visit <https://dmt.ccnmtl.columbia.edu%s>\n" % (
                 self.get_absolute_url()))
-        send_mail(subject, body, user.email,
-                  [self.author.email], fail_silently=settings.DEBUG)
+        notify(subject, body, user, [self.author])
         statsd.incr('main.email_sent')
 
     def touch(self):
@@ -1014,6 +1337,16 @@ class InGroup(models.Model):
         db_table = u'in_group'
 
 
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+@receiver(post_save, sender=WorksOn)
+@receiver(post_delete, sender=WorksOn)
+@receiver(post_save, sender=InGroup)
+@receiver(post_delete, sender=InGroup)
+def personnel_saved(sender, **kwargs):
+    personnel_changed()
+
+
 class ProjectClient(models.Model):
     pid = models.ForeignKey(Project, db_column='pid')
     client = models.ForeignKey(Client)
@@ -1029,6 +1362,8 @@ class ActualTime(models.Model):
     actual_time = IntervalField(null=True, blank=True)
     completed = models.DateTimeField(primary_key=True)
 
+    objects = ActualTimeManager()
+
     class Meta:
         db_table = u'actual_times'
 
@@ -1074,6 +1409,37 @@ class Comment(models.Model):
         ordering = ['add_date_time', ]
 
 
+# the rendered history shows users' names, which can change without
+# the item hearing about it, so it doesn't get kept forever
+HISTORY_TIMEOUT = 24 * 60 * 60
+
+
+def item_history_key(iid):
+    return "main.item_history.%d" % iid
+
+
+@receiver(post_save, sender=Item)
+@receiver(post_delete, sender=Item)
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+@receiver(post_save, sender=Events)
+@receiver(post_delete, sender=Events)
+def history_changed(sender, instance, **kwargs):
+    if sender == Item:
+        iid = instance.iid
+    elif sender == Comment and instance.event_id is not None:
+        try:
+            iid = instance.event.item_id
+        except Events.DoesNotExist:
+            # going in a cascade from its event, which clears the
+            # history itself
+            return
+    else:
+        iid = instance.item_id
+    if iid is not None:
+        cache.delete(item_history_key(iid))
+
+
 class StatusUpdate(models.Model):
     project = models.ForeignKey(Project)
     user = models.ForeignKey(User)
@@ -1088,3 +1454,224 @@ class StatusUpdate(models.Model):
 
     def __unicode__(self):
         return "%s - %s" % (self.project.name, self.user.fullname)
+
+    def save(self, *args, **kwargs):
+        super(StatusUpdate, self).save(*args, **kwargs)
+        DashboardSnapshot.invalidate('status_updates')
+
+    def delete(self, *args, **kwargs):
+        super(StatusUpdate, self).delete(*args, **kwargs)
+        DashboardSnapshot.invalidate('status_updates')
+
+
+def open_item_totals(histogram):
+    """ (number of items, hours estimated) over the OPEN and
+    INPROGRESS rows of a status_histogram() """
+    rows = [histogram.get(s, (0, timedelta()))
+            for s in ['OPEN', 'INPROGRESS']]
+    return (sum(n for n, estimate in rows),
+            timedelta_to_hours(sum((e for n, e in rows), timedelta())))
+
+
+def dashboard_item_counts():
+    total_count, total_hours_estimated = open_item_totals(
+        Item.objects.status_histogram())
+    sm_count, sm_hours_estimated = open_item_totals(
+        Item.objects.filter(
+            milestone__name='Someday/Maybe').status_histogram())
+    return dict(
+        total_open_items=total_count,
+        open_sm_items=sm_count,
+        open_non_sm_items=total_count - sm_count,
+        sm_hours_estimated=sm_hours_estimated,
+        non_sm_hours_estimated=total_hours_estimated - sm_hours_estimated)
+
+
+def dashboard_milestones():
+    """ recent/upcoming milestones as [mid, hours remaining, open items] """
+    now = datetime.now()
+    return [
+        [mid, timedelta_to_hours(interval_from_db(estimate)), count]
+        for mid, estimate, count in Milestone.objects.filter(
+            target_date__gt=now - timedelta(weeks=4),
+            target_date__lt=now + timedelta(weeks=4),
+        ).order_by("target_date").values_list(
+            'mid', 'open_estimate', 'open_items')]
+
+
+def most_active(times, threshold=10.):
+    """ [[pk, hours], ...] for the keys of times ({pk: timedelta}, as
+    returned by total_time_by()) with more than threshold hours
+    logged, busiest first """
+    hours = [[pk, timedelta_to_hours(t)] for (pk, t) in times.items()]
+    return sorted([h for h in hours if h[1] > threshold],
+                  key=lambda x: x[1], reverse=True)
+
+
+def dashboard_activity():
+    now = datetime.now()
+    recent_times = ActualTime.objects.filter(
+        completed__gt=now - timedelta(weeks=2))
+
+    # week by week breakdown
+    week_start = now + timedelta(days=-now.weekday())
+    week_end = week_start + timedelta(days=6)
+
+    weeks = [
+        (week_start, now),
+        (week_start - timedelta(weeks=1), week_end - timedelta(weeks=1)),
+        (week_start - timedelta(weeks=2), week_end - timedelta(weeks=2)),
+        (week_start - timedelta(weeks=3), week_end - timedelta(weeks=3)),
+    ]
+    return dict(
+        projects=most_active(
+            recent_times.total_time_by('item__milestone__project')),
+        users=most_active(recent_times.total_time_by('resolver')),
+        breakdowns=[
+            timedelta_to_hours(t)
+            for t in ActualTime.objects.all().total_time_by_interval(weeks)])
+
+
+def dashboard_status_updates():
+    return list(StatusUpdate.objects.filter(
+        added__gte=datetime.now() - timedelta(weeks=2),
+    ).values_list('id', flat=True))
+
+
+DASHBOARD_SECTIONS = {
+    'items': dashboard_item_counts,
+    'milestones': dashboard_milestones,
+    'activity': dashboard_activity,
+    'status_updates': dashboard_status_updates,
+}
+
+
+class DashboardSnapshot(models.Model):
+    """ one precomputed section of the dashboard, stored as JSON.
+
+    tasks.rebuild_dashboard_snapshot refreshes all of them every five
+    minutes, and that's the only guarantee. on top of that, the usual
+    changes delete just the sections they affect, and the next
+    dashboard request rebuilds whatever is missing: saving or deleting
+    an item (when its status, estimate or milestone changes), saving
+    a milestone, closing the passed milestones, logging time and
+    status updates. cascading deletes and other bulk changes wait for
+    the rebuild. """
+    section = models.CharField(max_length=32, primary_key=True)
+    data = models.TextField()
+    created = models.DateTimeField()
+
+    def get_data(self):
+        return loads(self.data)
+
+    @classmethod
+    def build(cls, section):
+        snapshot = cls(
+            section=section,
+            data=dumps(DASHBOARD_SECTIONS[section]()),
+            created=timezone.now())
+        try:
+            with transaction.atomic():
+                snapshot.save()
+        except IntegrityError:
+            # another request rebuilt it at the same moment.
+            # ours is just as fresh, so don't worry about it
+            pass
+        return snapshot
+
+    @classmethod
+    def rebuild(cls):
+        return dict((s, cls.build(s)) for s in DASHBOARD_SECTIONS.keys())
+
+    @classmethod
+    def current(cls):
+        """ {section: snapshot}, building any that are missing """
+        snapshots = dict((s.section, s) for s in cls.objects.all())
+        for section in DASHBOARD_SECTIONS.keys():
+            if section not in snapshots:
+                snapshots[section] = cls.build(section)
+        return snapshots
+
+    @classmethod
+    def invalidate(cls, *sections):
+        cls.objects.filter(section__in=sections).delete()
+
+
+def notify(subject, body, sender, recipients):
+    """ email each of the recipients, or hold it for their digest if
+    that's what they've asked for """
+    queue_email(
+        subject, body, sender.email,
+        [u.email for u in recipients
+         if u.notification_frequency == 'immediate'])
+    PendingNotification.objects.bulk_create([
+        PendingNotification(user=u, subject=subject, body=body)
+        for u in recipients if u.notification_frequency != 'immediate'])
+
+
+class PendingNotificationManager(models.Manager):
+    def send_digests(self, frequencies):
+        """ one email per user (with one of these notification
+        frequencies) covering everything that's piled up for them.
+        returns the number of digests sent """
+        pending = self.filter(
+            user__notification_frequency__in=frequencies).select_related(
+            'user').order_by('user', 'added', 'id')
+        by_user = OrderedDict()
+        for n in pending:
+            by_user.setdefault(n.user, []).append(n)
+        messages = [
+            (digest_subject(notifications),
+             render_to_string('main/digest_email.txt',
+                              dict(user=user, notifications=notifications)),
+             settings.DEFAULT_FROM_EMAIL, [user.email])
+            for user, notifications in by_user.items()]
+        if messages:
+            send_emails.delay(messages)
+        # only the ones that went into a digest. more may have
+        # turned up in the meantime
+        self.filter(
+            id__in=[n.id for ns in by_user.values() for n in ns]).delete()
+        return len(messages)
+
+
+def digest_subject(notifications):
+    if len(notifications) == 1:
+        return notifications[0].subject
+    return "[PMT] %d updates" % len(notifications)
+
+
+class PendingNotification(models.Model):
+    """ a notification waiting to go out in a user's digest """
+    user = models.ForeignKey(User)
+    subject = models.TextField()
+    body = models.TextField()
+    added = models.DateTimeField(default=timezone.now)
+
+    objects = PendingNotificationManager()
+
+
+class Tombstone(models.Model):
+    """ a deleted item, milestone, project or node, so that the sync
+    feed can tell clients it's gone (see sync.py). they get pruned
+    after sync.TOMBSTONE_DAYS """
+    type = models.CharField(max_length=16)
+    object_id = models.IntegerField()
+    deleted = models.DateTimeField(default=timezone.now, db_index=True)
+
+
+TOMBSTONE_TYPES = {
+    Item: 'items',
+    Milestone: 'milestones',
+    Project: 'projects',
+    Node: 'nodes',
+}
+
+
+@receiver(post_delete, sender=Item)
+@receiver(post_delete, sender=Milestone)
+@receiver(post_delete, sender=Project)
+@receiver(post_delete, sender=Node)
+def leave_tombstone(sender, instance, **kwargs):
+    Tombstone.objects.create(
+        type=TOMBSTONE_TYPES[sender], object_id=instance.pk)
@@ -0,0 +1,160 @@
+""" keyset ("cursor") pagination for the /drf/ list endpoints.
+
+a page is found by filtering on where the last one left off, instead
+of with an OFFSET, so a deep page costs the same as the first one.
+the cursor in the next/previous links holds the ordering values of
+the row at the edge of the page. there's no count either, since that
+would be a scan of the whole table as well.
+
+the ordering has to end in a unique field (usually the primary key),
+and none of its fields can be null """
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.http import Http404
+from rest_framework import serializers
+from rest_framework.pagination import BasePaginationSerializer
+from rest_framework.templatetags.rest_framework import replace_query_param
+import base64
+import json
+import operator
+
+CURSOR_PARAM = 'cursor'
+
+
+def encode_cursor(backwards, values):
+    return base64.urlsafe_b64encode(json.dumps([backwards, values]))
+
+
+def decode_cursor(cursor):
+    """ (backwards, [values]) """
+    try:
+        backwards, values = json.loads(base64.urlsafe_b64decode(
+            str(cursor)))
+    except (TypeError, ValueError):
+        raise Http404("invalid cursor")
+    if not isinstance(values, list):
+        raise Http404("invalid cursor")
+    return bool(backwards), values
+
+
+def reverse_ordering(ordering):
+    return [name[1:] if name.startswith('-') else '-' + name
+            for name in ordering]
+
+
+def after(ordering, values):
+    """ a Q for the rows that come after values, in ordering. ie, for
+    ('a', 'b'): a > x OR (a = x AND b > y) """
+    clauses = []
+    for i, name in enumerate(ordering):
+        lookup = 'lt' if name.startswith('-') else 'gt'
+        clause = Q(**{'%s__%s' % (name.lstrip('-'), lookup): values[i]})
+        for previous, value in zip(ordering[:i], values):
+            clause &= Q(**{previous.lstrip('-'): value})
+        clauses.append(clause)
+    return reduce(operator.or_, clauses)
+
+
+class CursorPage(object):
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+
+class Paginator(object):
+    def __init__(self, queryset, ordering, page_size):
+        self.queryset = queryset
+        self.ordering = ordering
+        self.page_size = page_size
+        self.fields = [queryset.model._meta.get_field(name.lstrip('-'))
+                       for name in ordering]
+
+    def values(self, obj):
+        return [f.value_to_string(obj) for f in self.fields]
+
+    def parse(self, cursor):
+        """ (backwards, the ordering values it points at) """
+        if cursor is None:
+            return False, None
+        backwards, values = decode_cursor(cursor)
+        # none of the ordering fields can be null, so a null can only
+        # come from a cursor someone made up
+        if len(values) != len(self.fields) or None in values:
+            raise Http404("invalid cursor")
+        try:
+            return backwards, [
+                f.to_python(v) for f, v in zip(self.fields, values)]
+        except (ValidationError, TypeError, ValueError):
+            raise Http404("invalid cursor")
+
+    def page(self, cursor=None):
+        backwards, values = self.parse(cursor)
+        ordering = self.ordering
+        if backwards:
+            ordering = reverse_ordering(ordering)
+        queryset = self.queryset.order_by(*ordering)
+        if values is not None:
+            queryset = queryset.filter(after(ordering, values))
+        # one extra, to see if there are any more
+        rows = list(queryset[:self.page_size + 1])
+        more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if backwards:
+            rows.reverse()
+        return self.make_page(rows, more, backwards, values is not None)
+
+    def make_page(self, rows, more, backwards, from_cursor):
+        # going forwards, there's a previous page if we came from a
+        # cursor, and a next one if there are more rows. it's the
+        # other way around going backwards
+        has_next, has_previous = more, from_cursor
+        if backwards:
+            has_next, has_previous = from_cursor, more
+        page = CursorPage(rows)
+        if rows and has_next:
+            page.next_cursor = encode_cursor(False, self.values(rows[-1]))
+        if rows and has_previous:
+            page.previous_cursor = encode_cursor(True, self.values(rows[0]))
+        return page
+
+
+class CursorLinkField(serializers.Field):
+    attr = None
+
+    def to_native(self, page):
+        cursor = getattr(page, self.attr)
+        if cursor is None:
+            return None
+        request = self.context.get('request')
+        url = request and request.build_absolute_uri() or ''
+        return replace_query_param(url, CURSOR_PARAM, cursor)
+
+
+class NextCursorField(CursorLinkField):
+    attr = 'next_cursor'
+
+
+class PreviousCursorField(CursorLinkField):
+    attr = 'previous_cursor'
+
+
+class CursorPaginationSerializer(BasePaginationSerializer):
+    next = NextCursorField(source='*')
+    previous = PreviousCursorField(source='*')
+
+
+class CursorPaginationMixin(object):
+    """ for a list view, in place of drf's page numbers. ordering is
+    the order the pages go in (see the top of the module) and
+    paginate_by is how many go on each """
+    ordering = ()
+    paginate_by = 20
+    pagination_serializer_class = CursorPaginationSerializer
+
+    def paginate_queryset(self, queryset, page_size=None):
+        page_size = page_size or self.get_paginate_by()
+        if not page_size:
+            return None
+        return Paginator(queryset, self.ordering, page_size).page(
+            self.request.QUERY_PARAMS.get(CURSOR_PARAM))
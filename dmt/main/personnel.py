@@ -0,0 +1,33 @@
+from django.core.cache import cache
+import uuid
+
+VERSION_KEY = 'main.personnel.version'
+
+
+def personnel_changed():
+    """ somebody joined/left a project or a group, or a user changed.
+
+    group membership can touch any number of projects, so rather
+    than work out which ones, every project's cached personnel gets
+    thrown out at once by moving to a new version """
+    version = uuid.uuid4().hex
+    cache.set(VERSION_KEY, version, None)
+    return version
+
+
+def personnel_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        version = personnel_changed()
+    return version
+
+
+def cached_personnel(name, pid, compute):
+    """ compute() (a list of users) for the project, from the cache
+    if none of the personnel have changed since it was put there """
+    key = "main.personnel.%s.%s.%d" % (personnel_version(), name, pid)
+    users = cache.get(key)
+    if users is None:
+        users = compute()
+        cache.set(key, users, None)
+    return users
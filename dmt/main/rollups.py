@@ -0,0 +1,48 @@
+""" hours logged and (open) hours estimated, totalled up for every
+project or milestone at once.
+
+the sums happen in the database, through IntervalQuerySet, so these
+work on any backend: postgresql adds up its native interval columns,
+everywhere else (ie, SQLite in the tests) they're BIGINTs of
+microseconds, and interval_from_db() evens out the difference. """
+from .models import ActualTime, Item, timedelta_to_hours
+
+
+def in_hours(totals):
+    return dict((k, timedelta_to_hours(v)) for k, v in totals.items())
+
+
+def hours_logged_by_project():
+    """ {pid: hours} """
+    return in_hours(
+        ActualTime.objects.all().total_time_by('item__milestone__project'))
+
+
+def hours_estimated_by_project():
+    """ {pid: hours} """
+    return in_hours(
+        Item.objects.filter(status='OPEN').total_estimated_time_by(
+            'milestone__project'))
+
+
+def hours_logged_by_milestone(project=None):
+    """ {mid: hours}, for one project's milestones or all of them """
+    times = ActualTime.objects.all()
+    if project is not None:
+        times = times.filter(item__milestone__project=project)
+    return in_hours(times.total_time_by('item__milestone'))
+
+
+def hours_estimated_by_milestone(project=None):
+    """ {mid: hours}, for one project's milestones or all of them """
+    items = Item.objects.filter(status='OPEN')
+    if project is not None:
+        items = items.filter(milestone__project=project)
+    return in_hours(items.total_estimated_time_by('milestone'))
+
+
+def hours_assigned_by_user():
+    """ {username: hours} of open items assigned to each user """
+    return in_hours(
+        Item.objects.filter(status='OPEN').total_estimated_time_by(
+            'assigned_to'))
@@ -1,4 +1,4 @@
-from .models import User, Client, Project, Milestone, Item
+from .models import User, Client, Project, Milestone, Item, Node
 from rest_framework import serializers
 
 
@@ -32,8 +32,9 @@ class ProjectSerializer(serializers.HyperlinkedModelSerializer):
                   'description', 'status', 'type', 'area',
                   'url', 'restricted', 'approach', 'info_url',
                   'entry_rel', 'eval_url', 'projnum', 'scale',
-                  'distrib', 'poster', 'wiki_category',
+                  'distrib', 'poster', 'wiki_category', 'last_mod',
                   'milestone_set')
+        read_only_fields = ('last_mod',)
 
 
 class MilestoneSerializer(serializers.HyperlinkedModelSerializer):
@@ -45,7 +46,8 @@ class MilestoneSerializer(serializers.HyperlinkedModelSerializer):
     class Meta:
         model = Milestone
         fields = ('mid', 'name', 'target_date', 'project', 'status',
-                  'description', 'item_set')
+                  'description', 'last_mod', 'item_set')
+        read_only_fields = ('last_mod',)
 
 
 class ItemSerializer(serializers.HyperlinkedModelSerializer):
@@ -55,3 +57,11 @@ class ItemSerializer(serializers.HyperlinkedModelSerializer):
                   'milestone', 'status', 'description', 'priority',
                   'r_status', 'last_mod', 'target_date', 'estimated_time',
                   'url')
+
+
+class NodeSerializer(serializers.ModelSerializer):
+    """ only used by the sync feed. there's no /drf/nodes/ to link to """
+    class Meta:
+        model = Node
+        fields = ('nid', 'subject', 'body', 'author', 'reply_to',
+                  'replies', 'type', 'project', 'added', 'modified')
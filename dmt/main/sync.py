@@ -0,0 +1,166 @@
+""" the change feed behind /drf/changes/<type>/, for clients that
+keep their own copy of the items, milestones, projects or forum nodes
+and only want what's changed since they last looked.
+
+a client starts by asking for the feed with no watermark. that gets it
+a watermark for now, and it then downloads everything through the
+normal /drf/ lists. after that it asks for ?since=<watermark>, and gets
+back what's been saved or deleted since, oldest first, and a new
+watermark. it keeps following them until there aren't any more.
+
+changes are ordered by the modification time (last_mod, or modified
+on nodes), then by primary key, and deletions by their Tombstone.
+the watermark is where the last page left off in that ordering,
+the same way the keyset pagination works (see pagination.py).
+
+anything from the last SETTLE seconds is held back. last_mod comes
+from the clock when the object is saved, not when the transaction
+commits, so a slow transaction could otherwise show up behind a
+watermark that's already been handed out. """
+from django.http import Http404
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from datetime import timedelta
+from .models import Item, Milestone, Project, Node, Tombstone
+from .pagination import after, encode_cursor, decode_cursor
+from .serializers import (
+    ItemSerializer, MilestoneSerializer, ProjectSerializer, NodeSerializer)
+
+SETTLE = 5
+# a client that's been away for longer than this has to start over
+TOMBSTONE_DAYS = 90
+PAGE_SIZE = 100
+
+# changes to objects sort before deletions at the same moment
+SAVED, DELETED = 0, 1
+
+
+class WatermarkExpired(Exception):
+    pass
+
+
+class Watermark(object):
+    """ a point in the feed: everything up to (modified, kind, pk) """
+
+    def __init__(self, modified, kind=DELETED, pk=None):
+        self.modified = modified
+        self.kind = kind
+        self.pk = pk
+
+    def encode(self):
+        return encode_cursor(False, [
+            self.modified.isoformat(), self.kind, self.pk])
+
+    @classmethod
+    def decode(cls, token):
+        backwards, values = decode_cursor(token)
+        try:
+            modified, kind, pk = values
+            modified = parse_datetime(modified)
+        except (TypeError, ValueError):
+            raise Http404("invalid watermark")
+        if modified is None or kind not in (SAVED, DELETED):
+            raise Http404("invalid watermark")
+        if not valid_pk(kind, pk):
+            raise Http404("invalid watermark")
+        return cls(modified, kind, pk)
+
+
+def valid_pk(kind, pk):
+    """ a primary key, or no pk at all for the start of a moment's
+    deletions (as in a watermark from Feed.changes(None)). saved
+    objects are always placed by their pk """
+    if pk is None:
+        return kind == DELETED
+    return isinstance(pk, (int, long)) and not isinstance(pk, bool)
+
+
+class Change(object):
+    def __init__(self, kind, modified, pk, obj=None):
+        self.kind = kind
+        self.modified = modified
+        self.pk = pk
+        self.obj = obj
+
+    def key(self):
+        return (self.modified, self.kind, self.pk)
+
+    def watermark(self):
+        return Watermark(self.modified, self.kind, self.pk)
+
+
+class Feed(object):
+    def __init__(self, type, queryset, modified, serializer_class):
+        self.type = type
+        self.queryset = queryset
+        self.modified = modified
+        self.serializer_class = serializer_class
+
+    def saved(self, since, until, n):
+        """ the first n objects saved after since """
+        pk = self.queryset.model._meta.pk.name
+        if since.kind == SAVED:
+            q = after((self.modified, pk), (since.modified, since.pk))
+        else:
+            q = after((self.modified,), (since.modified,))
+        objects = self.queryset.filter(q).filter(**{
+            '%s__lte' % self.modified: until}).order_by(self.modified, pk)
+        return [Change(SAVED, getattr(o, self.modified), o.pk, o)
+                for o in objects[:n]]
+
+    def deleted(self, since, until, n):
+        """ the first n objects deleted after since """
+        if since.kind == DELETED:
+            q = after(('deleted', 'id'), (since.modified, since.pk or 0))
+        else:
+            # all the deletions at that moment come after it
+            q = after(('deleted',), (since.modified - timedelta.resolution,))
+        tombstones = Tombstone.objects.filter(
+            q, type=self.type, deleted__lte=until).order_by('deleted', 'id')
+        return [Change(DELETED, t.deleted, t.id, t.object_id)
+                for t in tombstones[:n]]
+
+    def changes(self, since, n=PAGE_SIZE, now=None):
+        """ ([Change], watermark, more), for up to n changes """
+        now = now or timezone.now()
+        until = now - timedelta(seconds=SETTLE)
+        if since is None:
+            return [], Watermark(until), False
+        if since.modified < now - timedelta(days=TOMBSTONE_DAYS):
+            raise WatermarkExpired()
+        changes = sorted(self.saved(since, until, n + 1) +
+                         self.deleted(since, until, n + 1),
+                         key=Change.key)
+        more = len(changes) > n
+        changes = changes[:n]
+        if not changes:
+            # nothing new. the client stays where it is
+            return [], since, False
+        return changes, changes[-1].watermark(), more
+
+    def serialize(self, change, context):
+        if change.kind == DELETED:
+            return dict(id=change.obj, deleted=True,
+                        modified=change.modified)
+        return dict(
+            id=change.pk, deleted=False, modified=change.modified,
+            object=self.serializer_class(change.obj, context=context).data)
+
+
+FEEDS = dict((feed.type, feed) for feed in [
+    Feed('items', Item.objects.select_related(
+        'owner', 'assigned_to', 'milestone'), 'last_mod', ItemSerializer),
+    Feed('milestones', Milestone.objects.select_related(
+        'project').prefetch_related('item_set'), 'last_mod',
+        MilestoneSerializer),
+    Feed('projects', Project.objects.select_related(
+        'caretaker').prefetch_related('milestone_set'), 'last_mod',
+        ProjectSerializer),
+    Feed('nodes', Node.objects.all(), 'modified', NodeSerializer),
+])
+
+
+def prune_tombstones(now=None):
+    now = now or timezone.now()
+    return Tombstone.objects.filter(
+        deleted__lt=now - timedelta(days=TOMBSTONE_DAYS)).delete()
@@ -0,0 +1,263 @@
+""" a synthetic PMT, big enough to reproduce production slowness
+locally (see the generate_synthetic_pmt command).
+
+every row is built with the test factories, so the data looks like
+what the tests use, but nothing gets saved one object at a time: they
+go in with bulk_create, a batch at a time. that also means none of the
+save()/signal bookkeeping happens, so finish() redoes it all at the
+end, in bulk. """
+from django.core.cache import cache
+from django.core.management.color import no_style
+from django.db import connection, reset_queries
+from django.utils.timezone import utc
+from datetime import datetime, timedelta
+import random
+from .models import (
+    User, Project, Milestone, Item, Events, Comment, ActualTime, Node,
+    WorksOn, StatusUpdate, Client, DashboardSnapshot)
+from .tests.factories import (
+    UserFactory, ProjectFactory, MilestoneFactory, ItemFactory,
+    EventFactory, CommentFactory, ActualTimeFactory, NodeFactory,
+    StatusUpdateFactory, ClientFactory)
+
+# roughly production's proportions
+SIZES = dict(
+    users=2000,
+    projects=3000,
+    milestones=15000,
+    items=200000,
+    events=200000,
+    # on items. each event gets one of its own as well
+    comments=300000,
+    times=300000,
+    nodes=20000,
+    status_updates=5000,
+    clients=2000,
+)
+
+# rows per bulk_create call
+BATCH = 1000
+
+# how far back the synthetic history goes
+HISTORY = timedelta(days=3 * 365)
+
+ITEM_STATUSES = (['OPEN'] * 4 + ['INPROGRESS'] + ['RESOLVED'] * 2 +
+                 ['VERIFIED'] * 8)
+WORDS = ("website course video archive migration redesign assessment "
+         "workshop wiki mobile survey portal upgrade server library "
+         "media syllabus podcast launch review").split()
+
+
+def scaled(sizes, scale):
+    return dict((k, max(int(v * scale), 1)) for k, v in sizes.items())
+
+
+def bulk(model, objects):
+    """ save objects, BATCH at a time, as they're built """
+    batch = []
+    for o in objects:
+        batch.append(o)
+        if len(batch) == BATCH:
+            model.objects.bulk_create(batch)
+            # with DEBUG on, every one of these queries would
+            # otherwise be kept around until the command exits
+            reset_queries()
+            batch = []
+    model.objects.bulk_create(batch)
+    reset_queries()
+
+
+class SyntheticPMT(object):
+    """ generate() fills the database with sizes (see SIZES) worth of
+    users, projects and so on. the same seed makes the same PMT.
+    usernames all start with prefix, so that a second run can go
+    alongside the first """
+
+    def __init__(self, sizes=None, seed=0, prefix='synth'):
+        self.sizes = sizes or SIZES
+        self.random = random.Random(seed)
+        self.prefix = prefix
+        self.now = datetime.now().replace(tzinfo=utc)
+
+    def generate(self, log=None):
+        for step in [self.users, self.projects, self.milestones,
+                     self.items, self.events, self.comments, self.times,
+                     self.nodes, self.status_updates, self.clients,
+                     self.finish]:
+            step()
+            if log is not None:
+                log(step.__name__)
+
+    def title(self):
+        return " ".join(self.random.sample(WORDS, 3)).capitalize()
+
+    def when(self):
+        """ some time in the last HISTORY, more of it recent """
+        return self.now - timedelta(
+            seconds=HISTORY.total_seconds() * self.random.random() ** 2)
+
+    def user(self):
+        return User(username=self.random.choice(self.usernames))
+
+    def users(self):
+        self.usernames = [
+            "%s%d" % (self.prefix, i) for i in range(self.sizes['users'])]
+        bulk(User, (
+            UserFactory.build(
+                username=username, fullname="Synthetic %s" % username,
+                email="%s@example.com" % username,
+                status=self.random.choice(['active'] * 9 + ['inactive']))
+            for username in self.usernames))
+
+    def projects(self):
+        self.personnel = dict()
+        projects = []
+        for i in range(self.sizes['projects']):
+            project = ProjectFactory.build(
+                name="%s %d" % (self.title(), i), caretaker=self.user(),
+                status=self.random.choice(['active', 'complete']))
+            projects.append(project)
+            self.personnel[project.pid] = self.random.sample(
+                self.usernames, min(self.random.randint(1, 8),
+                                    len(self.usernames)))
+        bulk(Project, projects)
+        bulk(WorksOn, (
+            WorksOn(project_id=pid, username_id=username,
+                    auth='manager' if i == 0 else 'developer')
+            for pid, usernames in self.personnel.items()
+            for i, username in enumerate(usernames)))
+
+    def milestones(self):
+        # (mid, pid)
+        self.mids = []
+        pids = list(self.personnel.keys())
+        milestones = []
+        for i in range(self.sizes['milestones']):
+            # every project gets one before any gets a second
+            pid = pids[i] if i < len(pids) else self.random.choice(pids)
+            target = self.when() + timedelta(days=365)
+            milestone = MilestoneFactory.build(
+                project=Project(pid=pid), target_date=target.date(),
+                status='OPEN' if target > self.now else 'CLOSED')
+            self.mids.append((milestone.mid, pid))
+            milestones.append(milestone)
+        bulk(Milestone, milestones)
+
+    def items(self):
+        self.iids = []
+        bulk(Item, (self.item() for i in range(self.sizes['items'])))
+
+    def item(self):
+        mid, pid = self.random.choice(self.mids)
+        people = self.personnel[pid]
+        last_mod = self.when()
+        item = ItemFactory.build(
+            milestone=Milestone(mid=mid),
+            owner=User(username=self.random.choice(people)),
+            assigned_to=User(username=self.random.choice(people)),
+            title=self.title(), type=self.random.choice(
+                ['bug', 'action item', 'action item']),
+            status=self.random.choice(ITEM_STATUSES),
+            priority=self.random.randint(0, 4), last_mod=last_mod,
+            target_date=(last_mod + timedelta(days=30)).date(),
+            estimated_time=timedelta(hours=self.random.randint(0, 16)))
+        self.iids.append(item.iid)
+        return item
+
+    def events(self):
+        eids = []
+        bulk(Events, (self.event(eids)
+                      for i in range(self.sizes['events'])))
+        # like Item.add_event(), every event comes with a comment
+        bulk(Comment, (
+            self.comment(event=Events(eid=eid)) for eid in eids))
+
+    def event(self, eids):
+        event = EventFactory.build(
+            item=Item(iid=self.random.choice(self.iids)),
+            status=self.random.choice(ITEM_STATUSES),
+            event_date_time=self.when())
+        eids.append(event.eid)
+        return event
+
+    def comments(self):
+        bulk(Comment, (
+            self.comment(item=Item(iid=self.random.choice(self.iids)))
+            for i in range(self.sizes['comments'])))
+
+    def comment(self, item=None, event=None):
+        return CommentFactory.build(
+            item=item, event=event, add_date_time=self.when(),
+            username=self.random.choice(self.usernames),
+            comment="<p>%s</p>" % self.title())
+
+    def times(self):
+        # completed is the primary key, so every row needs its own
+        # timestamp. they're spread evenly over the history, with
+        # the microseconds to stay clear of any that are already there
+        step = HISTORY / max(self.sizes['times'], 1)
+        start = self.now - timedelta(
+            microseconds=self.random.randint(1, 999999))
+        bulk(ActualTime, (
+            ActualTimeFactory.build(
+                item=Item(iid=self.random.choice(self.iids)),
+                resolver=self.user(), completed=start - step * i,
+                actual_time=timedelta(
+                    minutes=15 * self.random.randint(1, 16)))
+            for i in range(self.sizes['times'])))
+
+    def nodes(self):
+        posts = []
+        nodes = []
+        for i in range(self.sizes['nodes']):
+            # a third of them are replies to an earlier post
+            reply_to = self.random.choice(posts) if (
+                posts and self.random.random() < .33) else None
+            node = self.node(reply_to)
+            if reply_to is None:
+                posts.append(node)
+            else:
+                reply_to.replies += 1
+            nodes.append(node)
+        bulk(Node, nodes)
+
+    def node(self, reply_to):
+        added = self.when()
+        project = reply_to.project if reply_to else Project(
+            pid=self.random.choice(self.mids)[1])
+        return NodeFactory.build(
+            subject=self.title(), body="<p>%s</p>" % self.title(),
+            author=self.user(), project=project, added=added,
+            modified=added, replies=0,
+            type='comment' if reply_to else 'post',
+            reply_to=reply_to.nid if reply_to else 0)
+
+    def status_updates(self):
+        bulk(StatusUpdate, (
+            StatusUpdateFactory.build(
+                project=Project(pid=self.random.choice(self.mids)[1]),
+                user=self.user(), body=self.title())
+            for i in range(self.sizes['status_updates'])))
+
+    def clients(self):
+        bulk(Client, (
+            ClientFactory.build(
+                lastname="Client%d" % i, contact=self.user(),
+                email="client%d@example.com" % i,
+                department=self.random.choice(WORDS).capitalize())
+            for i in range(self.sizes['clients'])))
+
+    def finish(self):
+        """ everything that saving them one at a time would have done """
+        # the factories picked all the primary keys. postgresql's
+        # sequences have to be moved on past them
+        sql = connection.ops.sequence_reset_sql(no_style(), [
+            Project, Milestone, Item, Events, Comment, Node, Client])
+        cursor = connection.cursor()
+        for statement in sql:
+            cursor.execute(statement)
+        Milestone.objects.recount(fix=True)
+        DashboardSnapshot.objects.all().delete()
+        # the report and autocomplete caches don't know about any of
+        # this either
+        cache.clear()
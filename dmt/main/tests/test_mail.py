@@ -0,0 +1,66 @@
+from django.core import mail
+from django.core.mail.backends.locmem import EmailBackend
+from django.test import TestCase
+from django.test.utils import override_settings
+from dmt.main.mail import queue_email, send_emails
+import smtplib
+
+
+class FlakyBackend(EmailBackend):
+    """ falls over on the second message it's asked to send """
+    calls = 0
+
+    def send_messages(self, messages):
+        FlakyBackend.calls += 1
+        if FlakyBackend.calls == 2:
+            raise smtplib.SMTPServerDisconnected("gone")
+        return super(FlakyBackend, self).send_messages(messages)
+
+
+class PickyBackend(EmailBackend):
+    """ won't take anything for bad@example.com """
+    def send_messages(self, messages):
+        for m in messages:
+            if "bad@example.com" in m.to:
+                raise smtplib.SMTPRecipientsRefused(
+                    {"bad@example.com": (550, "no such user")})
+        return super(PickyBackend, self).send_messages(messages)
+
+
+class MailTest(TestCase):
+    def test_queue_email(self):
+        queue_email("subject", "body", "from@example.com",
+                    ["a@example.com", "b@example.com"])
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to,
+                         ["a@example.com", "b@example.com"])
+
+    def test_queue_email_no_recipients(self):
+        queue_email("subject", "body", "from@example.com", [])
+        self.assertEqual(len(mail.outbox), 0)
+
+    def test_send_emails(self):
+        send_emails.delay([
+            ("one", "body", "from@example.com", ["a@example.com"]),
+            ("two", "body", "from@example.com", ["b@example.com"])])
+        self.assertEqual([m.subject for m in mail.outbox], ["one", "two"])
+
+    @override_settings(
+        EMAIL_BACKEND='dmt.main.tests.test_mail.FlakyBackend')
+    def test_retry_unsent(self):
+        FlakyBackend.calls = 0
+        send_emails.delay([
+            ("one", "body", "from@example.com", ["a@example.com"]),
+            ("two", "body", "from@example.com", ["b@example.com"]),
+            ("three", "body", "from@example.com", ["c@example.com"])])
+        # "one" doesn't get sent a second time
+        self.assertEqual([m.subject for m in mail.outbox],
+                         ["one", "two", "three"])
+
+    @override_settings(
+        EMAIL_BACKEND='dmt.main.tests.test_mail.PickyBackend')
+    def test_skip_rejected(self):
+        send_emails.delay([
+            ("one", "body", "from@example.com", ["bad@example.com"]),
+            ("two", "body", "from@example.com", ["b@example.com"])])
+        self.assertEqual([m.subject for m in mail.outbox], ["two"])
@@ -0,0 +1,133 @@
+from django.core.cache import cache
+from django.test import TestCase
+from django.test.utils import override_settings
+from dmt.main.metrics import (
+    get_item_counts_by_status, item_counts, hours_logged,
+    Metric, RESEND_INTERVAL, collect, send,
+    item_gauges, user_gauges)
+from .factories import MilestoneFactory, ItemFactory, UserFactory
+from datetime import timedelta
+
+
+class TestHelpers(TestCase):
+    def test_get_item_counts_by_status(self):
+        d = get_item_counts_by_status()
+        self.assertEqual(d['total'], 0)
+        self.assertEqual(d['verified'], 0)
+
+    def test_get_item_counts_by_status_any_status(self):
+        ItemFactory(status='OPEN')
+        ItemFactory(status='OPEN')
+        ItemFactory(status='WONTFIX')
+        with self.assertNumQueries(1):
+            d = get_item_counts_by_status()
+        self.assertEqual(d['open'], 2)
+        self.assertEqual(d['wontfix'], 1)
+        self.assertEqual(d['resolved'], 0)
+        self.assertEqual(d['total'], 3)
+
+    def test_item_counts(self):
+        d = item_counts()
+        self.assertTrue('total_open_items' in d)
+        self.assertTrue('estimates_sm' in d)
+        self.assertTrue('estimates_non_sm' in d)
+
+    def test_item_counts_someday_maybe(self):
+        sm = MilestoneFactory(name='Someday/Maybe')
+        ItemFactory(milestone=sm, estimated_time=timedelta(hours=2))
+        ItemFactory(status='INPROGRESS', estimated_time=timedelta(hours=3))
+        ItemFactory(status='RESOLVED', estimated_time=timedelta(hours=5))
+        with self.assertNumQueries(2):
+            d = item_counts()
+        self.assertEqual(d['total_open_items'], 2)
+        self.assertEqual(d['open_sm_count'], 1)
+        self.assertEqual(d['estimates_sm'], 2)
+        self.assertEqual(d['estimates_non_sm'], 3)
+
+    def test_hours_logged(self):
+        self.assertEqual(hours_logged(), 0)
+
+    def test_item_gauges(self):
+        ItemFactory(status='OPEN')
+        gauges = item_gauges()
+        self.assertEqual(gauges['items.open'], 1)
+        self.assertEqual(gauges['items.total'], 1)
+
+    def test_user_gauges(self):
+        UserFactory(status='active')
+        self.assertEqual(user_gauges(),
+                         {'users.active': 1, 'users.claimed': 0})
+
+
+class DummyPipeline(object):
+    def __init__(self):
+        self.sent = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def gauge(self, name, value):
+        self.sent.append((name, value))
+
+
+class DummyClient(object):
+    def __init__(self):
+        self.pipe = DummyPipeline()
+
+    def pipeline(self):
+        return self.pipe
+
+
+class MetricTest(TestCase):
+    def setUp(self):
+        cache.delete('metrics.test')
+        self.values = {'a': 1, 'b': 2}
+        self.metric = Metric('test', lambda: dict(self.values),
+                             interval=5, changes_only=True)
+
+    def test_is_due(self):
+        self.assertTrue(self.metric.is_due(10))
+        self.assertFalse(self.metric.is_due(11))
+        with override_settings(METRICS_INTERVALS={'test': 1}):
+            self.assertTrue(self.metric.is_due(11))
+
+    def test_changes_only(self):
+        self.assertEqual(self.metric.changed(self.values, now=100),
+                         {'a': 1, 'b': 2})
+        self.assertEqual(self.metric.changed({'a': 1, 'b': 3}, now=160),
+                         {'b': 3})
+        self.assertEqual(self.metric.changed({'a': 1, 'b': 3}, now=220),
+                         {})
+        # and everything again once in a while
+        self.assertEqual(
+            self.metric.changed({'a': 1, 'b': 3},
+                                now=101 + RESEND_INTERVAL),
+            {'a': 1, 'b': 3})
+
+    def test_collect(self):
+        every_minute = Metric('every_minute', lambda: {'c': 3})
+        metrics = [self.metric, every_minute]
+        self.assertEqual(collect(10, metrics), {'a': 1, 'b': 2, 'c': 3})
+        self.assertEqual(collect(11, metrics), {'c': 3})
+        self.values['a'] = 4
+        self.assertEqual(collect(15, metrics), {'a': 4, 'c': 3})
+
+    def test_collect_default_metrics(self):
+        i = ItemFactory(estimated_time=timedelta(hours=2))
+        cache.delete('metrics.estimated_vs_logged')
+        gauges = collect(0)
+        self.assertEqual(gauges['items.total'], 1)
+        self.assertEqual(gauges['hours.one_week'], 0)
+        self.assertEqual(
+            gauges['milestones.%d.hours_estimated' % i.milestone.mid], 2)
+        self.assertEqual(
+            gauges['projects.%d.hours_estimated' % i.milestone.project.pid],
+            2)
+
+    def test_send(self):
+        client = DummyClient()
+        send({'b': 2, 'a': 1}, client)
+        self.assertEqual(client.pipe.sent, [('a', 1), ('b', 2)])
@@ -0,0 +1,68 @@
+from django.test import TestCase
+from django.test.client import RequestFactory
+from django.test.utils import override_settings
+from django.http import HttpResponse
+from dmt.main.middleware import QueryCountMiddleware
+from dmt.main.models import Project, User
+import logging
+
+
+class RecordingMiddleware(QueryCountMiddleware):
+    def record(self, request, view, count, db_time):
+        self.recorded = (view, count)
+        super(RecordingMiddleware, self).record(
+            request, view, count, db_time)
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        logging.Handler.__init__(self)
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+
+class QueryCountMiddlewareTest(TestCase):
+    def setUp(self):
+        self.mw = RecordingMiddleware()
+        self.request = RequestFactory().get('/project/1/')
+        self.handler = ListHandler()
+        logging.getLogger('dmt.main.middleware').addHandler(self.handler)
+
+    def tearDown(self):
+        logging.getLogger('dmt.main.middleware').removeHandler(self.handler)
+
+    def run_request(self, queries):
+        # not at the top, or it sets off a circular import through the
+        # urlconf before the app cache is loaded
+        from dmt.main.views import ProjectDetailView
+        self.mw.process_request(self.request)
+        self.mw.process_view(
+            self.request, ProjectDetailView.as_view(), (), {})
+        for i in range(queries):
+            list(Project.objects.all())
+        return self.mw.process_response(self.request, HttpResponse())
+
+    def test_counts_queries(self):
+        self.run_request(3)
+        self.assertEqual(
+            self.mw.recorded, ('dmt.main.views.ProjectDetailView', 3))
+        self.assertEqual(self.handler.messages, [])
+
+    @override_settings(QUERY_BUDGET=2)
+    def test_over_budget(self):
+        self.run_request(3)
+        self.assertEqual(len(self.handler.messages), 1)
+        self.assertTrue("made 3 queries" in self.handler.messages[0])
+
+    @override_settings(QUERY_COUNT_SAMPLE_RATE=0)
+    def test_not_sampled(self):
+        self.run_request(1)
+        self.assertFalse(hasattr(self.mw, 'recorded'))
+
+    def test_no_view(self):
+        self.mw.process_request(self.request)
+        list(User.objects.all())
+        self.mw.process_response(self.request, HttpResponse())
+        self.assertFalse(hasattr(self.mw, 'recorded'))
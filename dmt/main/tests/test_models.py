@@ -1,5 +1,8 @@
 from django.test import TestCase
 from django.core import mail
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from StringIO import StringIO
 import unittest
 from .factories import (
     UserFactory, ItemFactory, NodeFactory, ProjectFactory,
@@ -8,7 +11,9 @@ from .factories import (
 from datetime import datetime, timedelta
 from dmt.main.models import (
     HistoryItem, ProjectUser, truncate_string,
-    HistoryEvent
+    HistoryEvent, ActualTime, Item, interval_from_db, timedelta_to_hours,
+    DashboardSnapshot, StatusUpdate, PendingNotification, Notify, InGroup,
+    Events, Comment, Milestone, history_changed
 )
 
 
@@ -35,6 +40,44 @@ class UserModelTest(TestCase):
         r = u.weekly_report(start, end)
         self.assertEqual(len(r['active_projects']), 1)
 
+    def test_weekly_report_totals(self):
+        u = UserFactory()
+        first = ActualTimeFactory(
+            resolver=u, actual_time=timedelta(hours=1),
+            completed=datetime(2013, 12, 17, 10))
+        ActualTimeFactory(
+            resolver=u, actual_time=timedelta(hours=2),
+            completed=datetime(2013, 12, 18, 10), item=first.item)
+        other = ActualTimeFactory(
+            resolver=u, actual_time=timedelta(hours=4),
+            completed=datetime(2013, 12, 19, 10))
+        start = datetime(year=2013, month=12, day=16)
+        end = datetime(year=2013, month=12, day=23)
+        with self.assertNumQueries(1):
+            r = u.weekly_report(start, end)
+            times = dict((p.pk, p.time) for p in r['active_projects'])
+            self.assertEqual(len(r['individual_times']), 3)
+            for a in r['individual_times']:
+                a.item.milestone.project.name
+        self.assertEqual(
+            times,
+            {first.item.milestone.project.pk: timedelta(hours=3),
+             other.item.milestone.project.pk: timedelta(hours=4)})
+        self.assertEqual(r['total_time'], timedelta(hours=7))
+        self.assertEqual(r['max_time'], timedelta(hours=4))
+
+    def test_weekly_report_query_count_is_constant(self):
+        u = UserFactory()
+        for day in range(16, 23):
+            ActualTimeFactory(
+                resolver=u, actual_time=timedelta(hours=1),
+                completed=datetime(2013, 12, day, 10))
+        start = datetime(year=2013, month=12, day=16)
+        end = datetime(year=2013, month=12, day=23)
+        with self.assertNumQueries(1):
+            r = u.weekly_report(start, end)
+        self.assertEqual(len(r['active_projects']), 7)
+
     def test_manager_on(self):
         u = UserFactory()
         self.assertEqual(u.manager_on(), [])
@@ -80,6 +123,157 @@ class UserModelTest(TestCase):
         self.assertEqual(u.group_fullname(), "foo")
 
 
+class IntervalAggregationTest(TestCase):
+    def test_interval_from_db(self):
+        self.assertEqual(interval_from_db(None), timedelta())
+        self.assertEqual(interval_from_db(timedelta(hours=2)),
+                         timedelta(hours=2))
+        self.assertEqual(interval_from_db(3600 * 1000000),
+                         timedelta(hours=1))
+
+    def test_timedelta_to_hours(self):
+        self.assertEqual(timedelta_to_hours(timedelta(minutes=90)), 1.5)
+
+    def test_total_time_empty(self):
+        self.assertEqual(ActualTime.objects.all().total_time(), timedelta())
+
+    def test_total_time(self):
+        u = UserFactory()
+        ActualTimeFactory(
+            resolver=u, actual_time=timedelta(hours=2),
+            completed=datetime(2013, 12, 20, 1))
+        ActualTimeFactory(
+            resolver=u, actual_time=timedelta(minutes=30),
+            completed=datetime(2013, 12, 20, 2))
+        ActualTimeFactory(
+            actual_time=timedelta(hours=5),
+            completed=datetime(2013, 12, 20, 3))
+        self.assertEqual(
+            ActualTime.objects.filter(resolver=u).total_time(),
+            timedelta(hours=2, minutes=30))
+        self.assertEqual(u.total_resolve_times(), 2.5)
+
+    def test_total_time_by(self):
+        u = UserFactory()
+        u2 = UserFactory()
+        ActualTimeFactory(
+            resolver=u, actual_time=timedelta(hours=2),
+            completed=datetime(2013, 12, 20, 1))
+        ActualTimeFactory(
+            resolver=u, actual_time=timedelta(hours=1),
+            completed=datetime(2013, 12, 20, 2))
+        ActualTimeFactory(
+            resolver=u2, actual_time=timedelta(hours=4),
+            completed=datetime(2013, 12, 20, 3))
+        r = ActualTime.objects.all().total_time_by('resolver')
+        self.assertEqual(r[u.username], timedelta(hours=3))
+        self.assertEqual(r[u2.username], timedelta(hours=4))
+
+    def test_total_time_by_interval(self):
+        for (day, hours) in [(2, 1), (3, 2), (9, 4), (12, 8), (20, 16)]:
+            ActualTimeFactory(
+                actual_time=timedelta(hours=hours),
+                completed=datetime(2013, 12, day, 12))
+        weeks = [(datetime(2013, 12, 1), datetime(2013, 12, 7)),
+                 (datetime(2013, 12, 8), datetime(2013, 12, 14)),
+                 (datetime(2013, 12, 22), datetime(2013, 12, 28))]
+        self.assertEqual(
+            ActualTime.objects.all().total_time_by_interval(weeks),
+            [timedelta(hours=3), timedelta(hours=12), timedelta()])
+        self.assertEqual(
+            ActualTime.objects.all().total_time_by_interval([]), [])
+
+    def test_total_estimated_time(self):
+        u = UserFactory()
+        m = MilestoneFactory()
+        ItemFactory(assigned_to=u, milestone=m,
+                    estimated_time=timedelta(hours=3))
+        ItemFactory(assigned_to=u, milestone=m,
+                    estimated_time=timedelta(hours=1))
+        ItemFactory(assigned_to=u, milestone=m, status='RESOLVED',
+                    estimated_time=timedelta(hours=7))
+        self.assertEqual(u.total_assigned_time(), 4.)
+        self.assertEqual(m.estimated_time_remaining(), 4.)
+        self.assertEqual(
+            Item.objects.all().total_estimated_time_by('status')['RESOLVED'],
+            timedelta(hours=7))
+
+
+class DashboardSnapshotTest(TestCase):
+    def test_current_builds_missing_sections(self):
+        snapshots = DashboardSnapshot.current()
+        self.assertEqual(
+            sorted(snapshots.keys()),
+            ['activity', 'items', 'milestones', 'status_updates'])
+        self.assertEqual(DashboardSnapshot.objects.count(), 4)
+        self.assertEqual(
+            snapshots['items'].get_data()['total_open_items'], 0)
+
+    def test_milestones(self):
+        m = MilestoneFactory(target_date=datetime.now().date())
+        ItemFactory(milestone=m, estimated_time=timedelta(hours=2))
+        ItemFactory(milestone=m, estimated_time=timedelta(hours=3))
+        milestones = DashboardSnapshot.rebuild()['milestones'].get_data()
+        self.assertEqual(milestones, [[m.mid, 5., 2]])
+
+    def test_add_resolve_time_invalidates_activity(self):
+        i = ItemFactory()
+        DashboardSnapshot.rebuild()
+        i.add_resolve_time(i.owner, timedelta(hours=1))
+        self.assertFalse(
+            DashboardSnapshot.objects.filter(section='activity').exists())
+        self.assertTrue(
+            DashboardSnapshot.objects.filter(section='items').exists())
+
+    def test_resolve_invalidates_items(self):
+        i = ItemFactory()
+        DashboardSnapshot.rebuild()
+        i.resolve(i.owner, 'FIXED', 'done')
+        self.assertEqual(
+            sorted(DashboardSnapshot.objects.values_list(
+                'section', flat=True)),
+            ['activity', 'status_updates'])
+        items = DashboardSnapshot.current()['items'].get_data()
+        self.assertEqual(items['total_open_items'], 0)
+
+    def sections(self):
+        return sorted(DashboardSnapshot.objects.values_list(
+            'section', flat=True))
+
+    def test_new_item_invalidates_items(self):
+        m = MilestoneFactory()
+        DashboardSnapshot.rebuild()
+        ItemFactory(milestone=m)
+        self.assertEqual(self.sections(), ['activity', 'status_updates'])
+        items = DashboardSnapshot.current()['items'].get_data()
+        self.assertEqual(items['total_open_items'], 1)
+
+    def test_deleted_item_invalidates_items(self):
+        i = ItemFactory()
+        DashboardSnapshot.rebuild()
+        i.delete()
+        self.assertEqual(self.sections(), ['activity', 'status_updates'])
+
+    def test_edit_that_doesnt_count(self):
+        i = ItemFactory()
+        DashboardSnapshot.rebuild()
+        i.title = "renamed"
+        i.save()
+        self.assertEqual(len(self.sections()), 4)
+
+    def test_status_update_invalidates(self):
+        DashboardSnapshot.rebuild()
+        p = ProjectFactory()
+        su = StatusUpdate.objects.create(
+            project=p, user=p.caretaker, body="foo")
+        self.assertFalse(
+            DashboardSnapshot.objects.filter(
+                section='status_updates').exists())
+        self.assertEqual(
+            DashboardSnapshot.current()['status_updates'].get_data(),
+            [su.id])
+
+
 class ProjectUserTest(TestCase):
     def test_completed_time_for_interval(self):
         u = UserFactory()
@@ -120,6 +314,79 @@ class MilestoneTest(TestCase):
         self.assertEqual(m.estimated_time_remaining(), 0.)
 
 
+class MilestoneCountersTest(TestCase):
+    def fresh(self, m):
+        return Milestone.objects.get(mid=m.mid)
+
+    def test_counts_follow_items(self):
+        m = MilestoneFactory()
+        i = ItemFactory(milestone=m, estimated_time=timedelta(hours=2))
+        ItemFactory(milestone=m, estimated_time=timedelta(hours=3))
+        ItemFactory(milestone=m, status='CLOSED')
+        self.assertEqual(self.fresh(m).num_open_items(), 2)
+        self.assertEqual(self.fresh(m).num_unclosed_items(), 2)
+        self.assertEqual(self.fresh(m).estimated_time_remaining(), 5.)
+
+        i = Item.objects.get(iid=i.iid)
+        i.status = 'RESOLVED'
+        i.save()
+        m = self.fresh(m)
+        self.assertEqual(m.num_open_items(), 1)
+        self.assertEqual(m.num_unclosed_items(), 2)
+        self.assertEqual(m.estimated_time_remaining(), 3.)
+
+        i.delete()
+        self.assertEqual(self.fresh(m).num_unclosed_items(), 1)
+
+    def test_move_item(self):
+        m = MilestoneFactory()
+        other = MilestoneFactory(project=m.project)
+        i = ItemFactory(milestone=m)
+        i = Item.objects.get(iid=i.iid)
+        i.milestone = other
+        i.save()
+        self.assertEqual(self.fresh(m).num_open_items(), 0)
+        self.assertEqual(self.fresh(other).num_open_items(), 1)
+
+    def test_stale_milestone_save(self):
+        m = MilestoneFactory()
+        stale = self.fresh(m)
+        ItemFactory(milestone=m)
+        stale.name = "renamed"
+        stale.save()
+        m = self.fresh(m)
+        self.assertEqual(m.name, "renamed")
+        self.assertEqual(m.num_open_items(), 1)
+
+    def test_recount(self):
+        m = MilestoneFactory()
+        ItemFactory(milestone=m, estimated_time=timedelta(hours=1))
+        self.assertEqual(Milestone.objects.recount(), [])
+        Milestone.objects.filter(mid=m.mid).update(open_items=7)
+        self.assertRaises(
+            CommandError, call_command, 'milestone_counters', verify=True,
+            stdout=StringIO())
+        call_command('milestone_counters', stdout=StringIO())
+        self.assertEqual(self.fresh(m).num_open_items(), 1)
+        self.assertEqual(Milestone.objects.recount(fix=False), [])
+
+    def test_migration_backfill(self):
+        from south.migration.base import Migrations
+        m = MilestoneFactory()
+        empty = MilestoneFactory()
+        ItemFactory(milestone=m, estimated_time=timedelta(hours=2))
+        ItemFactory(milestone=m, status='RESOLVED')
+        ItemFactory(milestone=empty, status='VERIFIED')
+        Milestone.objects.update(
+            open_items=0, unclosed_items=0, open_estimate=timedelta())
+        migration = Migrations('main')[
+            '0008_auto__add_field_milestone_open_items'
+            '__add_field_milestone_unclosed_ite']
+        migration.migration_instance().backfill_counters(migration.orm())
+        self.assertEqual(Milestone.objects.recount(fix=False), [])
+        self.assertEqual(self.fresh(m).num_unclosed_items(), 2)
+
+
 class ItemModelTest(TestCase):
     def test_gau(self):
         i = ItemFactory()
@@ -137,6 +404,48 @@ class ItemModelTest(TestCase):
         i = ItemFactory()
         self.assertEqual(i.history(), [])
 
+    def test_history_order(self):
+        i = ItemFactory()
+        u = UserFactory()
+        e1 = Events.objects.create(
+            item=i, status='OPEN', event_date_time=datetime(2014, 1, 1))
+        Comment.objects.create(
+            event=e1, username=u.username, comment="opened",
+            add_date_time=datetime(2014, 1, 1))
+        Comment.objects.create(
+            item=i, username=u.username, comment="second",
+            add_date_time=datetime(2014, 1, 2))
+        e2 = Events.objects.create(
+            item=i, status='RESOLVED', event_date_time=datetime(2014, 1, 3))
+        Comment.objects.create(
+            event=e2, username=i.owner.username, comment="resolved",
+            add_date_time=datetime(2014, 1, 3))
+        Comment.objects.create(
+            item=i, username=u.username, comment="fourth",
+            add_date_time=datetime(2014, 1, 4))
+        with self.assertNumQueries(3):
+            history = i.history()
+            self.assertEqual(
+                [(h.comment(), h.user(), h.status()) for h in history],
+                [("opened", u, 'OPEN'), ("second", u, ""),
+                 ("resolved", i.owner, 'RESOLVED'), ("fourth", u, "")])
+
+    def test_rendered_history(self):
+        i = ItemFactory()
+        i.add_comment(i.owner, "first comment")
+        self.assertTrue("first comment" in i.rendered_history())
+        with self.assertNumQueries(0):
+            i.rendered_history()
+        i.add_comment(i.owner, "second comment")
+        self.assertTrue("second comment" in i.rendered_history())
+        i.add_event('OPEN', i.owner, "reopened it")
+        self.assertTrue("reopened it" in i.rendered_history())
+
+    def test_event_comment_deleted_after_its_event(self):
+        # in a cascade, the comments' post_delete comes after their
+        # event has already gone
+        history_changed(Comment, Comment(event_id=12345))
+
     def test_priority_label(self):
         i = ItemFactory()
         self.assertEqual(i.priority_label(), 'LOW')
@@ -402,3 +711,95 @@ class TestHelpers(unittest.TestCase):
     def test_truncate_string(self):
         self.assertEqual(truncate_string("foobar", length=5), "fooba...")
         self.assertEqual(truncate_string("foobar", length=10), "foobar")
+
+
+class NotificationDigestTest(TestCase):
+    def setUp(self):
+        self.now = UserFactory(status='active')
+        self.hourly = UserFactory(
+            status='active', notification_frequency='hourly')
+        self.daily = UserFactory(
+            status='active', notification_frequency='daily')
+        self.item = ItemFactory()
+        for u in [self.now, self.hourly, self.daily]:
+            Notify.objects.create(item=self.item, username=u)
+
+    def test_update_email(self):
+        self.item.update_email("a comment", self.item.owner)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, [self.now.email])
+        self.assertEqual(
+            sorted(n.user_id for n in PendingNotification.objects.all()),
+            sorted([self.hourly.username, self.daily.username]))
+
+    def test_send_digests(self):
+        self.item.update_email("first comment", self.item.owner)
+        self.item.update_email("second comment", self.item.owner)
+        del mail.outbox[:]
+        sent = PendingNotification.objects.send_digests(['hourly'])
+        self.assertEqual(sent, 1)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, [self.hourly.email])
+        self.assertEqual(mail.outbox[0].subject, "[PMT] 2 updates")
+        self.assertTrue("first comment" in mail.outbox[0].body)
+        self.assertTrue("second comment" in mail.outbox[0].body)
+        # the daily ones are still waiting
+        self.assertEqual(
+            [n.user_id for n in PendingNotification.objects.all()],
+            [self.daily.username, self.daily.username])
+        self.assertEqual(
+            PendingNotification.objects.send_digests(['hourly']), 0)
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_single_notification_digest(self):
+        self.item.update_email("a comment", self.item.owner)
+        del mail.outbox[:]
+        PendingNotification.objects.send_digests(['daily'])
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertTrue(mail.outbox[0].subject.startswith("[PMT:"))
+
+
+class RecipientTest(TestCase):
+    def setUp(self):
+        self.project = ProjectFactory()
+        self.dev = UserFactory(status='active')
+        self.inactive = UserFactory(status='inactive')
+        self.group = UserFactory(status='active', grp=True)
+        self.member = UserFactory(status='active')
+        self.inactive_member = UserFactory(status='inactive')
+        for u in [self.member, self.inactive_member, self.dev]:
+            InGroup.objects.create(grp=self.group, username=u)
+        for u in [self.dev, self.inactive, self.group]:
+            self.project.add_developer(u)
+
+    def test_personnel_in_project(self):
+        self.assertEqual(
+            set(self.project.personnel_in_project()),
+            set([self.dev, self.group]))
+
+    def test_all_personnel_in_project(self):
+        with self.assertNumQueries(1):
+            users = self.project.all_personnel_in_project()
+        self.assertEqual(set(users), set([self.dev, self.member]))
+        # second time, it's cached
+        with self.assertNumQueries(0):
+            self.project.all_personnel_in_project()
+
+    def test_all_personnel_invalidated(self):
+        self.project.all_personnel_in_project()
+        new = UserFactory(status='active')
+        InGroup.objects.create(grp=self.group, username=new)
+        self.assertTrue(new in self.project.all_personnel_in_project())
+        self.project.remove_personnel(self.group)
+        self.assertEqual(self.project.all_personnel_in_project(), [self.dev])
+        self.dev.status = 'inactive'
+        self.dev.save()
+        self.assertEqual(self.project.all_personnel_in_project(), [])
+
+    def test_users_to_email(self):
+        i = ItemFactory()
+        for u in [self.dev, self.inactive, self.group]:
+            Notify.objects.create(item=i, username=u)
+        with self.assertNumQueries(1):
+            users = i.users_to_email(skip=self.dev)
+        self.assertEqual(users, [self.member])
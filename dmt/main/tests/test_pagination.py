@@ -0,0 +1,150 @@
+from django.contrib.auth.models import User as DjangoUser
+from django.db import connection
+from django.http import Http404
+from django.test import TestCase
+from django.test.client import Client
+from django.test.utils import CaptureQueriesContext
+from json import loads
+from dmt.main.models import Item, Milestone
+from dmt.main.pagination import (
+    Paginator, encode_cursor, decode_cursor, reverse_ordering)
+from .factories import ItemFactory, MilestoneFactory
+
+
+class CursorTest(TestCase):
+    def test_round_trip(self):
+        self.assertEqual(
+            decode_cursor(encode_cursor(True, [u'2014-01-01', u'x'])),
+            (True, [u'2014-01-01', u'x']))
+
+    def test_invalid(self):
+        with self.assertRaises(Http404):
+            decode_cursor("not a cursor")
+
+    def test_not_a_list(self):
+        with self.assertRaises(Http404):
+            decode_cursor(encode_cursor(False, 5))
+
+    def test_reverse_ordering(self):
+        self.assertEqual(reverse_ordering(['a', '-b']), ['-a', 'b'])
+
+
+class PaginatorTest(TestCase):
+    def setUp(self):
+        m = MilestoneFactory()
+        self.items = [ItemFactory(milestone=m) for i in range(7)]
+        # the same target date for all of them, so the name and then
+        # the mid have to break the ties
+        self.milestones = [
+            MilestoneFactory(name=name, target_date=m.target_date)
+            for name in ['b', 'a', 'b', 'c', 'a']] + [m]
+
+    def walk(self, paginator):
+        """ every page, following the next cursors """
+        pages = [paginator.page()]
+        while pages[-1].next_cursor is not None:
+            pages.append(paginator.page(pages[-1].next_cursor))
+        return pages
+
+    def test_forwards(self):
+        pages = self.walk(Paginator(Item.objects.all(), ('iid',), 3))
+        self.assertEqual(
+            [[i.iid for i in p.object_list] for p in pages],
+            [[i.iid for i in self.items[n:n + 3]] for n in (0, 3, 6)])
+        self.assertEqual(pages[0].previous_cursor, None)
+
+    def test_backwards(self):
+        paginator = Paginator(Item.objects.all(), ('iid',), 3)
+        pages = self.walk(paginator)
+        previous = paginator.page(pages[2].previous_cursor)
+        self.assertEqual(previous.object_list, pages[1].object_list)
+        first = paginator.page(previous.previous_cursor)
+        self.assertEqual(first.object_list, pages[0].object_list)
+        self.assertEqual(first.previous_cursor, None)
+        self.assertEqual(
+            paginator.page(first.next_cursor).object_list,
+            pages[1].object_list)
+
+    def test_descending(self):
+        pages = self.walk(Paginator(Item.objects.all(), ('-iid',), 4))
+        self.assertEqual(
+            [i.iid for p in pages for i in p.object_list],
+            [i.iid for i in reversed(self.items)])
+
+    def test_ties(self):
+        ordering = ('target_date', 'name', 'mid')
+        pages = self.walk(Paginator(
+            Milestone.objects.filter(
+                mid__in=[m.mid for m in self.milestones]), ordering, 2))
+        self.assertEqual(
+            [m.mid for p in pages for m in p.object_list],
+            [m.mid for m in sorted(self.milestones,
+                                   key=lambda m: (m.name, m.mid))])
+
+    def test_invalid_values(self):
+        paginator = Paginator(
+            Milestone.objects.all(), ('target_date', 'name', 'mid'), 2)
+        for values in ([u'2014-01-01', u'a', None],
+                       [u'not a date', u'a', 1],
+                       [u'2014-13-45', u'a', 1],
+                       [5, u'a', 1],
+                       [u'2014-01-01', u'a', u'x']):
+            with self.assertRaises(Http404):
+                paginator.page(encode_cursor(False, values))
+
+    def test_empty(self):
+        page = Paginator(Item.objects.none(), ('iid',), 3).page()
+        self.assertEqual(page.object_list, [])
+        self.assertEqual(page.next_cursor, None)
+
+
+class DRFPaginationTest(TestCase):
+    def setUp(self):
+        self.c = Client()
+        u = DjangoUser.objects.create(username="testuser")
+        u.set_password("test")
+        u.save()
+        self.c.login(username="testuser", password="test")
+        m = MilestoneFactory()
+        self.items = [ItemFactory(milestone=m) for i in range(45)]
+
+    def get(self, url):
+        r = self.c.get(url)
+        self.assertEqual(r.status_code, 200)
+        return loads(r.content)
+
+    def test_walk_items(self):
+        page = self.get("/drf/items/")
+        iids = [i['iid'] for i in page['results']]
+        self.assertEqual(page['previous'], None)
+        while page['next']:
+            page = self.get(page['next'])
+            iids.extend(i['iid'] for i in page['results'])
+        self.assertEqual(iids, [i.iid for i in self.items])
+        back = self.get(page['previous'])
+        self.assertEqual([i['iid'] for i in back['results']],
+                         [i.iid for i in self.items[20:40]])
+
+    def queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            page = self.get(url)
+        return page, queries.captured_queries
+
+    def test_deep_page_costs_the_same(self):
+        page, first = self.queries("/drf/items/")
+        page = self.get(page['next'])
+        page, last = self.queries(page['next'])
+        self.assertEqual(len(first), len(last))
+        self.assertFalse(any('OFFSET' in q['sql'] for q in last))
+
+    def test_invalid_cursor(self):
+        r = self.c.get("/drf/items/?cursor=nonsense")
+        self.assertEqual(r.status_code, 404)
+        r = self.c.get("/drf/items/?cursor=%s" %
+                       encode_cursor(False, [u'x']))
+        self.assertEqual(r.status_code, 404)
+
+    def test_users_paginated(self):
+        page = self.get("/drf/users/")
+        self.assertEqual(len(page['results']), 20)
+        self.assertTrue(page['next'])
@@ -0,0 +1,254 @@
+""" guards against N+1 query regressions. the same pages get requested
+with a small and then a larger set of data behind them, and have to
+make the same number of queries both times """
+from django.contrib.auth.models import User as DjangoUser
+from django.core.cache import cache
+from django.core.urlresolvers import get_resolver, RegexURLResolver
+from django.db import connection
+from django.test import TestCase
+from django.test.client import Client
+from django.test.utils import CaptureQueriesContext
+from django.utils.timezone import utc
+from datetime import datetime, timedelta
+import re
+from dmt.claim.models import Claim
+from dmt.main.sync import Watermark
+from .factories import (
+    UserFactory, ProjectFactory, MilestoneFactory, ItemFactory,
+    NodeFactory, StatusUpdateFactory, ClientFactory, ActualTimeFactory)
+
+
+class Graph(object):
+    """ a project with milestones, items (with their comments, events,
+    hours, clients and tags), forum posts and replies, status
+    updates and personnel. grow() adds more of all of it, around the
+    same few objects that the pages get requested for """
+
+    def __init__(self):
+        self.user = UserFactory(status='active')
+        self.project = ProjectFactory(caretaker=self.user)
+        self.project.add_manager(self.user)
+        self.milestone = MilestoneFactory(project=self.project)
+        self.item = ItemFactory(
+            milestone=self.milestone, owner=self.user,
+            assigned_to=self.user, estimated_time=timedelta(hours=1))
+        self.item.tags.add('tagged')
+        self.node = NodeFactory(project=self.project, author=self.user,
+                                type='post', reply_to=0)
+        self.node.tags.add('tagged')
+        self.status_update = StatusUpdateFactory(
+            project=self.project, user=self.user)
+        self.client = ClientFactory(contact=self.user)
+        self.item.add_clients([self.client])
+        self.completed = datetime.now().replace(tzinfo=utc)
+        self.watermark = Watermark(
+            self.completed - timedelta(days=1)).encode()
+
+    def grow(self, n):
+        for i in range(n):
+            user = UserFactory(status='active')
+            self.project.add_developer(user)
+            milestone = MilestoneFactory(project=self.project)
+            other = ItemFactory(milestone=milestone, owner=user,
+                                assigned_to=self.user)
+            ItemFactory(milestone=self.milestone, owner=self.user,
+                        assigned_to=user).tags.add('tagged')
+            for item in [self.item, other]:
+                item.add_comment(user, "a comment")
+                item.add_event('INPROGRESS', user, "an event")
+                item.add_cc(user)
+                self.completed -= timedelta(minutes=1)
+                ActualTimeFactory(item=item, resolver=user,
+                                  completed=self.completed,
+                                  actual_time=timedelta(hours=1))
+            client = ClientFactory(contact=user)
+            self.item.add_clients([client])
+            other.add_clients([self.client])
+            NodeFactory(project=self.project, author=user, type='comment',
+                        reply_to=self.node.nid)
+            NodeFactory(project=self.project, author=user, type='post',
+                        reply_to=0).tags.add('tagged')
+            StatusUpdateFactory(project=self.project, user=user)
+            ProjectFactory(caretaker=user)
+
+
+# GET-only pages, by the view that handles them. each one gets
+# requested as each of these
+def page_urls(g):
+    project = g.project.pid
+    return [
+        "/",
+        "/dashboard/",
+        "/search/?q=test",
+        "/search/items/?q=test",
+        "/search/json/?q=test",
+        "/client/",
+        "/client/%d/" % g.client.client_id,
+        "/forum/",
+        "/forum/%d/" % g.node.nid,
+        "/forum/%d/edit/" % g.node.nid,
+        "/forum/%d/delete/" % g.node.nid,
+        "/item/%d/" % g.item.iid,
+        "/item/%d/edit/" % g.item.iid,
+        "/milestone/",
+        "/milestone/%d/" % g.milestone.mid,
+        "/milestone/%d/edit/" % g.milestone.mid,
+        "/project/",
+        "/project/%d/" % project,
+        "/project/%d/edit/" % project,
+        "/status/",
+        "/status/%d/" % g.status_update.id,
+        "/status/%d/delete/" % g.status_update.id,
+        "/user/",
+        "/user/%s/" % g.user.username,
+        "/user/%s/edit/" % g.user.username,
+        "/tag/",
+        "/tag/tagged/",
+        "/feeds/forum/rss/",
+        "/feeds/status/",
+        "/stats/",
+        "/claim/",
+        "/report/",
+        "/report/user/%s/weekly/" % g.user.username,
+        "/report/user/%s/yearly/" % g.user.username,
+        "/report/yearly_review/",
+        "/report/staff/",
+        "/report/staff/previous/",
+        "/api/1.0/projects/all/",
+        "/api/1.0/projects/autocomplete/?q=test",
+        "/drf/",
+        "/drf/users/",
+        "/drf/users/%s/" % g.user.username,
+        "/drf/clients/",
+        "/drf/clients/%d/" % g.client.client_id,
+        "/drf/projects/",
+        "/drf/projects/%d/" % project,
+        "/drf/projects/%d/milestones/" % project,
+        "/drf/milestones/",
+        "/drf/milestones/%d/" % g.milestone.mid,
+        "/drf/milestones/%d/items/" % g.milestone.mid,
+        "/drf/items/",
+        "/drf/items/%d/" % g.item.iid,
+    ] + [
+        "/drf/changes/%s/?since=%s" % (type, g.watermark)
+        for type in ['items', 'milestones', 'projects', 'nodes']
+    ]
+
+
+# the url patterns that page_urls() leaves out, and why
+NOT_COUNTED = [
+    # POST only. they change one thing and redirect
+    r'item/(?P<pk>\d+)/comment/$',
+    r'item/(?P<pk>\d+)/resolve/$',
+    r'item/(?P<pk>\d+)/inprogress/$',
+    r'item/(?P<pk>\d+)/verify/$',
+    r'item/(?P<pk>\d+)/reopen/$',
+    r'item/(?P<pk>\d+)/split/$',
+    r'item/(?P<pk>\d+)/tag/$',
+    r'item/(?P<pk>\d+)/remove_tag/(?P<slug>[^/]+)/$',
+    r'item/(?P<pk>\d+)/priority/(?P<priority>\d)/$',
+    r'item/(?P<pk>\d+)/assigned_to/$',
+    r'item/(?P<pk>\d+)/owner/$',
+    r'forum/(?P<pk>\d+)/reply/$',
+    r'forum/(?P<pk>\d+)/tag/$',
+    r'forum/(?P<pk>\d+)/remove_tag/(?P<slug>[^/]+)/$',
+    r'project/(?P<pk>\d+)/add_bug/$',
+    r'project/(?P<pk>\d+)/add_action_item/$',
+    r'project/(?P<pk>\d+)/add_todo/$',
+    r'project/(?P<pk>\d+)/add_node/$',
+    r'project/(?P<pk>\d+)/add_milestone/$',
+    r'project/(?P<pk>\d+)/add_update/$',
+    r'project/(?P<pk>\d+)/remove_user/(?P<username>\w+)/$',
+    r'project/(?P<pk>\d+)/add_user/$',
+    r'api/1.0/trackers/add/',
+    r'api/1.0/items/(?P<pk>\d+)/hours/$',
+    r'api/1.0/git/$',
+]
+# pages that are known to make more queries the more data there is,
+# until they get fixed. they're still requested, but not checked
+KNOWN_GROWTH = {
+}
+
+
+# someone else's views
+NOT_OURS = ['admin/', 'accounts/', 'api-auth/', '_impersonate/',
+            'smoketest/', 'uploads/', '__debug__/']
+
+
+def url_patterns(resolver=None, prefix=''):
+    """ the full regex of every pattern in the urlconf """
+    resolver = resolver or get_resolver(None)
+    for p in resolver.url_patterns:
+        pattern = prefix + p.regex.pattern.lstrip('^')
+        if isinstance(p, RegexURLResolver):
+            for full in url_patterns(p, pattern):
+                yield full
+        else:
+            yield pattern
+
+
+def describe(queries):
+    """ the queries, most repeated first, for the failure message.
+    the same query with different parameters only gets listed once """
+    counts = dict()
+    for q in queries:
+        if " - PARAMS = " in q['sql']:
+            # sqlite's, with the parameters at the end
+            sql = q['sql'].split(" - PARAMS = ")[0]
+        else:
+            sql = re.sub(r"'[^']*'|\b\d+\b", "?", q['sql'])
+        counts[sql] = counts.get(sql, 0) + 1
+    return "\n".join(
+        "%4dx %s" % (n, sql)
+        for sql, n in sorted(counts.items(), key=lambda x: -x[1]))
+
+
+class QueryCountTest(TestCase):
+    def setUp(self):
+        self.c = Client()
+        self.u = DjangoUser.objects.create(username="testuser")
+        self.u.set_password("test")
+        self.u.save()
+        self.c.login(username="testuser", password="test")
+        self.graph = Graph()
+        Claim.objects.create(django_user=self.u, pmt_user=self.graph.user)
+
+    def queries(self, url):
+        # nothing cached, so that it's the full cost of the page
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            r = self.c.get(url)
+        self.assertTrue(r.status_code in (200, 302),
+                        "%s: %d" % (url, r.status_code))
+        return queries.captured_queries
+
+    def all_queries(self):
+        return dict((url, self.queries(url))
+                    for url in page_urls(self.graph))
+
+    def test_query_counts_dont_grow(self):
+        self.graph.grow(1)
+        small = self.all_queries()
+        self.graph.grow(3)
+        large = self.all_queries()
+        known = [url % self.graph.project.pid if '%' in url else url
+                 for url in KNOWN_GROWTH]
+        grew = [url for url in small
+                if url not in known and
+                len(large[url]) > len(small[url])]
+        self.assertEqual(grew, [], "\n\n".join(
+            "%s: %d queries, then %d\n%s" % (
+                url, len(small[url]), len(large[url]),
+                describe(large[url]))
+            for url in grew))
+
+    def test_every_page_counted(self):
+        paths = [url.split('?')[0][1:] for url in page_urls(self.graph)]
+        missing = [
+            p for p in url_patterns()
+            if p not in NOT_COUNTED and
+            not any(p.startswith(prefix) for prefix in NOT_OURS) and
+            # the ?format=json versions of the drf views
+            '(?P<format>' not in p and
+            not any(re.match('^' + p, path) for path in paths)]
+        self.assertEqual(missing, [])
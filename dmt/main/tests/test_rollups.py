@@ -0,0 +1,52 @@
+from django.test import TestCase
+from django.utils.timezone import utc
+from dmt.main.rollups import (
+    hours_logged_by_project, hours_estimated_by_project,
+    hours_logged_by_milestone, hours_estimated_by_milestone,
+    hours_assigned_by_user)
+from .factories import ItemFactory, ActualTimeFactory, MilestoneFactory
+from datetime import datetime, timedelta
+
+
+class RollupTest(TestCase):
+    def setUp(self):
+        self.item = ItemFactory(estimated_time=timedelta(hours=3))
+        self.m = self.item.milestone
+        self.other = MilestoneFactory(project=self.m.project)
+        ItemFactory(milestone=self.other, estimated_time=timedelta(hours=2))
+        ItemFactory(milestone=self.other, status='RESOLVED',
+                    estimated_time=timedelta(hours=7))
+        ActualTimeFactory(item=self.item, actual_time=timedelta(hours=1),
+                          completed=datetime(2013, 12, 20, tzinfo=utc))
+        ActualTimeFactory(item=self.item,
+                          actual_time=timedelta(minutes=30),
+                          completed=datetime(2013, 12, 21, tzinfo=utc))
+        self.elsewhere = ItemFactory()
+        ActualTimeFactory(item=self.elsewhere,
+                          actual_time=timedelta(hours=4),
+                          completed=datetime(2013, 12, 22, tzinfo=utc))
+
+    def test_by_project(self):
+        pid = self.m.project.pid
+        self.assertEqual(hours_logged_by_project()[pid], 1.5)
+        self.assertEqual(hours_estimated_by_project()[pid], 5.)
+        self.assertEqual(
+            hours_logged_by_project()[self.elsewhere.milestone.project.pid],
+            4.)
+
+    def test_by_milestone(self):
+        self.assertEqual(hours_logged_by_milestone()[self.m.mid], 1.5)
+        self.assertEqual(hours_estimated_by_milestone()[self.other.mid], 2.)
+
+    def test_one_project(self):
+        project = self.m.project
+        self.assertEqual(hours_logged_by_milestone(project),
+                         {self.m.mid: 1.5})
+        self.assertEqual(hours_estimated_by_milestone(project),
+                         {self.m.mid: 3., self.other.mid: 2.})
+
+    def test_by_user(self):
+        assigned = hours_assigned_by_user()
+        self.assertEqual(assigned[self.item.assigned_to.username], 3.)
+        self.assertEqual(assigned[self.item.assigned_to.username],
+                         self.item.assigned_to.total_assigned_time())
@@ -0,0 +1,249 @@
+from django.contrib.auth.models import User as DjangoUser
+from django.http import Http404
+from django.test import TestCase
+from django.test.client import Client
+from django.utils import timezone
+from datetime import timedelta
+from json import loads
+from dmt.claim.models import Claim
+from dmt.main.models import Item, Milestone, Project, Tombstone
+from dmt.main.pagination import encode_cursor
+from dmt.main.sync import (
+    FEEDS, Watermark, WatermarkExpired, SAVED, DELETED, SETTLE,
+    TOMBSTONE_DAYS, PAGE_SIZE, prune_tombstones)
+from dmt.main.tasks import close_passed_milestones
+from .factories import (
+    ItemFactory, MilestoneFactory, ProjectFactory, NodeFactory, UserFactory)
+
+
+def ago(**kwargs):
+    return timezone.now() - timedelta(**kwargs)
+
+
+class TombstoneTest(TestCase):
+    def test_deleted(self):
+        i = ItemFactory()
+        iid = i.iid
+        i.delete()
+        t = Tombstone.objects.get(type='items')
+        self.assertEqual(t.object_id, iid)
+
+    def test_cascade(self):
+        i = ItemFactory()
+        mid = i.milestone.mid
+        i.milestone.delete()
+        self.assertEqual(
+            sorted(Tombstone.objects.values_list('type', 'object_id')),
+            [(u'items', i.iid), (u'milestones', mid)])
+
+    def test_node(self):
+        n = NodeFactory()
+        nid = n.nid
+        n.delete()
+        self.assertTrue(
+            Tombstone.objects.filter(type='nodes', object_id=nid).exists())
+
+    def test_prune(self):
+        Tombstone.objects.create(type='items', object_id=1)
+        Tombstone.objects.create(type='items', object_id=2,
+                                 deleted=ago(days=TOMBSTONE_DAYS + 1))
+        prune_tombstones()
+        self.assertEqual(
+            list(Tombstone.objects.values_list('object_id', flat=True)),
+            [1])
+
+
+class LastModTest(TestCase):
+    def test_milestone(self):
+        m = MilestoneFactory()
+        Milestone.objects.filter(mid=m.mid).update(last_mod=ago(days=1))
+        m = Milestone.objects.get(mid=m.mid)
+        m.name = "renamed"
+        m.save()
+        self.assertTrue(m.last_mod > ago(minutes=1))
+
+    def test_project(self):
+        p = ProjectFactory()
+        self.assertTrue(p.last_mod > ago(minutes=1))
+
+    def test_close_passed_milestones(self):
+        m = MilestoneFactory(target_date=ago(days=2).date())
+        Milestone.objects.filter(mid=m.mid).update(last_mod=ago(days=1))
+        close_passed_milestones()
+        m = Milestone.objects.get(mid=m.mid)
+        self.assertEqual(m.status, 'CLOSED')
+        self.assertTrue(m.last_mod > ago(minutes=1))
+
+
+class FeedTest(TestCase):
+    def setUp(self):
+        m = MilestoneFactory()
+        self.start = ago(hours=2)
+        # the last two at the same moment, so the iid breaks the tie
+        self.items = [
+            ItemFactory(milestone=m, last_mod=self.start + timedelta(
+                minutes=min(n, 4))) for n in range(1, 6)]
+        # and one from before the watermark
+        ItemFactory(milestone=m, last_mod=ago(days=1))
+        self.feed = FEEDS['items']
+
+    def walk(self, since, n):
+        changes = []
+        more = True
+        while more:
+            page, since, more = self.feed.changes(since, n)
+            changes.extend(page)
+        return changes, since
+
+    def test_in_order(self):
+        changes, watermark = self.walk(Watermark(self.start), 2)
+        self.assertEqual([c.pk for c in changes],
+                         [i.iid for i in self.items])
+        self.assertEqual(watermark.kind, SAVED)
+        self.assertEqual(watermark.pk, self.items[-1].iid)
+        # and nothing new after it
+        self.assertEqual(self.feed.changes(watermark)[0], [])
+
+    def test_deleted(self):
+        deleted = self.items.pop(1).iid
+        Item.objects.get(iid=deleted).delete()
+        Tombstone.objects.update(deleted=self.start + timedelta(minutes=2))
+        changes, watermark = self.walk(Watermark(self.start), 2)
+        self.assertEqual(
+            [(c.kind, c.pk if c.kind == SAVED else c.obj) for c in changes],
+            [(SAVED, self.items[0].iid), (1, deleted)] +
+            [(SAVED, i.iid) for i in self.items[1:]])
+
+    def test_settling(self):
+        self.items[-1].touch()
+        changes, watermark = self.walk(Watermark(self.start), 10)
+        self.assertEqual([c.pk for c in changes],
+                         [i.iid for i in self.items[:-1]])
+
+    def test_bootstrap(self):
+        changes, watermark, more = self.feed.changes(None)
+        self.assertEqual(changes, [])
+        self.assertFalse(more)
+        self.assertTrue(watermark.modified < timezone.now())
+
+    def test_expired(self):
+        with self.assertRaises(WatermarkExpired):
+            self.feed.changes(Watermark(ago(days=TOMBSTONE_DAYS + 1)))
+
+    def test_watermark_round_trip(self):
+        w = Watermark(self.start, SAVED, 12)
+        w = Watermark.decode(w.encode())
+        self.assertEqual((w.modified, w.kind, w.pk), (self.start, SAVED, 12))
+
+    def test_invalid_watermark(self):
+        with self.assertRaises(Http404):
+            Watermark.decode("nonsense")
+        modified = self.start.isoformat()
+        for values in ([modified, SAVED, None], [modified, SAVED, u'12'],
+                       [modified, DELETED, True], [modified, SAVED, 1.5],
+                       [modified, DELETED, [1]]):
+            with self.assertRaises(Http404):
+                Watermark.decode(encode_cursor(False, values))
+        w = Watermark.decode(Watermark(self.start).encode())
+        self.assertEqual((w.kind, w.pk), (DELETED, None))
+
+
+class NewItemFeedTest(TestCase):
+    def setUp(self):
+        self.c = Client()
+        u = DjangoUser.objects.create(username="testuser")
+        u.set_password("test")
+        u.save()
+        self.c.login(username="testuser", password="test")
+        Claim.objects.create(django_user=u, pmt_user=UserFactory())
+        self.milestone = MilestoneFactory()
+        self.since = Watermark(ago(hours=1))
+
+    def new_items(self):
+        changes = FEEDS['items'].changes(
+            self.since, now=timezone.now() + timedelta(seconds=SETTLE))[0]
+        return [c.pk for c in changes]
+
+    def test_tracker(self):
+        self.c.post("/api/1.0/trackers/add/", dict(
+            pid=self.milestone.project.pid, task="test", time="1 hour"))
+        item = Item.objects.get(title="test")
+        self.assertEqual(self.new_items(), [item.iid])
+
+    def test_split(self):
+        item = ItemFactory(milestone=self.milestone, last_mod=ago(days=1))
+        self.c.post("/item/%d/split/" % item.iid, dict(title_0="part"))
+        part = Item.objects.get(title="part")
+        # the original is touched after the split
+        self.assertEqual(self.new_items(), [part.iid, item.iid])
+
+
+class ChangesViewTest(TestCase):
+    def setUp(self):
+        self.c = Client()
+        u = DjangoUser.objects.create(username="testuser")
+        u.set_password("test")
+        u.save()
+        self.c.login(username="testuser", password="test")
+
+    def get(self, url, status=200):
+        r = self.c.get(url)
+        self.assertEqual(r.status_code, status)
+        return loads(r.content)
+
+    def test_bootstrap_and_poll(self):
+        first = self.get("/drf/changes/milestones/")
+        self.assertEqual(first['changes'], [])
+        self.assertTrue(first['watermark'])
+        m = MilestoneFactory()
+        p = m.project
+        Milestone.objects.update(last_mod=ago(minutes=1))
+        Project.objects.update(last_mod=ago(minutes=1))
+        p.delete()
+        Tombstone.objects.update(deleted=ago(seconds=30))
+        self.get("/drf/changes/milestones/?since=%s" % ago(
+            hours=1).isoformat(), 404)
+        r = self.get("/drf/changes/milestones/?since=%s" %
+                     Watermark(ago(hours=1)).encode())
+        self.assertEqual(
+            [(c['id'], c['deleted']) for c in r['changes']],
+            [(m.mid, True)])
+        self.assertFalse(r['more'])
+        again = self.get("/drf/changes/milestones/?since=%s" %
+                         r['watermark'])
+        self.assertEqual(again['changes'], [])
+        self.assertEqual(again['watermark'], r['watermark'])
+
+    def test_objects(self):
+        items = [ItemFactory(last_mod=ago(minutes=n)) for n in (3, 2, 1)]
+        r = self.get("/drf/changes/items/?since=%s" %
+                     Watermark(ago(hours=1)).encode())
+        self.assertEqual([c['id'] for c in r['changes']],
+                         [i.iid for i in items])
+        self.assertEqual(r['changes'][0]['object']['title'], items[0].title)
+        self.assertEqual(r['next'], None)
+
+    def test_next(self):
+        m = MilestoneFactory()
+        for n in range(PAGE_SIZE + 1):
+            ItemFactory(milestone=m, last_mod=ago(minutes=1))
+        r = self.get("/drf/changes/items/?since=%s" %
+                     Watermark(ago(hours=1)).encode())
+        self.assertEqual(len(r['changes']), PAGE_SIZE)
+        self.assertTrue(r['more'])
+        r = self.get(r['next'])
+        self.assertEqual(len(r['changes']), 1)
+        self.assertEqual(r['changes'][0]['id'], Item.objects.latest('iid').iid)
+        self.assertFalse(r['more'])
+
+    def test_invalid_watermark(self):
+        self.get("/drf/changes/items/?since=%s" % encode_cursor(
+            False, [ago(hours=1).isoformat(), SAVED, u'x']), 404)
+
+    def test_unknown_type(self):
+        self.get("/drf/changes/widgets/", 404)
+
+    def test_expired(self):
+        r = self.get("/drf/changes/items/?since=%s" % Watermark(
+            ago(days=TOMBSTONE_DAYS + 1)).encode(), 410)
+        self.assertTrue('detail' in r)
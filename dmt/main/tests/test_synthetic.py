@@ -0,0 +1,67 @@
+from django.contrib.auth.models import User as DjangoUser
+from django.test import TestCase
+from dmt.main.benchmarks import run, compare, BENCHMARK_USER
+from dmt.main.models import (
+    User, Project, Milestone, Item, Events, Comment, ActualTime, Node)
+from dmt.main.synthetic import SyntheticPMT, SIZES, scaled
+
+TINY = dict(users=5, projects=3, milestones=6, items=30, events=10,
+            comments=20, times=25, nodes=12, status_updates=4, clients=2)
+
+
+class SyntheticPMTTest(TestCase):
+    def setUp(self):
+        SyntheticPMT(TINY, seed=1).generate()
+
+    def test_sizes(self):
+        self.assertEqual(User.objects.count(), 5)
+        self.assertEqual(Project.objects.count(), 3)
+        self.assertEqual(Milestone.objects.count(), 6)
+        self.assertEqual(Item.objects.count(), 30)
+        self.assertEqual(Events.objects.count(), 10)
+        # one with each event, and the rest on items
+        self.assertEqual(Comment.objects.count(), 30)
+        self.assertEqual(ActualTime.objects.count(), 25)
+        self.assertEqual(Node.objects.count(), 12)
+
+    def test_consistent(self):
+        self.assertEqual(Milestone.objects.recount(fix=False), [])
+        for e in Events.objects.all():
+            self.assertEqual(e.comment_set.count(), 1)
+        for n in Node.objects.filter(reply_to=0):
+            self.assertEqual(
+                n.replies, Node.objects.filter(reply_to=n.nid).count())
+
+    def test_another_alongside(self):
+        SyntheticPMT(TINY, seed=1, prefix='more').generate()
+        self.assertEqual(User.objects.count(), 10)
+        self.assertEqual(Item.objects.count(), 60)
+
+    def test_scaled(self):
+        self.assertEqual(scaled(SIZES, .001)['items'], SIZES['items'] / 1000)
+        self.assertEqual(scaled(dict(users=10), .01), dict(users=1))
+
+
+class BenchmarkTest(TestCase):
+    def setUp(self):
+        SyntheticPMT(TINY).generate()
+
+    def test_run(self):
+        report = run(1, ['dashboard', 'drf_items',
+                         'task_close_passed_milestones'])
+        self.assertEqual(
+            [r['name'] for r in report['results']],
+            ['dashboard', 'drf_items', 'task_close_passed_milestones'])
+        for r in report['results']:
+            self.assertTrue(r['queries'] > 0)
+            self.assertTrue(r['min_ms'] <= r['median_ms'] <= r['max_ms'])
+        self.assertEqual(report['tables']['items'], 30)
+        self.assertFalse(
+            DjangoUser.objects.filter(username=BENCHMARK_USER).exists())
+
+    def test_compare(self):
+        old = dict(results=[dict(name='a', median_ms=10.),
+                            dict(name='b', median_ms=5.)])
+        new = dict(results=[dict(name='a', median_ms=8.),
+                            dict(name='c', median_ms=1.)])
+        self.assertEqual(compare(old, new), [('a', 10., 8.)])
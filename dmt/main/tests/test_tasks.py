@@ -1,22 +1,113 @@
+from django.core import mail
+from django.core.management import call_command
 from django.test import TestCase
+from django.utils import timezone
+from dmt.main.models import DashboardSnapshot, PendingNotification, Milestone
 from dmt.main.tasks import (
-    get_item_counts_by_status, item_counts, hours_logged,
-    seconds_to_hours)
+    rebuild_dashboard_snapshot, send_digests, close_passed_milestones,
+    daily_digests_due)
+from .factories import UserFactory, MilestoneFactory, ItemFactory
+from StringIO import StringIO
+from datetime import date, datetime
 
 
 class TestHelpers(TestCase):
-    def test_get_item_counts_by_status(self):
-        d = get_item_counts_by_status()
-        self.assertEqual(d['total'], 0)
+    def test_rebuild_dashboard_snapshot(self):
+        rebuild_dashboard_snapshot()
+        self.assertEqual(DashboardSnapshot.objects.count(), 4)
 
-    def test_item_counts(self):
-        d = item_counts()
-        self.assertTrue('total_open_items' in d)
-        self.assertTrue('estimates_sm' in d)
-        self.assertTrue('estimates_non_sm' in d)
+    def test_send_digests(self):
+        u = UserFactory(notification_frequency='hourly')
+        PendingNotification.objects.create(
+            user=u, subject="subject", body="body")
+        send_digests()
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(PendingNotification.objects.count(), 0)
 
-    def test_hours_logged(self):
-        self.assertEqual(hours_logged(), 0)
+    def test_send_digests_switched_back_to_immediate(self):
+        u = UserFactory(notification_frequency='daily')
+        PendingNotification.objects.create(
+            user=u, subject="subject", body="body")
+        u.notification_frequency = 'immediate'
+        u.save()
+        send_digests()
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, [u.email])
+        self.assertEqual(PendingNotification.objects.count(), 0)
 
-    def test_seconds_to_hours(self):
-        self.assertEqual(seconds_to_hours(3600), 1.)
+
+class DailyDigestsDueTest(TestCase):
+    def setUp(self):
+        self.u = UserFactory(notification_frequency='daily')
+        tz = timezone.get_default_timezone()
+        self.at = lambda *args: timezone.make_aware(datetime(*args), tz)
+
+    def pending(self, added):
+        PendingNotification.objects.create(
+            user=self.u, subject="subject", body="body", added=added)
+
+    def test_waiting_since_before_the_hour(self):
+        self.pending(self.at(2014, 1, 1, 23))
+        self.assertFalse(daily_digests_due(self.at(2014, 1, 2, 6)))
+        self.assertTrue(daily_digests_due(self.at(2014, 1, 2, 7)))
+        # the 7:00 run didn't happen
+        self.assertTrue(daily_digests_due(self.at(2014, 1, 2, 9)))
+
+    def test_already_sent_today(self):
+        # turned up after this morning's digest went out
+        self.pending(self.at(2014, 1, 2, 7, 30))
+        self.assertFalse(daily_digests_due(self.at(2014, 1, 2, 9)))
+        self.assertTrue(daily_digests_due(self.at(2014, 1, 3, 7)))
+
+    def test_missed_a_whole_day(self):
+        self.pending(self.at(2014, 1, 1, 5))
+        self.assertTrue(daily_digests_due(self.at(2014, 1, 2, 6)))
+
+    def test_nothing_waiting(self):
+        self.assertFalse(daily_digests_due())
+        hourly = UserFactory(notification_frequency='hourly')
+        PendingNotification.objects.create(
+            user=hourly, subject="subject", body="body",
+            added=self.at(2014, 1, 1, 5))
+        self.assertFalse(daily_digests_due(self.at(2014, 1, 2, 9)))
+
+
+class ClosePassedMilestonesTest(TestCase):
+    def setUp(self):
+        self.done = MilestoneFactory(target_date=date(2000, 1, 1))
+        ItemFactory(milestone=self.done, status='CLOSED')
+        self.busy = MilestoneFactory(target_date=date(2000, 1, 1))
+        ItemFactory(milestone=self.busy, status='RESOLVED')
+        self.upcoming = MilestoneFactory(target_date=date(2100, 1, 1))
+
+    def statuses(self):
+        return dict(Milestone.objects.values_list('mid', 'status'))
+
+    def test_close_passed_milestones(self):
+        self.assertEqual(close_passed_milestones(), 1)
+        self.assertEqual(self.statuses(), {
+            self.done.mid: 'CLOSED', self.busy.mid: 'OPEN',
+            self.upcoming.mid: 'OPEN'})
+        self.assertEqual(close_passed_milestones(), 0)
+
+    def test_stale_counters(self):
+        # eg, before the counters have been filled in
+        Milestone.objects.update(unclosed_items=0)
+        self.assertEqual(close_passed_milestones(), 1)
+        self.assertEqual(self.statuses()[self.busy.mid], 'OPEN')
+
+    def test_invalidates_dashboard(self):
+        DashboardSnapshot.rebuild()
+        close_passed_milestones()
+        self.assertEqual(
+            sorted(DashboardSnapshot.objects.values_list(
+                'section', flat=True)),
+            ['activity', 'status_updates'])
+
+    def test_dry_run(self):
+        out = StringIO()
+        call_command('close_passed_milestones', dry_run=True, stdout=out)
+        self.assertTrue(self.done.name in out.getvalue())
+        self.assertFalse(self.busy.name in out.getvalue())
+        self.assertTrue("1 milestones would be closed" in out.getvalue())
+        self.assertEqual(self.statuses()[self.done.mid], 'OPEN')
@@ -5,7 +5,10 @@ from dmt.claim.models import Claim, PMTUser
 from dmt.main.models import Item
 from .factories import (
     ProjectFactory, MilestoneFactory, ItemFactory, NodeFactory,
-    EventFactory, CommentFactory, UserFactory, StatusUpdateFactory)
+    EventFactory, CommentFactory, UserFactory, StatusUpdateFactory,
+    ActualTimeFactory)
+from datetime import datetime, timedelta
+from json import loads
 
 
 class BasicTest(TestCase):
@@ -33,6 +36,74 @@ class BasicTest(TestCase):
         response = self.c.get("/search/?q=foo")
         self.assertEquals(response.status_code, 200)
 
+    def search_section(self, response, name):
+        for section in response.context['sections']:
+            if section['index'].name == name:
+                return section
+
+    def test_search_results(self):
+        i = ItemFactory(title="findable item")
+        n = NodeFactory(subject="findable post")
+        response = self.c.get("/search/?q=findable")
+        self.assertEquals(response.status_code, 200)
+        self.assertEqual(self.search_section(response, 'items')['objects'],
+                         [i])
+        self.assertEqual(self.search_section(response, 'nodes')['objects'],
+                         [n])
+        self.assertEqual(self.search_section(response, 'users')['objects'],
+                         [])
+        self.assertTrue(i.get_absolute_url() in response.content)
+
+    def test_search_comments(self):
+        i = ItemFactory(title="plain title")
+        i.add_comment(self.pu, "needle in a haystack")
+        response = self.c.get("/search/?q=haystack")
+        self.assertEqual(self.search_section(response, 'items')['objects'],
+                         [i])
+
+    def test_search_top_matches(self):
+        for x in range(25):
+            ItemFactory(title="paginated thing")
+        response = self.c.get("/search/?q=paginated")
+        section = self.search_section(response, 'items')
+        self.assertEqual(len(section['objects']), 10)
+        self.assertEqual(section['page'].paginator.count, 25)
+        self.assertTrue("/search/items/?q=paginated" in response.content)
+
+    def test_search_type(self):
+        for x in range(25):
+            ItemFactory(title="paginated thing")
+        response = self.c.get("/search/items/?q=paginated")
+        self.assertEqual(len(response.context['objects']), 20)
+        self.assertTrue("page=2" in response.content)
+        response = self.c.get("/search/items/?q=paginated&page=2")
+        self.assertEqual(len(response.context['objects']), 5)
+        response = self.c.get("/search/items/?q=paginated&page=foo")
+        self.assertEqual(response.context['page'].number, 1)
+
+    def test_search_type_bad_input(self):
+        response = self.c.get("/search/items/?q=a")
+        self.assertTrue("alert-error" in response.content)
+        response = self.c.get("/search/nonexistent/?q=foo")
+        self.assertEqual(response.status_code, 404)
+
+    def test_search_json(self):
+        i = ItemFactory(title="typeahead item")
+        p = ProjectFactory(name="typeahead project")
+        for x in range(6):
+            ItemFactory(title="typeahead others")
+        response = self.c.get("/search/json/?q=typeahead")
+        self.assertEqual(response['Content-Type'], "application/json")
+        d = loads(response.content)
+        self.assertEqual(len([r for r in d if r['type'] == 'items']), 5)
+        self.assertTrue(dict(type='projects', value=p.name,
+                             url=p.get_absolute_url()) in d)
+        response = self.c.get("/search/json/?q=typeahead%20item&type=items")
+        self.assertEqual(loads(response.content), [
+            dict(type='items', value=i.title, url=i.get_absolute_url())])
+        response = self.c.get("/search/json/?q=ty")
+        self.assertEqual(loads(response.content), [])
+
     def test_search_empty(self):
         response = self.c.get("/search/?q=")
         self.assertEquals(response.status_code, 200)
@@ -42,6 +113,32 @@ class BasicTest(TestCase):
         response = self.c.get("/dashboard/")
         self.assertEqual(response.status_code, 200)
 
+    def test_dashboard_active_projects_and_users(self):
+        busy = ActualTimeFactory(
+            actual_time=timedelta(hours=12),
+            completed=datetime.now() - timedelta(days=1))
+        ActualTimeFactory(
+            actual_time=timedelta(hours=2),
+            completed=datetime.now() - timedelta(days=2))
+        response = self.c.get("/dashboard/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.context['active_projects'],
+            [busy.item.milestone.project])
+        self.assertEqual(response.context['active_users'], [busy.resolver])
+        self.assertEqual(
+            response.context['active_users'][0].recent_hours, 12.)
+        self.assertEqual(len(response.context['breakdowns']), 4)
+
+    def test_dashboard_milestones(self):
+        m = MilestoneFactory(target_date=datetime.now().date())
+        ItemFactory(milestone=m, estimated_time=timedelta(hours=2))
+        response = self.c.get("/dashboard/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['milestones'], [m])
+        self.assertEqual(response.context['milestones'][0].open_items, 1)
+        self.assertTrue(m.name in response.content)
+
 
 class TestProjectViews(TestCase):
     def setUp(self):
@@ -174,6 +271,52 @@ class TestMilestoneViews(TestCase):
         self.assertTrue(m.name in r.content)
         self.assertTrue(m.get_absolute_url() in r.content)
 
+    def populate_project(self, project, n):
+        for x in range(n):
+            m = MilestoneFactory(project=project)
+            ItemFactory(milestone=m, assigned_to=UserFactory())
+            node = NodeFactory(project=project, author=UserFactory())
+            node.tags.add("tag%d" % x)
+            StatusUpdateFactory(project=project, user=UserFactory())
+            project.add_developer(UserFactory(status='active'))
+
+    def project_page_queries(self, project):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        with CaptureQueriesContext(connection) as queries:
+            r = self.c.get(project.get_absolute_url())
+        self.assertEqual(r.status_code, 200)
+        return len(queries)
+
+    def test_project_page_queries(self):
+        # the number of queries doesn't depend on how much is in
+        # the project
+        small = MilestoneFactory().project
+        self.populate_project(small, 1)
+        big = MilestoneFactory().project
+        self.populate_project(big, 5)
+        # the personnel lists are cached after the first time
+        self.project_page_queries(small)
+        self.project_page_queries(big)
+        self.assertEqual(self.project_page_queries(small),
+                         self.project_page_queries(big))
+
+    def test_project_page_context(self):
+        m = MilestoneFactory()
+        ItemFactory(milestone=m, status='OPEN')
+        ItemFactory(milestone=m, status='RESOLVED')
+        u = UserFactory(status='active')
+        m.project.add_developer(u)
+        other = UserFactory(status='active')
+        r = self.c.get(m.project.get_absolute_url())
+        self.assertEqual(r.context['milestones'][0].open_items, 1)
+        self.assertEqual(r.context['upcoming_milestone'], m)
+        self.assertEqual(r.context['personnel'], [u])
+        self.assertTrue(other in r.context['users_not_in_project'])
+        self.assertFalse(u in r.context['users_not_in_project'])
+        self.assertEqual(len(r.context['active_items']), 2)
+        self.assertEqual(r.context['milestones'][0].hours_logged, 0.)
+
     def test_milestone_page(self):
         m = MilestoneFactory()
         r = self.c.get(m.get_absolute_url())
@@ -1,6 +1,7 @@
 from django.contrib.auth.decorators import login_required
-from django.db.models import Q
-from django.http import HttpResponseRedirect
+from django.contrib.contenttypes.models import ContentType
+from django.core.paginator import Paginator, PageNotAnInteger, EmptyPage
+from django.http import HttpResponse, HttpResponseRedirect, Http404
 from django.shortcuts import get_object_or_404, render
 from django.utils.decorators import method_decorator
 from django.views.generic.base import TemplateView, View
@@ -9,135 +10,222 @@ from django.views.generic.edit import UpdateView, DeleteView
 from django.views.generic.list import ListView
 from django_filters.views import FilterView
 from django_statsd.clients import statsd
-from rest_framework import viewsets
+from rest_framework import status, viewsets
+from rest_framework.response import Response
+from rest_framework.templatetags.rest_framework import replace_query_param
+from rest_framework.views import APIView
 from taggit.models import Tag
 from taggit.utils import parse_tags
 import markdown
 from .models import (
     Project, Milestone, Item, Node, User, Client, StatusUpdate,
-    ActualTime)
-from .models import interval_sum
+    DashboardSnapshot)
 from .forms import (
     StatusUpdateForm, NodeUpdateForm, UserUpdateForm, ProjectUpdateForm,
     MilestoneUpdateForm, ItemUpdateForm)
-from dmt.claim.models import Claim
+from .rollups import hours_logged_by_milestone, hours_assigned_by_user
+from dmt.search.indexes import INDEXES, get_index
+from dmt.search.models import SearchEntry
 from .serializers import (
     UserSerializer, ClientSerializer, ProjectSerializer,
     MilestoneSerializer, ItemSerializer)
+from .pagination import CursorPaginationMixin
+from .sync import FEEDS, Watermark, WatermarkExpired
 from rest_framework import generics
-from datetime import datetime, timedelta
+from datetime import datetime
+from json import dumps
 from simpleduration import Duration, InvalidDuration
 
 
-def has_claim(user):
-    r = Claim.objects.filter(django_user=user)
-    return r.count() == 1
-
-
 class LoggedInMixin(object):
     @method_decorator(login_required)
     def dispatch(self, *args, **kwargs):
-        if not has_claim(self.request.user):
+        if self.request.pmt_user is None:
             return HttpResponseRedirect("/claim/")
         return super(LoggedInMixin, self).dispatch(*args, **kwargs)
 
 
+def get_page(paginator, number):
+    try:
+        return paginator.page(number)
+    except PageNotAnInteger:
+        return paginator.page(1)
+    except EmptyPage:
+        return paginator.page(paginator.num_pages)
+
+
+def search_query(request):
+    """ the q parameter, or None if it's too short to search for """
+    q = request.GET.get('q', '').strip()
+    if len(q) < 3:
+        return None
+    return q
+
+
 class SearchView(LoggedInMixin, TemplateView):
+    """ the first few matches of each type, with a count. the rest
+    are a link away, on SearchTypeView """
     template_name = "main/search_results.html"
+    matches_per_type = 10
 
     def get_context_data(self, **kwargs):
-        q = self.request.GET.get('q', '').strip()
-        if len(q) < 3:
+        q = search_query(self.request)
+        if q is None:
             return dict(
                 error="bad input",
-                q=q)
-        return dict(
-            q=q,
-            users=User.objects.filter(
-                Q(fullname__icontains=q) |
-                Q(bio__icontains=q) |
-                Q(username__icontains=q)
-            ),
-            clients=Client.objects.filter(
-                Q(email__icontains=q) |
-                Q(firstname__icontains=q) |
-                Q(lastname__icontains=q) |
-                Q(title__icontains=q) |
-                Q(department__icontains=q) |
-                Q(school__icontains=q) |
-                Q(comments__icontains=q)
-            ),
-            projects=Project.objects.filter(
-                Q(name__icontains=q) |
-                Q(description__icontains=q)
-            ),
-            milestones=Milestone.objects.filter(
-                Q(name__icontains=q) |
-                Q(description__icontains=q)
-            ),
-            # TODO: comments/events for items should also be searched
-            # and merged in.
-            items=Item.objects.filter(
-                Q(title__icontains=q) |
-                Q(description__icontains=q)
-            ),
-            nodes=Node.objects.filter(
-                Q(body__icontains=q) |
-                Q(subject__icontains=q)
-            ),
-            tags=Tag.objects.filter(name__icontains=q),
-            status_updates=StatusUpdate.objects.filter(body__icontains=q),
-        )
-
+                q=self.request.GET.get('q', ''))
+        sections = []
+        for index in INDEXES:
+            page = Paginator(
+                SearchEntry.objects.search(q, index.name),
+                self.matches_per_type).page(1)
+            sections.append(dict(
+                index=index,
+                page=page,
+                objects=index.load([e.object_id for e in page])))
+        return dict(q=q, sections=sections)
+
+
+class SearchTypeView(LoggedInMixin, TemplateView):
+    """ all the matches of one type, a page at a time """
+    template_name = "main/search_type_results.html"
+    paginate_by = 20
 
-class UserViewSet(viewsets.ModelViewSet):
+    def get_context_data(self, **kwargs):
+        index = get_index(kwargs['type'])
+        if index is None:
+            raise Http404
+        q = search_query(self.request)
+        if q is None:
+            return dict(
+                error="bad input",
+                q=self.request.GET.get('q', ''),
+                index=index)
+        page = get_page(
+            Paginator(SearchEntry.objects.search(q, index.name),
+                      self.paginate_by),
+            self.request.GET.get('page', 1))
+        return dict(
+            q=q, index=index, page=page,
+            objects=index.load([e.object_id for e in page]))
+
+
+class SearchJSONView(LoggedInMixin, View):
+    """ the best few matches of each type (or of just the one in the
+    type parameter), for typeahead """
+    matches_per_type = 5
+
+    def get(self, request):
+        q = search_query(request)
+        indexes = INDEXES
+        if request.GET.get('type'):
+            indexes = [get_index(request.GET['type'])]
+            if indexes[0] is None:
+                raise Http404
+        if q is None:
+            indexes = []
+        d = []
+        for index in indexes:
+            entries = SearchEntry.objects.search(q, index.name)
+            objects = index.load(
+                [e.object_id for e in entries[:self.matches_per_type]])
+            d.extend(dict(type=index.name, value=index.label(o),
+                          url=index.url(o))
+                     for o in objects)
+        return HttpResponse(dumps(d), content_type="application/json")
+
+
+class UserViewSet(CursorPaginationMixin, viewsets.ModelViewSet):
     queryset = User.objects.all()
     serializer_class = UserSerializer
+    ordering = ('username',)
 
 
-class ClientViewSet(viewsets.ModelViewSet):
-    queryset = Client.objects.all()
+class ClientViewSet(CursorPaginationMixin, viewsets.ModelViewSet):
+    queryset = Client.objects.select_related('contact')
     serializer_class = ClientSerializer
+    ordering = ('lastname', 'firstname', 'client_id')
     paginate_by = 10
 
 
-class ProjectViewSet(viewsets.ModelViewSet):
-    queryset = Project.objects.all()
+class ProjectViewSet(CursorPaginationMixin, viewsets.ModelViewSet):
+    queryset = Project.objects.select_related(
+        'caretaker').prefetch_related('milestone_set')
     serializer_class = ProjectSerializer
-    paginate_by = 20
+    ordering = ('name', 'pid')
 
 
-class ProjectMilestoneList(generics.ListCreateAPIView):
+class ProjectMilestoneList(CursorPaginationMixin,
+                           generics.ListCreateAPIView):
     model = Milestone
     serializer_class = MilestoneSerializer
+    ordering = ('target_date', 'name', 'mid')
 
     def get_queryset(self):
         pk = self.kwargs.get('pk', None)
-        return Milestone.objects.filter(project__pk=pk)
+        return Milestone.objects.filter(project__pk=pk).select_related(
+            'project').prefetch_related('item_set')
 
 
-class MilestoneViewSet(viewsets.ModelViewSet):
-    queryset = Milestone.objects.all()
+class MilestoneViewSet(CursorPaginationMixin, viewsets.ModelViewSet):
+    queryset = Milestone.objects.select_related(
+        'project').prefetch_related('item_set')
     serializer_class = MilestoneSerializer
-    paginate_by = 20
+    ordering = ('target_date', 'name', 'mid')
 
 
-class MilestoneItemList(generics.ListCreateAPIView):
+class MilestoneItemList(CursorPaginationMixin, generics.ListCreateAPIView):
     model = Item
     serializer_class = ItemSerializer
+    ordering = ('iid',)
 
     def get_queryset(self):
         pk = self.kwargs.get('pk', None)
-        return Item.objects.filter(
-            milestone__pk=pk).prefetch_related(
-            'owner', 'assigned_to',
-            'milestone')
+        return Item.objects.filter(milestone__pk=pk).select_related(
+            'owner', 'assigned_to', 'milestone')
+
+    def pre_save(self, obj):
+        obj.last_mod = datetime.now()
 
 
-class ItemViewSet(viewsets.ModelViewSet):
-    queryset = Item.objects.all()
+class ItemViewSet(CursorPaginationMixin, viewsets.ModelViewSet):
+    queryset = Item.objects.select_related(
+        'owner', 'assigned_to', 'milestone')
     serializer_class = ItemSerializer
-    paginate_by = 20
+    ordering = ('iid',)
+
+    def pre_save(self, obj):
+        obj.last_mod = datetime.now()
+
+
+class ChangesView(APIView):
+    """ what's been saved or deleted since ?since=<watermark>
+    (see sync.py) """
+
+    def get(self, request, type):
+        feed = FEEDS.get(type)
+        if feed is None:
+            raise Http404
+        since = request.QUERY_PARAMS.get('since')
+        if since is not None:
+            since = Watermark.decode(since)
+        try:
+            changes, watermark, more = feed.changes(since)
+        except WatermarkExpired:
+            return Response(
+                {'detail': 'watermark expired. start again without one'},
+                status=status.HTTP_410_GONE)
+        next_url = None
+        if more:
+            next_url = replace_query_param(
+                request.build_absolute_uri(), 'since', watermark.encode())
+        context = {'request': request}
+        return Response({
+            'changes': [feed.serialize(c, context) for c in changes],
+            'watermark': watermark.encode(),
+            'more': more,
+            'next': next_url,
+        })
 
 
 def log_time(item, user, request):
@@ -154,7 +242,7 @@ def log_time(item, user, request):
 class AddCommentView(LoggedInMixin, View):
     def post(self, request, pk):
         item = get_object_or_404(Item, pk=pk)
-        user = get_object_or_404(Claim, django_user=request.user).pmt_user
+        user = request.pmt_user
         body = request.POST.get('comment', u'')
         if body == '':
             return HttpResponseRedirect(item.get_absolute_url())
@@ -169,7 +257,7 @@ class AddCommentView(LoggedInMixin, View):
 class ResolveItemView(LoggedInMixin, View):
     def post(self, request, pk):
         item = get_object_or_404(Item, pk=pk)
-        user = get_object_or_404(Claim, django_user=request.user).pmt_user
+        user = request.pmt_user
         r_status = request.POST.get('r_status', u'FIXED')
         comment = markdown.markdown(request.POST.get('comment', u''))
         if (item.assigned_to.username == item.owner.username and
@@ -190,7 +278,7 @@ class ResolveItemView(LoggedInMixin, View):
 class InProgressItemView(LoggedInMixin, View):
     def post(self, request, pk):
         item = get_object_or_404(Item, pk=pk)
-        user = get_object_or_404(Claim, django_user=request.user).pmt_user
+        user = request.pmt_user
         comment = markdown.markdown(request.POST.get('comment', u''))
         item.mark_in_progress(user, comment)
         item.touch()
@@ -205,7 +293,7 @@ class InProgressItemView(LoggedInMixin, View):
 class VerifyItemView(LoggedInMixin, View):
     def post(self, request, pk):
         item = get_object_or_404(Item, pk=pk)
-        user = get_object_or_404(Claim, django_user=request.user).pmt_user
+        user = request.pmt_user
         comment = markdown.markdown(request.POST.get('comment', u''))
         item.verify(user, comment)
         item.touch()
@@ -220,7 +308,7 @@ class VerifyItemView(LoggedInMixin, View):
 class ReopenItemView(LoggedInMixin, View):
     def post(self, request, pk):
         item = get_object_or_404(Item, pk=pk)
-        user = get_object_or_404(Claim, django_user=request.user).pmt_user
+        user = request.pmt_user
         comment = markdown.markdown(request.POST.get('comment', u''))
         item.reopen(user, comment)
         item.touch()
@@ -235,7 +323,7 @@ class ReopenItemView(LoggedInMixin, View):
 class ReassignItemView(LoggedInMixin, View):
     def post(self, request, pk):
         item = get_object_or_404(Item, pk=pk)
-        user = get_object_or_404(Claim, django_user=request.user).pmt_user
+        user = request.pmt_user
         assigned_to = get_object_or_404(
             User,
             username=request.POST.get('assigned_to', ''))
@@ -252,7 +340,7 @@ class ReassignItemView(LoggedInMixin, View):
 class ChangeOwnerItemView(LoggedInMixin, View):
     def post(self, request, pk):
         item = get_object_or_404(Item, pk=pk)
-        user = get_object_or_404(Claim, django_user=request.user).pmt_user
+        user = request.pmt_user
         owner = get_object_or_404(
             User,
             username=request.POST.get('owner', ''))
@@ -291,7 +379,7 @@ class ItemPriorityView(LoggedInMixin, View):
     def get(self, request, pk, priority):
         # TODO: make this happen through POST
         item = get_object_or_404(Item, pk=pk)
-        user = get_object_or_404(Claim, django_user=request.user).pmt_user
+        user = request.pmt_user
         item.set_priority(int(priority), user)
         item.touch()
         statsd.incr('main.priority_changed')
@@ -316,7 +404,7 @@ class RemoveTagFromItemView(LoggedInMixin, View):
 class SplitItemView(LoggedInMixin, View):
     def post(self, request, pk):
         item = get_object_or_404(Item, pk=pk)
-        user = get_object_or_404(Claim, django_user=request.user).pmt_user
+        user = request.pmt_user
 
         new_items = []
         titles = [request.POST.get(k) for k in request.POST.keys()
@@ -345,6 +433,17 @@ class SplitItemView(LoggedInMixin, View):
 class ItemDetailView(LoggedInMixin, DetailView):
     model = Item
 
+    def get_queryset(self):
+        return Item.objects.select_related(
+            'milestone__project', 'owner', 'assigned_to')
+
+    def get_context_data(self, **kwargs):
+        context = super(ItemDetailView, self).get_context_data(**kwargs)
+        context['history'] = self.object.rendered_history()
+        context['actual_times'] = list(
+            self.object.actualtime_set.select_related('resolver'))
+        return context
+
 
 class IndexView(LoggedInMixin, TemplateView):
     template_name = "main/index.html"
@@ -354,14 +453,19 @@ class ClientListView(LoggedInMixin, FilterView):
     model = Client
     paginate_by = 100
 
+    def get_queryset(self):
+        return Client.objects.select_related('contact')
+
 
 class StatusUpdateListView(LoggedInMixin, ListView):
     model = StatusUpdate
+    queryset = StatusUpdate.objects.select_related('project', 'user')
     paginate_by = 20
 
 
 class MilestoneListView(LoggedInMixin, ListView):
     model = Milestone
+    queryset = Milestone.objects.select_related('project')
     paginate_by = 50
 
 
@@ -381,7 +485,8 @@ class ClientDetailView(LoggedInMixin, DetailView):
 
 class ForumView(LoggedInMixin, ListView):
     model = Node
-    queryset = Node.objects.filter(reply_to=0)
+    queryset = Node.objects.filter(reply_to=0).select_related(
+        'project', 'author').prefetch_related('tags')
     paginate_by = 20
 
 
@@ -393,6 +498,10 @@ class NodeUpdateView(LoggedInMixin, UpdateView):
     model = Node
     form_class = NodeUpdateForm
 
+    def form_valid(self, form):
+        form.instance.modified = datetime.now()
+        return super(NodeUpdateView, self).form_valid(form)
+
 
 class NodeDeleteView(LoggedInMixin, DeleteView):
     model = Node
@@ -402,14 +511,49 @@ class NodeDeleteView(LoggedInMixin, DeleteView):
 class MilestoneDetailView(LoggedInMixin, DetailView):
     model = Milestone
 
+    def get_context_data(self, **kwargs):
+        context = super(MilestoneDetailView, self).get_context_data(
+            **kwargs)
+        context['items'] = list(self.object.item_set.select_related(
+            'owner', 'assigned_to'))
+        return context
+
 
 class ProjectListView(LoggedInMixin, FilterView):
     model = Project
 
 
 class ProjectDetailView(LoggedInMixin, DetailView):
+    """ the project page shows the same milestones and personnel in
+    several places, so everything gets loaded once, up front """
     model = Project
 
+    def get_queryset(self):
+        return Project.objects.select_related('caretaker')
+
+    def get_context_data(self, **kwargs):
+        context = super(ProjectDetailView, self).get_context_data(**kwargs)
+        project = self.object
+        milestones = list(project.milestone_set.all())
+        logged = hours_logged_by_milestone(project)
+        for m in milestones:
+            m.hours_logged = logged.get(m.mid, 0.)
+        if milestones:
+            context['upcoming_milestone'] = project.upcoming_milestone()
+        context.update(
+            milestones=milestones,
+            personnel=project.personnel_in_project(),
+            all_personnel=project.all_personnel_in_project(),
+            users_not_in_project=project.all_users_not_in_project(),
+            active_items=list(project.active_items().select_related(
+                'owner', 'assigned_to')),
+            recent_forum_posts=project.node_set.select_related(
+                'author').prefetch_related('tags')[:10],
+            recent_status_updates=project.statusupdate_set.select_related(
+                'user')[:20],
+        )
+        return context
+
 
 class ProjectUpdateView(LoggedInMixin, UpdateView):
     model = Project
@@ -419,6 +563,14 @@ class ProjectUpdateView(LoggedInMixin, UpdateView):
 class UserListView(LoggedInMixin, FilterView):
     model = User
 
+    def get_context_data(self, **kwargs):
+        context = super(UserListView, self).get_context_data(**kwargs)
+        assigned = hours_assigned_by_user()
+        context['object_list'] = list(context['object_list'])
+        for u in context['object_list']:
+            u.hours_assigned = assigned.get(u.username, 0.)
+        return context
+
 
 class UserDetailView(LoggedInMixin, DetailView):
     model = User
@@ -438,6 +590,10 @@ class ItemUpdateView(LoggedInMixin, UpdateView):
     model = Item
     form_class = ItemUpdateForm
 
+    def form_valid(self, form):
+        form.instance.last_mod = datetime.now()
+        return super(ItemUpdateView, self).form_valid(form)
+
 
 class TagListView(LoggedInMixin, ListView):
     model = Tag
@@ -464,24 +620,27 @@ class TagDetailView(LoggedInMixin, DetailView):
         # and our tables get normal 'id' columns, this can
         # be cleaned up.
 
-        context['items'] = [
-            ti.content_object
-            for ti
-            in self.object.taggit_taggeditem_items.all()
-            if ti.content_object.__class__ == Item]
-
-        context['nodes'] = [
-            ti.content_object
-            for ti
-            in self.object.taggit_taggeditem_items.all()
-            if ti.content_object.__class__ == Node]
+        tagged = list(self.object.taggit_taggeditem_items.all())
+        context['items'] = self.tagged(
+            tagged, Item.objects.select_related(
+                'milestone__project', 'owner', 'assigned_to'))
+        context['nodes'] = self.tagged(
+            tagged, Node.objects.select_related('project', 'author'))
         return context
 
+    def tagged(self, tagged, queryset):
+        """ the objects from queryset that have this tag, loaded all
+        at once rather than one content_object at a time """
+        content_type = ContentType.objects.get_for_model(queryset.model)
+        return in_order(queryset, [
+            ti.object_id for ti in tagged
+            if ti.content_type_id == content_type.id])
+
 
 class NodeReplyView(LoggedInMixin, View):
     def post(self, request, pk):
         node = get_object_or_404(Node, pk=pk)
-        user = get_object_or_404(Claim, django_user=request.user).pmt_user
+        user = request.pmt_user
         body = request.POST.get('body', u'')
         if body == '':
             return HttpResponseRedirect(node.get_absolute_url())
@@ -521,7 +680,7 @@ class ProjectAddUserView(LoggedInMixin, View):
 class ProjectAddTodoView(LoggedInMixin, View):
     def post(self, request, pk):
         project = get_object_or_404(Project, pid=pk)
-        user = get_object_or_404(Claim, django_user=request.user).pmt_user
+        user = request.pmt_user
         tags = clean_tags(request.POST.get('tags', u''))
         for k in request.POST.keys():
             if not k.startswith('title_'):
@@ -539,7 +698,7 @@ class ProjectAddItemView(LoggedInMixin, View):
 
     def post(self, request, pk):
         project = get_object_or_404(Project, pid=pk)
-        user = get_object_or_404(Claim, django_user=request.user).pmt_user
+        user = request.pmt_user
         title = request.POST.get('title', u"somebody forgot to enter a title")
         tags = clean_tags(request.POST.get('tags', u''))
         description = request.POST.get('description', u'')
@@ -567,7 +726,7 @@ class ProjectAddItemView(LoggedInMixin, View):
 class ProjectAddNodeView(LoggedInMixin, View):
     def post(self, request, pk):
         project = get_object_or_404(Project, pid=pk)
-        user = get_object_or_404(Claim, django_user=request.user).pmt_user
+        user = request.pmt_user
         body = request.POST.get('body', u'')
         if body == '':
             return HttpResponseRedirect(project.get_absolute_url())
@@ -581,7 +740,7 @@ class ProjectAddNodeView(LoggedInMixin, View):
 class ProjectAddStatusUpdateView(LoggedInMixin, View):
     def post(self, request, pk):
         project = get_object_or_404(Project, pid=pk)
-        user = get_object_or_404(Claim, django_user=request.user).pmt_user
+        user = request.pmt_user
         body = request.POST.get('body', u'')
         if body == '':
             return HttpResponseRedirect(project.get_absolute_url())
@@ -627,99 +786,47 @@ class RemoveTagFromNodeView(LoggedInMixin, View):
         return HttpResponseRedirect(node.get_absolute_url())
 
 
+def in_order(queryset, pks):
+    """ the objects from queryset with these primary keys, in the
+    same order as pks. any that have since been deleted are skipped """
+    objects = queryset.in_bulk(pks)
+    return [objects[pk] for pk in pks if pk in objects]
+
+
 class DashboardView(LoggedInMixin, TemplateView):
     template_name = "main/dashboard.html"
 
     def get_context_data(self, **kwargs):
         context = super(DashboardView, self).get_context_data(**kwargs)
-        total_open_items = Item.objects.filter(
-            status__in=['OPEN', 'INPROGRESS'])
-        open_sm_items = Item.objects.filter(
-            status__in=['OPEN', 'INPROGRESS'],
-            milestone__name='Someday/Maybe')
-        # item counts
-        context['total_open_items'] = total_open_items.count()
-        context['open_sm_items'] = open_sm_items.count()
-        context['open_non_sm_items'] = (
-            total_open_items.count() - open_sm_items.count())
-
-        # hour estimates
-        total_hours_estimated = interval_sum(
-            [i.estimated_time for i in total_open_items]
-        ).total_seconds() / 3600.
-
-        sm_hours_estimated = interval_sum(
-            [i.estimated_time for i in open_sm_items]
-        ).total_seconds() / 3600.
-
-        context['sm_hours_estimated'] = sm_hours_estimated
-        context['non_sm_hours_estimated'] = (
-            total_hours_estimated - sm_hours_estimated)
-
-        # recent/upcoming milestones
-        now = datetime.now()
-        four_weeks_ago = now - timedelta(weeks=4)
-        four_weeks_future = now + timedelta(weeks=4)
-        two_weeks_ago = now - timedelta(weeks=2)
-
-        context['milestones'] = Milestone.objects.filter(
-            target_date__gt=four_weeks_ago,
-            target_date__lt=four_weeks_future,
-            ).order_by("target_date").select_related('project')
-
-        # active projects
-        times_logged = ActualTime.objects.filter(
-            completed__gt=two_weeks_ago).select_related(
-            'item', 'resolver', 'item__milestone',
-            'item__milestone__project')
-        all_active_items = set([a.item for a in times_logged])
-        all_active_projects = set(
-            [i.milestone.project for i in all_active_items])
-        all_active_users = set([a.resolver for a in times_logged])
-
-        for p in all_active_projects:
-            p.recent_hours = interval_sum(
-                [a.actual_time for a in times_logged
-                 if a.item.milestone.project == p]).total_seconds() / 3600.
-
-        for u in all_active_users:
-            u.recent_hours = interval_sum(
-                [a.actual_time for a in times_logged
-                 if a.resolver == u]).total_seconds() / 3600.
-
-        context['active_projects'] = [
-            p for p in sorted(list(all_active_projects),
-                              key=lambda x: x.recent_hours,
-                              reverse=True)
-            if p.recent_hours > 10.]
-        context['active_users'] = [
-            u for u in sorted(
-                list(all_active_users),
-                key=lambda x: x.recent_hours,
-                reverse=True)
-            if u.recent_hours > 10.]
-
-        # week by week breakdown
-        week_start = now + timedelta(days=-now.weekday())
-        week_end = week_start + timedelta(days=6)
-
-        weeks = [
-            (week_start, now),
-            (week_start - timedelta(weeks=1), week_end - timedelta(weeks=1)),
-            (week_start - timedelta(weeks=2), week_end - timedelta(weeks=2)),
-            (week_start - timedelta(weeks=3), week_end - timedelta(weeks=3)),
-        ]
-
-        breakdowns = [
-            interval_sum(
-                [a.actual_time for a in ActualTime.objects.filter(
-                    completed__gte=monday,
-                    completed__lte=sunday,
-                    )]).total_seconds() / 3600.
-            for (monday, sunday) in weeks]
-
-        context['breakdowns'] = breakdowns
-
-        context['status_updates'] = StatusUpdate.objects.filter(
-            added__gte=two_weeks_ago)
+        snapshots = DashboardSnapshot.current()
+        context['snapshot_taken'] = min(
+            s.created for s in snapshots.values())
+        context.update(snapshots['items'].get_data())
+
+        milestones = snapshots['milestones'].get_data()
+        context['milestones'] = in_order(
+            Milestone.objects.select_related('project'),
+            [mid for (mid, hours, count) in milestones])
+        remaining = dict(
+            (mid, (hours, count)) for (mid, hours, count) in milestones)
+        for m in context['milestones']:
+            (m.hours_remaining, m.open_items) = remaining[m.mid]
+
+        activity = snapshots['activity'].get_data()
+        context['active_projects'] = self.with_recent_hours(
+            Project.objects.all(), activity['projects'])
+        context['active_users'] = self.with_recent_hours(
+            User.objects.all(), activity['users'])
+        context['breakdowns'] = activity['breakdowns']
+
+        context['status_updates'] = in_order(
+            StatusUpdate.objects.select_related('project', 'user'),
+            snapshots['status_updates'].get_data())
         return context
+
+    def with_recent_hours(self, queryset, hours):
+        objects = in_order(queryset, [pk for (pk, h) in hours])
+        hours = dict(hours)
+        for o in objects:
+            o.recent_hours = hours[o.pk]
+        return objects
@@ -0,0 +1,86 @@
+from django.core.cache import cache
+from django.utils import timezone
+from django_statsd.clients import statsd
+from datetime import date, timedelta
+from dmt.main.personnel import personnel_version
+
+
+def week_start(d):
+    """ the monday of the week containing the date d """
+    return d - timedelta(days=d.weekday())
+
+
+def report_key(name, monday, *parts):
+    return ".".join(["report", name] + list(parts) + [monday.isoformat()])
+
+
+def staff_parts():
+    """ the staff report is grouped by InGroup and shows users' names
+    and status, so a past week's is only good for as long as none of
+    that changes (see personnel.py) """
+    return [personnel_version()]
+
+
+def cached_report(name, parts, start, end, compute):
+    """ the result of compute() for a report called name, covering
+    the dates start to end, all in one week.
+
+    once a week is over the reports for it don't change (unless
+    somebody backdates some time, which invalidate_actual_time takes
+    care of) so those are kept in the cache indefinitely. anything
+    that isn't over yet is always computed fresh. """
+    if end >= date.today():
+        return compute()
+    key = report_key(name, week_start(start), *parts)
+    data = cache.get(key)
+    if data is not None:
+        statsd.incr('report.cache.%s.hit' % name)
+        return data
+    statsd.incr('report.cache.%s.miss' % name)
+    data = compute()
+    cache.set(key, data, None)
+    return data
+
+
+def whole_past_week(start, end):
+    return (start.weekday() == 0 and end - start == timedelta(weeks=1) and
+            end < date.today())
+
+
+def cached_reports(name, parts, pieces, compute):
+    """ cached_report() for a run of (start, end) date pieces at once.
+    compute(pieces) gets all the ones that can't come out of the cache
+    together, and returns a report for each of them. only whole weeks
+    that are over get cached. """
+    keys = dict((piece, report_key(name, piece[0], *parts))
+                for piece in pieces if whole_past_week(*piece))
+    cached = cache.get_many(keys.values())
+    missing = [piece for piece in pieces if keys.get(piece) not in cached]
+    computed = dict(zip(missing, compute(missing)))
+    if keys:
+        statsd.incr('report.cache.%s.hit' % name, len(cached))
+        statsd.incr('report.cache.%s.miss' % name, len(keys) - len(cached))
+    cache.set_many(dict((keys[piece], computed[piece])
+                        for piece in missing if piece in keys), None)
+    return [computed[piece] if piece in computed else cached[keys[piece]]
+            for piece in pieces]
+
+
+def invalidate_actual_time(actual_time):
+    """ clear the cached reports for the week an ActualTime falls in """
+    completed = actual_time.completed
+    if timezone.is_aware(completed):
+        completed = timezone.localtime(completed)
+    # the reports filter on (start.date, end.date], so something logged
+    # right at midnight on a monday counts towards the week before.
+    # just clear both rather than worry about it.
+    mondays = set([week_start(completed.date()),
+                   week_start((completed - timedelta(days=1)).date())])
+    keys = []
+    for monday in mondays:
+        keys.append(report_key('staff', monday, *staff_parts()))
+        keys.append(report_key(
+            'user_weekly', monday, actual_time.resolver_id))
+        keys.append(report_key(
+            'user_yearly_week', monday, actual_time.resolver_id))
+    cache.delete_many(keys)
@@ -0,0 +1,10 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from dmt.main.models import ActualTime
+from .caching import invalidate_actual_time
+
+
+@receiver(post_save, sender=ActualTime)
+@receiver(post_delete, sender=ActualTime)
+def actual_time_changed(sender, instance, **kwargs):
+    invalidate_actual_time(instance)
@@ -0,0 +1,114 @@
+from django.core.cache import cache
+from django.test import TestCase
+from datetime import date, datetime, timedelta
+from dmt.main.tests.factories import (
+    ActualTimeFactory, ItemFactory, UserFactory)
+from dmt.report import caching
+from dmt.report.caching import (
+    week_start, report_key, cached_report, cached_reports,
+    invalidate_actual_time, staff_parts)
+
+
+def staff_key(monday):
+    return report_key('staff', monday, *staff_parts())
+
+
+class DummyStatsd(object):
+    def __init__(self):
+        self.counters = []
+
+    def incr(self, name, count=1):
+        self.counters.extend([name] * count)
+
+
+class ReportCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.statsd = caching.statsd
+        caching.statsd = DummyStatsd()
+        self.calls = 0
+
+    def tearDown(self):
+        caching.statsd = self.statsd
+
+    def compute(self):
+        self.calls += 1
+        return dict(answer=42)
+
+    def test_week_start(self):
+        self.assertEqual(week_start(date(2013, 12, 19)), date(2013, 12, 16))
+        self.assertEqual(week_start(date(2013, 12, 16)), date(2013, 12, 16))
+
+    def test_report_key(self):
+        self.assertEqual(
+            report_key('user_weekly', date(2013, 12, 16), 'foo'),
+            'report.user_weekly.foo.2013-12-16')
+
+    def test_closed_week_cached(self):
+        for i in range(3):
+            r = cached_report('test', [], date(2013, 12, 16),
+                              date(2013, 12, 22), self.compute)
+            self.assertEqual(r, dict(answer=42))
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(
+            caching.statsd.counters,
+            ['report.cache.test.miss', 'report.cache.test.hit',
+             'report.cache.test.hit'])
+
+    def test_cached_reports(self):
+        computed = []
+
+        def compute(pieces):
+            computed.append(pieces)
+            return [a.isoformat() for (a, b) in pieces]
+        # a part week, a whole one, and another part week
+        pieces = [(date(2013, 12, 12), date(2013, 12, 16)),
+                  (date(2013, 12, 16), date(2013, 12, 23)),
+                  (date(2013, 12, 23), date(2013, 12, 25))]
+        for i in range(2):
+            self.assertEqual(
+                cached_reports('test', [], pieces, compute),
+                ['2013-12-12', '2013-12-16', '2013-12-23'])
+        self.assertEqual(computed, [pieces, [pieces[0], pieces[2]]])
+        self.assertEqual(
+            caching.statsd.counters,
+            ['report.cache.test.miss', 'report.cache.test.hit'])
+
+    def test_open_week_not_cached(self):
+        today = date.today()
+        for i in range(2):
+            cached_report('test', [], today, today + timedelta(days=6),
+                          self.compute)
+        self.assertEqual(self.calls, 2)
+        self.assertEqual(caching.statsd.counters, [])
+
+    def test_invalidate_actual_time(self):
+        u = UserFactory()
+        # before the keys, since adding users moves the staff report
+        # on to a new version by itself
+        item = ItemFactory()
+        monday = date(2013, 12, 16)
+        cache.set(report_key('user_weekly', monday, u.username), 'x')
+        cache.set(staff_key(monday), 'x')
+        cache.set(staff_key(monday - timedelta(weeks=1)), 'x')
+        cache.set(staff_key(monday + timedelta(weeks=1)), 'x')
+        # creating it fires the signal
+        ActualTimeFactory(resolver=u, item=item,
+                          completed=datetime(2013, 12, 18, 12))
+        self.assertIsNone(
+            cache.get(report_key('user_weekly', monday, u.username)))
+        self.assertIsNone(cache.get(staff_key(monday)))
+        self.assertEqual(
+            cache.get(staff_key(monday - timedelta(weeks=1))), 'x')
+        self.assertEqual(
+            cache.get(staff_key(monday + timedelta(weeks=1))), 'x')
+
+    def test_invalidate_midnight(self):
+        u = UserFactory()
+        monday = date(2013, 12, 16)
+        cache.set(staff_key(monday - timedelta(weeks=1)), 'x')
+        at = ActualTimeFactory.build(resolver=u, completed=datetime(
+            2013, 12, 16, 0, 0))
+        invalidate_actual_time(at)
+        self.assertIsNone(
+            cache.get(staff_key(monday - timedelta(weeks=1))))
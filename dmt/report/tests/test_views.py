@@ -1,9 +1,15 @@
+from django.core.cache import cache
 from django.test import TestCase
 from django.test.client import Client
 from django.contrib.auth.models import User
 from dmt.main.models import User as PMTUser
 from dmt.claim.models import Claim
 from dmt.main.models import InGroup
+from dmt.main.tests.factories import UserFactory, ActualTimeFactory
+from datetime import date, datetime, timedelta
+# dmt.report.views is imported inside the tests. importing it here,
+# before the app cache is loaded, sets off a circular import of
+# dmt.main.views through the urlconf
 
 
 class UserWeeklyTest(TestCase):
@@ -71,3 +77,136 @@ class StaffReportTest(TestCase):
     def test_staff_report_previous(self):
         r = self.c.get("/report/staff/previous/")
         self.assertEqual(r.status_code, 302)
+
+
+class StaffReportDataTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.programmers = UserFactory(username='grp_programmers',
+                                       fullname='programmers (group)')
+        self.video = UserFactory(username='grp_video',
+                                 fullname='video (group)')
+        self.u1 = UserFactory()
+        self.u2 = UserFactory()
+        InGroup.objects.create(grp=self.programmers, username=self.u1)
+        InGroup.objects.create(grp=self.programmers, username=self.u2)
+        InGroup.objects.create(grp=self.video, username=self.u2)
+        ActualTimeFactory(resolver=self.u1, actual_time=timedelta(hours=3),
+                          completed=datetime(2013, 12, 17, 12))
+        ActualTimeFactory(resolver=self.u2, actual_time=timedelta(hours=2),
+                          completed=datetime(2013, 12, 18, 12))
+        ActualTimeFactory(resolver=self.u2, actual_time=timedelta(hours=9),
+                          completed=datetime(2013, 12, 28, 12))
+        self.start = datetime(2013, 12, 16)
+        self.end = datetime(2013, 12, 22)
+
+    def test_staff_report_data(self):
+        from dmt.report.views import staff_report_data
+        with self.assertNumQueries(2):
+            r = staff_report_data(self.start, self.end)
+        self.assertEqual(
+            [g['group'] for g in r['groups']],
+            [self.programmers, self.video])
+        programmers = r['groups'][0]
+        self.assertEqual(programmers['total_time'], timedelta(hours=5))
+        self.assertEqual(programmers['max_time'], timedelta(hours=3))
+        self.assertEqual(
+            sorted((u['user'].username, u['user_time'])
+                   for u in programmers['user_data']),
+            sorted([(self.u1.username, timedelta(hours=3)),
+                    (self.u2.username, timedelta(hours=2))]))
+        self.assertEqual(r['groups'][1]['total_time'], timedelta(hours=2))
+        self.assertEqual(r['group_max_time'], timedelta(hours=5))
+
+    def test_staff_report_data_empty_week(self):
+        from dmt.report.views import staff_report_data
+        r = staff_report_data(datetime(2001, 1, 1), datetime(2001, 1, 7))
+        self.assertEqual(len(r['groups']), 2)
+        self.assertEqual(r['group_max_time'], timedelta())
+
+    def test_backdated_time_invalidates(self):
+        from dmt.report.views import cached_staff_report_data
+        cached_staff_report_data(self.start, self.end)
+        ActualTimeFactory(resolver=self.u1, actual_time=timedelta(hours=1),
+                          completed=datetime(2013, 12, 19, 12))
+        r = cached_staff_report_data(self.start, self.end)
+        self.assertEqual(r['groups'][0]['total_time'], timedelta(hours=6))
+
+    def test_group_change_invalidates(self):
+        from dmt.report.views import cached_staff_report_data
+        cached_staff_report_data(self.start, self.end)
+        InGroup.objects.filter(grp=self.video).delete()
+        r = cached_staff_report_data(self.start, self.end)
+        self.assertEqual([g['group'] for g in r['groups']],
+                         [self.programmers])
+
+    def test_closed_week_is_cached(self):
+        from dmt.report.views import cached_staff_report_data
+        r = cached_staff_report_data(self.start, self.end)
+        with self.assertNumQueries(0):
+            r2 = cached_staff_report_data(self.start, self.end)
+        self.assertEqual(r, r2)
+
+    def test_current_week_is_not_cached(self):
+        from dmt.report.views import cached_staff_report_data
+        now = datetime.now()
+        cached_staff_report_data(now, now + timedelta(days=6))
+        with self.assertNumQueries(2):
+            cached_staff_report_data(now, now + timedelta(days=6))
+
+
+class UserYearlyReportTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_week_pieces(self):
+        from dmt.report.views import week_pieces
+        self.assertEqual(
+            week_pieces(date(2013, 12, 4), date(2013, 12, 20)),
+            [(date(2013, 12, 4), date(2013, 12, 9)),
+             (date(2013, 12, 9), date(2013, 12, 16)),
+             (date(2013, 12, 16), date(2013, 12, 20))])
+        self.assertEqual(week_pieces(date(2013, 12, 4), date(2013, 12, 4)),
+                         [])
+
+    def test_matches_weekly_report(self):
+        from dmt.report.views import user_yearly_report
+        u = UserFactory()
+        first = ActualTimeFactory(
+            resolver=u, actual_time=timedelta(hours=1),
+            completed=datetime(2013, 12, 5, 12))
+        ActualTimeFactory(
+            resolver=u, actual_time=timedelta(hours=2),
+            completed=datetime(2013, 12, 10, 12), item=first.item)
+        ActualTimeFactory(
+            resolver=u, actual_time=timedelta(hours=4),
+            completed=datetime(2013, 12, 17, 12))
+        start = datetime(2013, 12, 4)
+        end = datetime(2013, 12, 20)
+        expected = u.weekly_report(start, end)
+        for i in range(2):
+            r = user_yearly_report(u, start, end)
+            self.assertEqual(r['total_time'], expected['total_time'])
+            self.assertEqual(r['max_time'], timedelta(hours=4))
+            self.assertEqual(
+                sorted((p.pk, p.time) for p in r['active_projects']),
+                sorted((p.pk, p.time) for p in expected['active_projects']))
+            self.assertEqual(len(r['individual_times']), 3)
+
+    def test_one_query_for_the_year(self):
+        from dmt.report.views import user_yearly_report
+        u = UserFactory()
+        for weeks in range(0, 52, 5):
+            ActualTimeFactory(
+                resolver=u, actual_time=timedelta(hours=1),
+                completed=datetime(2013, 1, 2, 12) + timedelta(weeks=weeks))
+        start = datetime(2013, 1, 1)
+        end = datetime(2013, 12, 31)
+        with self.assertNumQueries(1):
+            r = user_yearly_report(u, start, end)
+        self.assertEqual(r['total_time'],
+                         u.weekly_report(start, end)['total_time'])
+        self.assertEqual(len(r['individual_times']), 11)
+        # and after that, only the part weeks at the ends
+        with self.assertNumQueries(1):
+            user_yearly_report(u, start, end)
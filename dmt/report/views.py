@@ -1,15 +1,16 @@
 from django.http import HttpResponseRedirect
 from django.shortcuts import get_object_or_404
 from django.views.generic import TemplateView, View
-from dmt.claim.models import Claim
-from dmt.main.models import User
+from dmt.main.models import User, ActualTime, InGroup, interval_sum
 from dmt.main.views import LoggedInMixin
-from datetime import datetime, timedelta
+from datetime import datetime, time, timedelta
+from .caching import (
+    cached_report, cached_reports, staff_parts, week_start as monday_of)
 
 
 class YearlyReviewView(LoggedInMixin, View):
     def get(self, request):
-        user = get_object_or_404(Claim, django_user=request.user).pmt_user
+        user = request.pmt_user
         return HttpResponseRedirect("/report/user/%s/yearly/" % user.username)
 
 
@@ -22,7 +23,7 @@ class UserYearlyView(LoggedInMixin, TemplateView):
         now = datetime.today()
         interval_start = now + timedelta(days=-365)
         interval_end = now
-        data = user.weekly_report(interval_start, interval_end)
+        data = user_yearly_report(user, interval_start, interval_end)
         data.update(dict(u=user, now=now,
                          interval_start=interval_start.date,
                          interval_end=interval_end.date,
@@ -44,7 +45,10 @@ class UserWeeklyView(LoggedInMixin, TemplateView):
         week_end = week_start + timedelta(days=6)
         prev_week = week_start - timedelta(weeks=1)
         next_week = week_start + timedelta(weeks=1)
-        data = user.weekly_report(week_start, week_end)
+        data = cached_report(
+            'user_weekly', [user.username],
+            week_start.date(), week_end.date(),
+            lambda: user.weekly_report(week_start, week_end))
         data.update(dict(u=user, now=now,
                          week_start=week_start.date,
                          week_end=week_end.date,
@@ -76,7 +80,7 @@ class StaffReportView(LoggedInMixin, TemplateView):
         week_end = week_start + timedelta(days=6)
         prev_week = week_start - timedelta(weeks=1)
         next_week = week_start + timedelta(weeks=1)
-        data = staff_report_data(week_start, week_end)
+        data = cached_staff_report_data(week_start, week_end)
         data.update(dict(now=now,
                          week_start=week_start.date,
                          week_end=week_end.date,
@@ -86,25 +90,93 @@ class StaffReportView(LoggedInMixin, TemplateView):
         return data
 
 
+STAFF_REPORT_GROUPS = [
+    'programmers', 'video', 'webmasters', 'educationaltechnologists',
+    'management']
+
+
 def staff_report_data(start, end):
-    groups = ['programmers', 'video', 'webmasters', 'educationaltechnologists',
-              'management']
-    group_reports = []
+    """ hours per user and per group for the staff groups. the group
+    memberships and the time logged by every member come from two
+    grouped queries; everything else is put together in memory """
+    memberships = InGroup.objects.filter(
+        grp__username__in=["grp_" + g for g in STAFF_REPORT_GROUPS],
+        username__isnull=False,
+    ).select_related('grp', 'username')
+    members = dict()
+    for ig in memberships:
+        members.setdefault(ig.grp.username, []).append(ig)
+
+    times = ActualTime.objects.filter(
+        resolver__in=set(ig.username_id for ig in memberships),
+        completed__gt=start.date,
+        completed__lte=end.date).total_time_by('resolver')
 
-    for grp in groups:
-        try:
-            group_user = User.objects.get(username="grp_" + grp)
-        except User.DoesNotExist:
+    group_reports = []
+    for grp in STAFF_REPORT_GROUPS:
+        if "grp_" + grp not in members:
             continue
-        group_total_time = group_user.total_group_time(start, end)
-        data = dict(group=group_user, total_time=group_total_time)
-        user_data = []
-        for user in group_user.users_in_group():
-            user_time = user.interval_time(start, end)
-            user_data.append(dict(user=user, user_time=user_time))
-        data['user_data'] = user_data
-        data['max_time'] = max(u['user_time'] for u in user_data)
-        group_reports.append(data)
-
-    group_max_time = max([g['total_time'] for g in group_reports])
+        user_data = [
+            dict(user=ig.username,
+                 user_time=times.get(ig.username_id, timedelta()))
+            for ig in members["grp_" + grp]]
+        group_reports.append(dict(
+            group=members["grp_" + grp][0].grp,
+            total_time=interval_sum(u['user_time'] for u in user_data),
+            user_data=user_data,
+            max_time=max(u['user_time'] for u in user_data)))
+
+    group_max_time = max(
+        [g['total_time'] for g in group_reports] or [timedelta()])
     return dict(groups=group_reports, group_max_time=group_max_time)
+
+
+def cached_staff_report_data(start, end):
+    return cached_report(
+        'staff', staff_parts(), start.date(), end.date(),
+        lambda: staff_report_data(start, end))
+
+
+def week_pieces(start, end):
+    """ split the dates (start, end] into [(a, b), ...] pieces that
+    each run from a monday to the next one, except for the first
+    and last, which may be shorter """
+    pieces = []
+    a = start
+    while a < end:
+        b = min(monday_of(a) + timedelta(weeks=1), end)
+        pieces.append((a, b))
+        a = b
+    return pieces
+
+
+def user_yearly_report(user, start, end):
+    """ the same thing as user.weekly_report(start, end), but put
+    together from a report for each week, so that all the weeks that
+    are already over come straight out of the cache. the rest are
+    loaded with one query """
+    def compute(pieces):
+        return user.weekly_reports([
+            (datetime.combine(a, time()), datetime.combine(b, time()))
+            for (a, b) in pieces])
+    return merge_reports(cached_reports(
+        'user_yearly_week', [user.username],
+        week_pieces(start.date(), end.date()), compute))
+
+
+def merge_reports(reports):
+    projects = dict()
+    individual_times = []
+    for r in reports:
+        for project in r['active_projects']:
+            if project.pk in projects:
+                projects[project.pk].time += project.time
+            else:
+                projects[project.pk] = project
+        individual_times.extend(r['individual_times'])
+    active_projects = sorted(projects.values(), key=lambda p: p.name)
+    return dict(
+        active_projects=active_projects,
+        max_time=max([p.time for p in active_projects] or [timedelta()]),
+        total_time=interval_sum(p.time for p in active_projects),
+        individual_times=individual_times)
@@ -0,0 +1,103 @@
+from django.db.models import Q
+from taggit.models import Tag
+from dmt.main.models import (
+    User, Client, Project, Milestone, Item, Node, StatusUpdate, Comment)
+
+
+class SearchIndex(object):
+    """ describes how one type of object gets into the search index:
+    which text to index for it, how to load it back and how to show
+    it in the results """
+
+    def __init__(self, name, title, model, fields, select_related=()):
+        self.name = name
+        self.title = title
+        self.model = model
+        self.fields = fields
+        self.related = select_related
+        self.template = "main/search/%s.html" % name
+
+    def object_id(self, obj):
+        return unicode(obj.pk)
+
+    def text(self, obj):
+        return u"\n".join(
+            unicode(getattr(obj, f) or u"") for f in self.fields)
+
+    def label(self, obj):
+        return unicode(getattr(obj, self.fields[0]))
+
+    def url(self, obj):
+        return obj.get_absolute_url()
+
+    def queryset(self):
+        return self.model.objects.select_related(*self.related)
+
+    def load(self, object_ids):
+        """ the objects with these ids, in the same order. any that
+        have gone away since they were indexed are skipped """
+        pks = [self.model._meta.pk.to_python(i) for i in object_ids]
+        objects = self.queryset().in_bulk(pks)
+        return [objects[pk] for pk in pks if pk in objects]
+
+
+class TagIndex(SearchIndex):
+    def url(self, obj):
+        return "/tag/%s/" % obj.slug
+
+
+class ClientIndex(SearchIndex):
+    def label(self, obj):
+        return u"%s, %s" % (obj.lastname, obj.firstname)
+
+    def url(self, obj):
+        return "/client/%d/" % obj.client_id
+
+
+class StatusUpdateIndex(SearchIndex):
+    def label(self, obj):
+        return u"%s: %s" % (obj.project.name, obj.body)
+
+
+class ItemIndex(SearchIndex):
+    """ items are found by their comments (including the ones
+    attached to events) as well as by their own title/description """
+
+    def text(self, obj):
+        comments = Comment.objects.filter(
+            Q(item=obj) | Q(event__item=obj)).values_list(
+            'comment', flat=True)
+        return u"\n".join(
+            [super(ItemIndex, self).text(obj)] + list(comments))
+
+
+INDEXES = [
+    TagIndex('tags', 'Tag', Tag, ['name']),
+    SearchIndex('users', 'User', User, ['fullname', 'bio', 'username']),
+    ClientIndex('clients', 'Client', Client, [
+        'email', 'firstname', 'lastname', 'title', 'department',
+        'school', 'comments']),
+    SearchIndex('projects', 'Project', Project, ['name', 'description']),
+    SearchIndex('milestones', 'Milestone', Milestone,
+                ['name', 'description'], select_related=['project']),
+    ItemIndex('items', 'Item', Item, ['title', 'description'],
+              select_related=['milestone', 'milestone__project']),
+    StatusUpdateIndex('status_updates', 'Status update', StatusUpdate,
+                      ['body'], select_related=['project', 'user']),
+    SearchIndex('nodes', 'Forum post', Node, ['subject', 'body'],
+                select_related=['author']),
+]
+
+
+def index_for_model(model):
+    for index in INDEXES:
+        if index.model == model:
+            return index
+    return None
+
+
+def get_index(name):
+    for index in INDEXES:
+        if index.name == name:
+            return index
+    return None
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from dmt.search.models import SearchEntry
+
+
+class Command(BaseCommand):
+    help = "rebuild the search index from scratch"
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            SearchEntry.objects.rebuild()
+        self.stdout.write(
+            "indexed %d objects" % SearchEntry.objects.count())
@@ -0,0 +1,54 @@
+# flake8: noqa
+# -*- coding: utf-8 -*-
+from south.utils import datetime_utils as datetime
+from south.db import db
+from south.v2 import SchemaMigration
+from django.db import models
+
+
+class Migration(SchemaMigration):
+
+    def forwards(self, orm):
+        # Adding model 'SearchEntry'
+        db.create_table(u'search_searchentry', (
+            (u'id', self.gf('django.db.models.fields.AutoField')(primary_key=True)),
+            ('type', self.gf('django.db.models.fields.CharField')(max_length=32)),
+            ('object_id', self.gf('django.db.models.fields.CharField')(max_length=64)),
+            ('text', self.gf('django.db.models.fields.TextField')(blank=True)),
+        ))
+        db.send_create_signal(u'search', ['SearchEntry'])
+
+        # Adding unique constraint on 'SearchEntry', fields ['type', 'object_id']
+        db.create_unique(u'search_searchentry', ['type', 'object_id'])
+
+        # full text index. only postgres has one; everything else
+        # falls back to searching in python
+        if db.backend_name == 'postgres':
+            db.execute(
+                "CREATE INDEX search_searchentry_tsv "
+                "ON search_searchentry "
+                "USING gin(to_tsvector('english', text))")
+
+
+    def backwards(self, orm):
+        if db.backend_name == 'postgres':
+            db.execute("DROP INDEX search_searchentry_tsv")
+
+        # Removing unique constraint on 'SearchEntry', fields ['type', 'object_id']
+        db.delete_unique(u'search_searchentry', ['type', 'object_id'])
+
+        # Deleting model 'SearchEntry'
+        db.delete_table(u'search_searchentry')
+
+
+    models = {
+        u'search.searchentry': {
+            'Meta': {'unique_together': "(('type', 'object_id'),)", 'object_name': 'SearchEntry'},
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'object_id': ('django.db.models.fields.CharField', [], {'max_length': '64'}),
+            'text': ('django.db.models.fields.TextField', [], {'blank': 'True'}),
+            'type': ('django.db.models.fields.CharField', [], {'max_length': '32'})
+        }
+    }
+
+    complete_apps = ['search']
\ No newline at end of file
@@ -0,0 +1,139 @@
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import models, connections
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from dmt.main.models import Comment
+from .indexes import INDEXES, index_for_model
+import re
+
+
+def search_terms(q):
+    return re.findall(r'[^\W_]+', q.lower(), re.UNICODE)
+
+
+def inverted_index(entries):
+    """ {word: {entry id: number of occurrences}} """
+    index = dict()
+    for e in entries:
+        for word in search_terms(e.text):
+            postings = index.setdefault(word, dict())
+            postings[e.id] = postings.get(e.id, 0) + 1
+    return index
+
+
+def prefix_matches(index, term):
+    """ {entry id: occurrences} of every word starting with term """
+    matches = dict()
+    for word, postings in index.items():
+        if not word.startswith(term):
+            continue
+        for eid, count in postings.items():
+            matches[eid] = matches.get(eid, 0) + count
+    return matches
+
+
+class SearchEntryManager(models.Manager):
+    def search(self, q, type):
+        """ entries of this type matching every word in q (as a
+        prefix), best match first. each one has a rank attribute.
+
+        on PostgreSQL this is a full text search, backed by a GIN
+        index on to_tsvector('english', text). elsewhere (ie, SQLite
+        in the tests), an inverted index gets built in python. """
+        terms = search_terms(q)
+        if not terms:
+            return self.none()
+        if connections[self.db].vendor == 'postgresql':
+            return self.tsearch(terms, type)
+        return self.python_search(terms, type)
+
+    def tsearch(self, terms, type):
+        tsquery = " & ".join("%s:*" % t for t in terms)
+        return self.filter(type=type).extra(
+            select={'rank': "ts_rank(to_tsvector('english', text), "
+                            "to_tsquery('english', %s))"},
+            select_params=[tsquery],
+            where=["to_tsvector('english', text) @@ "
+                   "to_tsquery('english', %s)"],
+            params=[tsquery],
+            order_by=['-rank', 'id'])
+
+    def python_search(self, terms, type):
+        entries = dict((e.id, e) for e in self.filter(type=type))
+        index = inverted_index(entries.values())
+        ranks = None
+        for term in terms:
+            matches = prefix_matches(index, term)
+            if ranks is None:
+                ranks = matches
+            else:
+                ranks = dict((eid, ranks[eid] + matches[eid])
+                             for eid in ranks if eid in matches)
+        for eid, rank in ranks.items():
+            entries[eid].rank = rank
+        return sorted([entries[eid] for eid in ranks],
+                      key=lambda e: (-e.rank, e.id))
+
+    def index_object(self, index, obj):
+        object_id = index.object_id(obj)
+        text = index.text(obj)
+        if not self.filter(type=index.name, object_id=object_id).update(
+                text=text):
+            self.create(type=index.name, object_id=object_id, text=text)
+
+    def unindex_object(self, index, obj):
+        self.filter(
+            type=index.name, object_id=index.object_id(obj)).delete()
+
+    def rebuild(self):
+        self.all().delete()
+        for index in INDEXES:
+            for obj in index.model.objects.all():
+                self.index_object(index, obj)
+
+
+class SearchEntry(models.Model):
+    """ the searchable text for one object """
+    type = models.CharField(max_length=32)
+    object_id = models.CharField(max_length=64)
+    text = models.TextField(blank=True)
+
+    objects = SearchEntryManager()
+
+    class Meta:
+        unique_together = ('type', 'object_id')
+
+
+@receiver(post_save)
+def object_saved(sender, instance, raw=False, **kwargs):
+    if raw:
+        # fixtures; related objects may not be loaded yet
+        return
+    if sender == Comment:
+        reindex_comment_item(instance)
+        return
+    index = index_for_model(sender)
+    if index is not None:
+        SearchEntry.objects.index_object(index, instance)
+
+
+def reindex_comment_item(comment):
+    """ comments are searched as part of their item's text """
+    try:
+        item = comment.item or (comment.event and comment.event.item)
+    except ObjectDoesNotExist:
+        # going in a cascade with its item, which gets unindexed
+        # itself
+        return
+    if item is not None:
+        object_saved(item.__class__, item)
+
+
+@receiver(post_delete)
+def object_deleted(sender, instance, **kwargs):
+    if sender == Comment:
+        reindex_comment_item(instance)
+        return
+    index = index_for_model(sender)
+    if index is not None:
+        SearchEntry.objects.unindex_object(index, instance)
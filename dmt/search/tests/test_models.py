@@ -0,0 +1,124 @@
+from django.test import TestCase
+from dmt.main.tests.factories import (
+    UserFactory, ItemFactory, CommentFactory, NodeFactory, ProjectFactory,
+    ClientFactory)
+from dmt.search.indexes import get_index, index_for_model
+from dmt.search.models import SearchEntry, search_terms, object_deleted
+from dmt.main.models import Item, StatusUpdate, Comment
+
+
+class SearchTermsTest(TestCase):
+    def test_search_terms(self):
+        self.assertEqual(search_terms(u"Foo_bar, BAZ!"),
+                         [u'foo', u'bar', u'baz'])
+        self.assertEqual(search_terms(u"!!"), [])
+
+
+class IndexTest(TestCase):
+    def test_index_for_model(self):
+        self.assertEqual(index_for_model(Item).name, 'items')
+        self.assertEqual(index_for_model(SearchEntry), None)
+
+    def test_load_keeps_order(self):
+        u1 = UserFactory()
+        u2 = UserFactory()
+        self.assertEqual(
+            get_index('users').load([u2.username, 'missing', u1.username]),
+            [u2, u1])
+
+    def test_label_and_url(self):
+        c = ClientFactory(firstname="Jane", lastname="Doe")
+        index = get_index('clients')
+        self.assertEqual(index.label(c), u"Doe, Jane")
+        self.assertEqual(index.url(c), "/client/%d/" % c.client_id)
+        i = ItemFactory(title="an item")
+        self.assertEqual(get_index('items').label(i), u"an item")
+        self.assertEqual(get_index('items').url(i), i.get_absolute_url())
+
+    def test_item_text_includes_comments(self):
+        i = ItemFactory(title="plain title")
+        CommentFactory(item=i, event__item=i, comment="zebra crossing")
+        self.assertTrue("zebra" in get_index('items').text(i))
+
+
+class SearchEntryTest(TestCase):
+    def search(self, q, type):
+        return [e.object_id for e in SearchEntry.objects.search(q, type)]
+
+    def test_kept_current_on_save(self):
+        i = ItemFactory(title="the quick brown fox")
+        self.assertEqual(self.search("quick", 'items'), [unicode(i.iid)])
+        i.title = "the lazy dog"
+        i.save()
+        self.assertEqual(self.search("quick", 'items'), [])
+        self.assertEqual(self.search("lazy", 'items'), [unicode(i.iid)])
+
+    def test_removed_on_delete(self):
+        n = NodeFactory(subject="aardvark")
+        self.assertEqual(self.search("aardvark", 'nodes'), [unicode(n.nid)])
+        n.delete()
+        self.assertEqual(self.search("aardvark", 'nodes'), [])
+
+    def test_comment_reindexes_item(self):
+        i = ItemFactory(title="plain title")
+        i.add_comment(i.owner, "xylophone")
+        self.assertEqual(self.search("xylo", 'items'), [unicode(i.iid)])
+
+    def test_deleted_comment_reindexes_item(self):
+        i = ItemFactory(title="plain title")
+        i.add_comment(i.owner, "xylophone")
+        Comment.objects.filter(item=i).delete()
+        self.assertEqual(self.search("xylo", 'items'), [])
+
+    def test_deleted_item_stays_unindexed(self):
+        i = ItemFactory(title="plain title")
+        i.add_comment(i.owner, "xylophone")
+        i.resolve(i.owner, 'FIXED', 'kumquat')
+        i.delete()
+        self.assertEqual(self.search("xylo", 'items'), [])
+        self.assertEqual(self.search("kumquat", 'items'), [])
+
+    def test_comment_deleted_after_its_event(self):
+        # in a cascade, the comments' post_delete comes after their
+        # event has already gone
+        object_deleted(Comment, Comment(event_id=12345))
+
+    def test_event_comment_reindexes_item(self):
+        i = ItemFactory(title="plain title")
+        i.resolve(i.owner, 'FIXED', 'kumquat')
+        self.assertEqual(self.search("kumquat", 'items'), [unicode(i.iid)])
+
+    def test_ranked_and_all_terms(self):
+        once = ItemFactory(title="apple banana")
+        twice = ItemFactory(title="apple apple banana")
+        ItemFactory(title="apple")
+        self.assertEqual(
+            self.search("apple banana", 'items'),
+            [unicode(twice.iid), unicode(once.iid)])
+
+    def test_prefix(self):
+        p = ProjectFactory(name="Mediathread")
+        self.assertEqual(self.search("media", 'projects'), [unicode(p.pid)])
+
+    def test_empty_query(self):
+        ItemFactory()
+        self.assertEqual(self.search("", 'items'), [])
+
+    def test_status_updates(self):
+        p = ProjectFactory()
+        su = StatusUpdate.objects.create(
+            project=p, user=p.caretaker, body="shipped the widget")
+        self.assertEqual(self.search("widget", 'status_updates'),
+                         [unicode(su.id)])
+
+    def test_tsearch_query(self):
+        sql = unicode(
+            SearchEntry.objects.tsearch(['foo', 'bar'], 'items').query)
+        self.assertTrue("to_tsquery('english'" in sql)
+        self.assertTrue("foo:* & bar:*" in sql)
+
+    def test_rebuild(self):
+        i = ItemFactory(title="rebuilt")
+        SearchEntry.objects.all().delete()
+        SearchEntry.objects.rebuild()
+        self.assertEqual(self.search("rebuilt", 'items'), [unicode(i.iid)])
@@ -56,6 +56,7 @@ PROJECT_APPS = [
     'dmt.main',
     'dmt.claim',
     'dmt.report',
+    'dmt.search',
 ]
 
 ALLOWED_HOSTS = ['localhost', '.ccnmtl.columbia.edu']
@@ -87,6 +88,7 @@ TEMPLATE_CONTEXT_PROCESSORS = (
 MIDDLEWARE_CLASSES = [
     'django_statsd.middleware.GraphiteRequestTimingMiddleware',
     'django_statsd.middleware.GraphiteMiddleware',
+    'dmt.main.middleware.QueryCountMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
@@ -94,6 +96,7 @@ MIDDLEWARE_CLASSES = [
     'django.contrib.flatpages.middleware.FlatpageFallbackMiddleware',
     'django.middleware.transaction.TransactionMiddleware',
     'impersonate.middleware.ImpersonateMiddleware',
+    'dmt.claim.middleware.ClaimMiddleware',
     'debug_toolbar.middleware.DebugToolbarMiddleware',
     'waffle.middleware.WaffleMiddleware',
 ]
@@ -133,6 +136,7 @@ INSTALLED_APPS = [
     'dmt.claim',
     'dmt.report',
     'dmt.api',
+    'dmt.search',
     'rest_framework',
     'taggit',
     'taggit_templatetags',
@@ -161,12 +165,25 @@ STATSD_PORT = 8125
 
 STATSD_PATCHES = []
 
+# how often (in minutes) each group of gauges in dmt.main.metrics
+# gets collected, if not the default. eg {'estimated_vs_logged': 15}
+METRICS_INTERVALS = dict()
+
+# how many of the requests get their SQL queries counted (0 to 1),
+# and how many queries a request can make before it gets logged
+QUERY_COUNT_SAMPLE_RATE = 1.0
+QUERY_BUDGET = 50
+
 BROKER_URL = "amqp://localhost:5672//dmt"
 CELERYD_CONCURRENCY = 2
 
 THUMBNAIL_SUBDIR = "thumbs"
 EMAIL_SUBJECT_PREFIX = "[dmt] "
 EMAIL_HOST = 'localhost'
+# in development, notifications get written out to files instead of sent.
+# (the test runner swaps in the locmem backend on its own)
+EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
+EMAIL_FILE_PATH = '/tmp/dmt-email'
 SERVER_EMAIL = "dmt@ccnmtl.columbia.edu"
 DEFAULT_FROM_EMAIL = SERVER_EMAIL
 
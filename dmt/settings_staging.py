@@ -28,12 +28,24 @@ TEMPLATE_DEBUG = DEBUG
 STAGING_ENV = True
 
 STATICFILES_DIRS = ()
+
+# the report caches need to be shared between every web and celery
+# process, otherwise invalidating a week only clears it in one of them
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.memcached.MemcachedCache',
+        'LOCATION': '127.0.0.1:11211',
+    }
+}
+EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+
 STATIC_ROOT = "/var/www/dmt/dmt/media/"
 
 STATSD_PREFIX = 'dmt-staging'
 SENTRY_SITE = 'dmt-staging'
 SENTRY_SERVERS = ['http://sentry.ccnmtl.columbia.edu/sentry/store/']
 STATSD_PATCHES.append('django_statsd.patches.db')
+QUERY_COUNT_SAMPLE_RATE = 0.1
 
 if 'migrate' not in sys.argv:
     INSTALLED_APPS.append('raven.contrib.django')
@@ -4,8 +4,8 @@ from django.conf import settings
 from django.views.generic import TemplateView
 from rest_framework import routers
 from dmt.main.views import (
-    SearchView, UserViewSet, ClientViewSet, ProjectViewSet,
-    MilestoneViewSet, ItemViewSet, ProjectMilestoneList,
+    SearchView, SearchTypeView, SearchJSONView, UserViewSet, ClientViewSet,
+    ProjectViewSet, MilestoneViewSet, ItemViewSet, ProjectMilestoneList,
     MilestoneItemList, AddCommentView, ResolveItemView,
     InProgressItemView, VerifyItemView, ReopenItemView,
     SplitItemView, ItemDetailView, IndexView, ClientListView,
@@ -21,6 +21,7 @@ from dmt.main.views import (
     ProjectUpdateView, MilestoneUpdateView, ItemUpdateView,
     ProjectAddItemView, DashboardView, MilestoneListView,
     ProjectRemoveUserView, ProjectAddUserView, ProjectAddMilestoneView,
+    ChangesView,
 )
 from dmt.main.feeds import ForumFeed, StatusUpdateFeed
 
@@ -59,9 +60,13 @@ urlpatterns = patterns(
         ProjectMilestoneList.as_view(), name='project-milestones'),
     url(r'^drf/milestones/(?P<pk>\d+)/items/$',
         MilestoneItemList.as_view(), name='milestone-items'),
+    url(r'^drf/changes/(?P<type>\w+)/$', ChangesView.as_view(),
+        name='changes'),
     (r'^drf/', include(router.urls)),
     (r'^claim/', include('dmt.claim.urls')),
     (r'^search/$', SearchView.as_view()),
+    (r'^search/json/$', SearchJSONView.as_view()),
+    (r'^search/(?P<type>\w+)/$', SearchTypeView.as_view()),
     (r'^client/$', ClientListView.as_view()),
     (r'^client/(?P<pk>\d+)/$', ClientDetailView.as_view()),
     (r'^forum/$', ForumView.as_view()),